@@ -0,0 +1,214 @@
+# LiftLink Carpool - booking flow load test
+# Builds a synthetic dataset shaped like get_default_users / get_default_rides
+# (N users, M rides, K bookings with their earnings), then drives the real
+# routes through Flask's test client from several worker processes sharing
+# one data directory, the way gunicorn workers do:
+#   (login, find_ride, book_ride, dashboard, earnings_history) x iterations
+# and reports throughput, p50/p99 latency per route and peak RSS.
+#
+# The dataset and every virtual user's choices come from fixed seeds, so runs
+# on different commits do the same work. Pass a results path to also write
+# the numbers (with the git revision) as JSON for comparing commits.
+#
+# Usage: python benchmarks/bench_booking_flow.py [users] [rides] [bookings] [json|sqlite]
+#                                                [processes] [iterations] [results.json]
+
+import os
+import sys
+import copy
+import json
+import time
+import random
+import resource
+import tempfile
+import platform
+import subprocess
+import contextlib
+import io
+import multiprocessing
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+from storage import open_store
+
+SEED = 2025
+PASSWORD = 'loadtest123'
+# Fast enough that login does not drown out the other routes; pass LIFTLINK_PASSWORD_HASH_COST to override
+HASH_COST = int(os.environ.get('LIFTLINK_PASSWORD_HASH_COST', 12))
+ROUTES = ('login', 'find_ride', 'book_ride', 'dashboard', 'earnings_history')
+
+LOCALITIES = ['Dadar Railway Station', 'Bandra West', 'Andheri East', 'Matunga Road', 'Sion Circle',
+              'Kurla Depot', 'Ghatkopar Metro', 'Chembur Naka', 'Worli Sea Face', 'Lower Parel',
+              'Prabhadevi', 'Santacruz', 'Vile Parle', 'Thane Station', 'Vashi Sector 17']
+SEARCHES = ['', 'dadar', 'bandra', 'station', 'west', 'metro', 'naka']
+
+
+def user_email(i):
+    # Every third user is staff, like john.doe in the defaults; staff drive, students mostly ride
+    return f'staff{i}@xavier.ac.in' if i % 3 == 0 else f'student{i}@student.xavier.ac.in'
+
+
+def synthetic_users(count, password_hash):
+    student, staff = main.get_default_users().values()
+    users = {}
+    for i in range(count):
+        email = user_email(i)
+        user = copy.deepcopy(staff if i % 3 == 0 else student)
+        user.update(email=email, name=f'Load User {i}', password=password_hash, phone=f'98{i:08d}')
+        users[email] = user
+    return users
+
+
+def synthetic_rides(count, users, rng):
+    template = main.get_default_rides()[0]
+    drivers = [email for email in users if email.startswith('staff')]
+    today = date.today()
+    rides = []
+    for ride_id in range(1, count + 1):
+        driver = drivers[ride_id % len(drivers)]
+        ride = dict(template, id=ride_id, driver_email=driver, driver_name=users[driver]['name'],
+                    phone=users[driver]['phone'], from_location=rng.choice(LOCALITIES),
+                    date=(today + timedelta(days=1 + ride_id % 30)).isoformat(),
+                    departure_time=f"{7 + ride_id % 3:02d}:{ride_id % 4 * 15:02d}",
+                    total_seats=4, available_seats=4)
+        ride.update(main.ride_contact_fields(ride))
+        rides.append(ride)
+    return rides
+
+
+def build_dataset(data_dir, backend, users, rides, bookings):
+    """Write the dataset with the storage backend itself; returns (emails, ride ids)"""
+    rng = random.Random(SEED)
+    with contextlib.redirect_stdout(io.StringIO()):
+        password_hash = main.ScryptHasher(cost=HASH_COST).hash(PASSWORD)
+        user_data = synthetic_users(users, password_hash)
+        ride_list = synthetic_rides(rides, user_data, rng)
+        store = open_store(backend, data_dir, lambda: user_data, lambda: ride_list)
+        store.save_users(user_data)
+        passengers = [email for email in user_data if not email.startswith('staff')]
+        booking_list, earnings = [], {}
+        for booking_id in range(1, bookings + 1):
+            ride = ride_list[rng.randrange(rides)]
+            if ride['available_seats'] <= 1:
+                continue  # Leave a seat on every ride for the load test to take
+            passenger = passengers[booking_id % len(passengers)]
+            ride['available_seats'] -= 1
+            booking_list.append({'id': booking_id, 'ride_id': ride['id'], 'passenger_email': passenger,
+                                 'passenger_name': user_data[passenger]['name'], 'driver_email': ride['driver_email'],
+                                 'booking_time': '2025-01-01 08:00:00', 'status': 'confirmed'})
+            earnings.setdefault(ride['driver_email'], []).append({
+                'id': len(earnings.get(ride['driver_email'], [])) + 1, 'passenger_name': user_data[passenger]['name'],
+                'passenger_email': passenger, 'amount': ride['price_per_seat'], 'date': '2025-01-01', 'time': '08:00',
+                'ride_from': ride['from_location'], 'ride_to': ride['to_location'],
+                'ride_date': ride['date'], 'ride_time': ride['departure_time']})
+        store.save_rides(ride_list)
+        store.save_bookings(booking_list)
+        store.save_earnings(earnings)
+    return list(user_data), [ride['id'] for ride in ride_list]
+
+
+def run_worker(args):
+    """One load-generator process: its own app instance and store, like a gunicorn worker"""
+    worker, data_dir, backend, emails, ride_ids, iterations = args
+    rng = random.Random(SEED + worker)
+    latencies = {route: [] for route in ROUTES}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        app = main.create_app({'DATA_DIR': data_dir, 'STORAGE_BACKEND': backend, 'TESTING': True,
+                               'PASSWORD_HASH_COST': HASH_COST})
+
+        def timed(client, route, method, url, **kwargs):
+            start = time.perf_counter()
+            response = client.open(url, method=method, **kwargs)
+            response.get_data()  # Streamed pages render while the body is read
+            latencies[route].append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                raise RuntimeError(f"{method} {url} -> {response.status_code}")
+            return response
+
+        # Each iteration is a new visitor: log in, search, book, then check the dashboard and earnings
+        for _ in range(iterations):
+            client = app.test_client()
+            email = rng.choice(emails)
+            user_type = 'staff' if email.startswith('staff') else 'student'
+            response = timed(client, 'login', 'POST', '/login',
+                             data={'email': email, 'password': PASSWORD, 'user_type': user_type})
+            if not response.location or not response.location.endswith('/dashboard'):
+                raise RuntimeError(f"login failed for {email}")
+            query = rng.choice(SEARCHES)
+            timed(client, 'find_ride', 'GET', f'/find_ride?from={query}' if query else '/find_ride')
+            timed(client, 'book_ride', 'GET', f'/book_ride/{rng.choice(ride_ids)}')
+            timed(client, 'dashboard', 'GET', '/dashboard')
+            timed(client, 'earnings_history', 'GET', '/earnings_history')
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024  # KB on Linux
+    return latencies, peak_rss
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main_bench():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000
+    rides = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    bookings = int(sys.argv[3]) if len(sys.argv) > 3 else 10_000
+    backend = sys.argv[4] if len(sys.argv) > 4 else 'json'
+    processes = int(sys.argv[5]) if len(sys.argv) > 5 else 4
+    iterations = int(sys.argv[6]) if len(sys.argv) > 6 else 25
+    results_path = sys.argv[7] if len(sys.argv) > 7 else None
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        start = time.perf_counter()
+        emails, ride_ids = build_dataset(data_dir, backend, users, rides, bookings)
+        build_seconds = time.perf_counter() - start
+
+        # Forked workers, as gunicorn forks them; each opens the store on its first request
+        context = multiprocessing.get_context('fork')
+        jobs = [(worker, data_dir, backend, emails, ride_ids, iterations) for worker in range(processes)]
+        start = time.perf_counter()
+        with context.Pool(processes) as pool:
+            outcomes = pool.map(run_worker, jobs)
+        wall = time.perf_counter() - start
+
+    routes = {}
+    for route in ROUTES:
+        samples = sorted(sample for latencies, _ in outcomes for sample in latencies[route])
+        routes[route] = {'requests': len(samples),
+                         'p50_ms': percentile(samples, 0.50) * 1000, 'p99_ms': percentile(samples, 0.99) * 1000}
+    total = sum(route['requests'] for route in routes.values())
+    results = {
+        'revision': git_revision(), 'python': platform.python_version(), 'cpus': os.cpu_count(),
+        'backend': backend, 'users': users, 'rides': rides, 'bookings': bookings,
+        'processes': processes, 'iterations': iterations, 'password_hash_cost': HASH_COST,
+        'build_seconds': build_seconds, 'wall_seconds': wall, 'requests_per_second': total / wall,
+        'peak_rss_bytes': max(rss for _, rss in outcomes), 'routes': routes,
+    }
+
+    print("=" * 64)
+    print(f" Booking flow - {users} users, {rides} rides, {bookings} bookings ({backend})")
+    print(f" {processes} processes x {iterations} iterations, revision {results['revision'] or 'unknown'}")
+    print("=" * 64)
+    print(f"{'route':>18} {'requests':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for route, stats in routes.items():
+        print(f"{route:>18} {stats['requests']:>9} {stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    print(f"Throughput: {results['requests_per_second']:.0f} requests/s ({total} requests in {wall:.2f}s)")
+    print(f"Peak RSS:   {results['peak_rss_bytes'] / 1e6:.1f} MB per worker (dataset built in {build_seconds:.1f}s)")
+    if results_path:
+        with open(results_path, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✓ Results written to {results_path}")
+
+
+if __name__ == '__main__':
+    main_bench()
@@ -0,0 +1,108 @@
+# LiftLink Carpool - JsonStore cold start benchmark
+# Builds a synthetic data directory (users, rides, bookings, earnings), then
+# times opening the store from JSON snapshots and from the binary snapshots
+# produced by snapshots.py, and checks both load the same data.
+#
+# Usage: python benchmarks/bench_cold_start.py [users] [rides] [bookings]
+
+import os
+import sys
+import time
+import shutil
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JsonStore
+from snapshots import MSGPACK_AVAILABLE
+from bench_find_ride_search import synthetic_rides
+
+
+def synthetic_users(count):
+    return {f'user{i}@student.xavier.ac.in': {
+        'name': f'User {i}', 'password': 'x' * 64, 'user_type': 'student',
+        'phone': '9876543210', 'department': 'Computer Engineering', 'year': '3',
+        'emergency_contacts': [{'name': 'Parent', 'phone': '9876500000', 'relation': 'Parent'}],
+    } for i in range(count)}
+
+
+def build_data_dir(data_dir, users, rides, bookings):
+    ride_list = synthetic_rides(rides)
+    with contextlib.redirect_stdout(io.StringIO()):
+        store = JsonStore(data_dir, lambda: synthetic_users(users), lambda: ride_list)
+        store.save_users()
+        store.bookings = [{
+            'id': i, 'ride_id': ride_list[i % rides]['id'],
+            'passenger_email': f'user{i % users}@student.xavier.ac.in', 'passenger_name': f'User {i % users}',
+            'booking_time': '2030-01-01 08:00:00', 'status': 'confirmed',
+        } for i in range(1, bookings + 1)]
+        store.save_bookings()
+        store.earnings = {}
+        for booking in store.bookings:
+            ride = ride_list[(booking['id'] - 1) % rides]
+            store.earnings.setdefault(ride['driver_email'], []).append({
+                'id': booking['id'], 'ride_id': ride['id'], 'passenger_name': booking['passenger_name'],
+                'amount': 30, 'date': '2030-01-01', 'time': '08:00:00',
+            })
+        store.save_earnings()
+
+
+def timed_open(data_dir, snapshot_format, repeat=3):
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            store = JsonStore(data_dir, dict, list, snapshot_format=snapshot_format)
+            elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, store
+
+
+def dir_size(data_dir):
+    return sum(os.path.getsize(os.path.join(data_dir, name)) for name in os.listdir(data_dir))
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rides = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    bookings = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+
+    with tempfile.TemporaryDirectory() as root:
+        json_dir = os.path.join(root, 'json')
+        binary_dir = os.path.join(root, 'binary')
+        os.makedirs(json_dir)
+        build_data_dir(json_dir, users, rides, bookings)
+        shutil.copytree(json_dir, binary_dir)
+
+        json_ms, json_store = timed_open(json_dir, 'json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            JsonStore(binary_dir, dict, list, snapshot_format='binary')  # Converts in place
+            convert_ms = (time.perf_counter() - start) * 1000
+        binary_ms, binary_store = timed_open(binary_dir, 'binary')
+
+        print("=" * 64)
+        print(f" JsonStore cold start - {users} users, {rides} rides, {bookings} bookings")
+        print("=" * 64)
+        codec = 'msgpack' if MSGPACK_AVAILABLE else 'json'
+        print(f"{'json':>16}: {json_ms:>8.0f} ms  {dir_size(json_dir) / 1e6:>7.1f} MB")
+        print(f"{'binary (' + codec + ')':>16}: {binary_ms:>8.0f} ms  {dir_size(binary_dir) / 1e6:>7.1f} MB")
+        print(f"One-off conversion: {convert_ms:.0f} ms, speedup {json_ms / binary_ms:.1f}x")
+
+        sample = 'user7@student.xavier.ac.in'
+        same = (binary_store.count_users() == json_store.count_users()
+                and binary_store.get_user(sample) == json_store.get_user(sample)
+                and binary_store.all_rides() == json_store.all_rides()
+                and binary_store.count_bookings() == json_store.count_bookings()
+                and binary_store.earnings_for_driver('driver7@student.xavier.ac.in') ==
+                json_store.earnings_for_driver('driver7@student.xavier.ac.in'))
+        if not same:
+            print("✗ Binary snapshots loaded different data")
+            sys.exit(1)
+        print("✓ Binary snapshots load the same data")
+
+
+if __name__ == '__main__':
+    main()
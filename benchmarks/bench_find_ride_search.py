@@ -0,0 +1,98 @@
+# LiftLink Carpool - find_ride location search benchmark
+# Compares the trigram-indexed JsonStore.search_rides against the old
+# full-table substring scan on 100k synthetic rides, and checks that both
+# return exactly the same rides.
+#
+# Usage: python benchmarks/bench_find_ride_search.py [num_rides]
+
+import os
+import sys
+import time
+import random
+import tempfile
+import contextlib
+import io
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import JsonStore, contains_ci, ride_sort_key
+
+LOCALITIES = [
+    'Dadar Railway Station', 'Bandra West', 'Andheri East', 'Mahim Causeway', 'Matunga Road',
+    'Sion Circle', 'Kurla Depot', 'Ghatkopar Metro', 'Powai Lake', 'Chembur Naka',
+    'Worli Sea Face', 'Lower Parel', 'Prabhadevi', 'Santacruz', 'Vile Parle',
+    'Thane Station', 'Vashi Sector 17', 'Borivali National Park', 'Colaba Causeway', 'Juhu Beach',
+]
+CAMPUS = ['Xavier Institute of Engineering, Mahim', 'XIE Main Gate', 'Mahim Church']
+QUERIES = [
+    ('dadar', ''), ('', 'xavier'), ('bandra', 'mahim'), ('st', ''), ('station', 'xie'),
+    ('Sea Face', ''), ('ghatkopar metro', ''), ('nowhere', ''), ('a', 'a'),
+]
+
+
+def synthetic_rides(count, seed=42):
+    rng = random.Random(seed)
+    rides = []
+    for ride_id in range(1, count + 1):
+        from_location = f"{rng.choice(LOCALITIES)} {rng.choice(['', 'Gate 2', 'Bus Stop', 'West'])}".strip()
+        rides.append({
+            'id': ride_id,
+            'driver_name': f'Driver {ride_id % 500}',
+            'driver_email': f'driver{ride_id % 500}@student.xavier.ac.in',
+            'from_location': from_location,
+            'to_location': rng.choice(CAMPUS),
+            'departure_time': f'{rng.randint(6, 10):02d}:{rng.choice(["00", "15", "30", "45"])}',
+            'date': f'2030-01-{rng.randint(1, 28):02d}',
+            'available_seats': rng.randint(0, 4),
+            'total_seats': 4,
+            'price_per_seat': 30,
+            'phone': '9876543210',
+        })
+    return rides
+
+
+def scan_search(rides, search_from, search_to, exclude_driver):
+    """The pre-index find_ride filter: a substring scan over every ride"""
+    results = [r for r in rides if
+               (not search_from or contains_ci(r['from_location'], search_from)) and
+               (not search_to or contains_ci(r['to_location'], search_to)) and
+               r['available_seats'] > 0 and r['driver_email'] != exclude_driver]
+    results.sort(key=ride_sort_key)
+    return results
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rides = synthetic_rides(count)
+    exclude = 'driver0@student.xavier.ac.in'
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            store = JsonStore(data_dir, dict, lambda: rides)
+            build_ms = (time.perf_counter() - start) * 1000
+
+        print("=" * 72)
+        print(f" find_ride search benchmark - {count} rides (store load + index build {build_ms:.0f} ms)")
+        print("=" * 72)
+        print(f"{'from':>18} {'to':>10} {'matches':>8} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+        for search_from, search_to in QUERIES:
+            scan_ms, expected = timed(lambda: scan_search(rides, search_from, search_to, exclude), 3)
+            index_ms, actual = timed(lambda: store.search_rides(search_from, search_to, '', exclude), 3)
+            if [r['id'] for r in actual] != [r['id'] for r in expected]:
+                print(f"✗ Result mismatch for from={search_from!r} to={search_to!r}")
+                sys.exit(1)
+            print(f"{search_from!r:>18} {search_to!r:>10} {len(actual):>8} {scan_ms:>9.2f} {index_ms:>9.2f} "
+                  f"{scan_ms / index_ms if index_ms else float('inf'):>7.1f}x")
+        print("✓ Indexed results identical to substring scan")
+
+
+if __name__ == '__main__':
+    main()
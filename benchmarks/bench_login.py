@@ -0,0 +1,87 @@
+# LiftLink Carpool - login throughput benchmark
+# Drives POST /login from many threads (as gunicorn's gthread workers would)
+# for each scrypt cost setting and reports logins per second and latency, so
+# PASSWORD_HASH_COST can be picked for the exam-week login spike. The first
+# row logs in accounts that still have legacy SHA-256 hashes, which also
+# pays for upgrading each one to scrypt.
+#
+# Usage: python benchmarks/bench_login.py [logins] [threads] [costs, e.g. 12,13,14,15]
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+import statistics
+import contextlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+
+PASSWORD = 'exam-week-2025'
+
+
+def bench_users(count, password_hash):
+    return {f'bench{i}@student.xavier.ac.in': {
+        'name': f'Bench Student {i}', 'email': f'bench{i}@student.xavier.ac.in', 'password': password_hash,
+        'phone': '9000000000', 'user_type': 'student', 'verified': True,
+    } for i in range(count)}
+
+
+def run(data_dir, cost, logins, threads, legacy=False):
+    """Log every bench user in once; returns (logins/s, latencies in ms, hashes upgraded)"""
+    config = {'DATA_DIR': data_dir, 'PASSWORD_HASH_COST': cost, 'TESTING': True}
+    main.create_app(config)
+    with contextlib.redirect_stdout(io.StringIO()):
+        password_hash = (hashlib.sha256(PASSWORD.encode()).hexdigest() if legacy
+                         else main.get_password_hasher().hash(PASSWORD))
+        main.get_store().save_users(bench_users(logins, password_hash))
+    app = main.create_app(config)  # Re-open so the store loads the seeded users
+
+    def login(i):
+        client = app.test_client()
+        start = time.perf_counter()
+        response = client.post('/login', data={'email': f'bench{i}@student.xavier.ac.in',
+                                               'password': PASSWORD, 'user_type': 'student'})
+        elapsed = time.perf_counter() - start
+        assert response.status_code == 302 and response.location.endswith('/dashboard'), response.status_code
+        return elapsed * 1000
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            latencies = list(pool.map(login, range(logins)))
+        wall = time.perf_counter() - start
+        upgraded = sum(user['password'].startswith('scrypt$') for user in main.get_store().load_users().values())
+    main.get_password_hasher().shutdown()
+    return logins / wall, latencies, upgraded
+
+
+def main_bench():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    costs = [int(c) for c in sys.argv[3].split(',')] if len(sys.argv) > 3 else [12, 13, 14, 15]
+
+    print("=" * 72)
+    print(f" Login throughput - {logins} logins, {threads} threads, "
+          f"{main.app.config['PASSWORD_HASH_WORKERS']} hash workers, {os.cpu_count()} CPUs")
+    print("=" * 72)
+    print(f"{'setting':>28} {'logins/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    rows = [('legacy sha256 -> scrypt 14', 14, True)] + [(f'scrypt cost {c} ({(128 * 8 << c) >> 20} MB)', c, False)
+                                                         for c in costs]
+    for label, cost, legacy in rows:
+        with tempfile.TemporaryDirectory() as data_dir:
+            rate, latencies, upgraded = run(data_dir, cost, logins, threads, legacy)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label:>28} {rate:>10.1f} {statistics.median(latencies):>9.1f} {p99:>9.1f}")
+        if legacy:
+            print(f"{'':>28} {upgraded}/{logins} hashes upgraded to scrypt")
+
+
+if __name__ == '__main__':
+    main_bench()
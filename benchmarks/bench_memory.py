@@ -0,0 +1,70 @@
+# LiftLink Carpool - JsonStore resident memory benchmark
+# Opens the store on a synthetic data directory in a fresh interpreter and
+# reports the Python heap it holds (tracemalloc) and the process RSS, so
+# changes to how records are kept in memory can be compared run to run.
+#
+# Usage: python benchmarks/bench_memory.py [users] [rides] [bookings] [json|binary]
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+import contextlib
+import io
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import JsonStore
+from bench_cold_start import build_data_dir
+
+# Runs in the child process; prints one JSON line of measurements
+PROBE = r'''
+import contextlib, io, json, sys, threading, tracemalloc
+sys.path.insert(0, {root!r})
+from storage import JsonStore
+tracemalloc.start()
+with contextlib.redirect_stdout(io.StringIO()):
+    store = JsonStore({data_dir!r}, dict, list, snapshot_format={snapshot_format!r})
+    for thread in threading.enumerate():
+        if thread.name == 'string-pool':
+            thread.join()  # Measure the settled heap
+    # Touch every table the way a warmed-up worker would
+    store.search_rides()
+    for email in list(store.earnings)[:500]:
+        store.earnings_summary(email)
+heap = tracemalloc.get_traced_memory()[0]
+tracemalloc.stop()
+with open('/proc/self/status') as f:
+    rss = next(int(line.split()[1]) * 1024 for line in f if line.startswith('VmRSS:'))
+print(json.dumps({{'heap': heap, 'rss': rss, 'rides': store.count_rides(), 'bookings': store.count_bookings()}}))
+'''
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    rides = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+    bookings = int(sys.argv[3]) if len(sys.argv) > 3 else 200_000
+    snapshot_format = sys.argv[4] if len(sys.argv) > 4 else 'json'
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_data_dir(data_dir, users, rides, bookings)
+        if snapshot_format != 'json':
+            with contextlib.redirect_stdout(io.StringIO()):
+                JsonStore(data_dir, dict, list, snapshot_format=snapshot_format)  # Convert up front
+        probe = PROBE.format(root=ROOT, data_dir=data_dir, snapshot_format=snapshot_format)
+        output = subprocess.run([sys.executable, '-c', probe], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+
+    records = result['rides'] + result['bookings']
+    print("=" * 60)
+    print(f" JsonStore memory - {users} users, {rides} rides, {bookings} bookings ({snapshot_format})")
+    print("=" * 60)
+    print(f"Python heap: {result['heap'] / 1e6:>8.1f} MB  ({result['heap'] / records:.0f} bytes per ride/booking)")
+    print(f"Process RSS: {result['rss'] / 1e6:>8.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+# LiftLink Carpool - startup latency benchmark
+# Measures, in a fresh interpreter each run, how long "import main" takes and
+# how long the first and second requests take (the first one opens the store).
+# Uses a synthetic data directory so the store has realistic work to do.
+#
+# Usage: python benchmarks/bench_startup.py [users] [rides] [bookings] [json|binary] [runs]
+
+import os
+import sys
+import json
+import subprocess
+import tempfile
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from storage import JsonStore
+from bench_cold_start import build_data_dir
+
+# Runs in the child process; prints one JSON line of timings
+PROBE = r'''
+import contextlib, io, json, sys, time
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+    import main
+imported = time.perf_counter()
+client = main.app.test_client()
+with contextlib.redirect_stdout(io.StringIO()):
+    client.get('/login')
+    first = time.perf_counter()
+    client.get('/login')
+second = time.perf_counter()
+print(json.dumps({'import': imported - start, 'first': first - imported, 'second': second - first}))
+'''
+
+
+def run_probe(env):
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 5_000
+    rides = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    bookings = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+    snapshot_format = sys.argv[4] if len(sys.argv) > 4 else 'json'
+    runs = int(sys.argv[5]) if len(sys.argv) > 5 else 5
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        build_data_dir(data_dir, users, rides, bookings)
+        if snapshot_format != 'json':
+            import contextlib
+            import io
+            with contextlib.redirect_stdout(io.StringIO()):
+                JsonStore(data_dir, dict, list, snapshot_format=snapshot_format)  # Convert up front
+
+        env = dict(os.environ, LIFTLINK_DATA_DIR=data_dir, LIFTLINK_SNAPSHOT_FORMAT=snapshot_format)
+        samples = [run_probe(env) for _ in range(runs)]
+
+    print("=" * 60)
+    print(f" Startup latency - {users} users, {rides} rides, {bookings} bookings ({snapshot_format})")
+    print("=" * 60)
+    for key, label in (('import', 'import main'), ('first', 'first request'), ('second', 'second request')):
+        values = [sample[key] * 1000 for sample in samples]
+        print(f"{label:>16}: median {statistics.median(values):>8.1f} ms   max {max(values):>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
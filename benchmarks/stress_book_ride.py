@@ -0,0 +1,116 @@
+# LiftLink Carpool - seat reservation stress test
+# Fires thousands of concurrent bookings at a single ride through
+# store.reserve_seat and checks the invariants: seats never go negative,
+# exactly the offered seats are sold, and booking ids are unique.
+#
+# Usage: python benchmarks/stress_book_ride.py [json|sqlite] [bookings] [seats] [threads] [processes]
+
+import os
+import sys
+import time
+import tempfile
+import contextlib
+import io
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import open_store, ReservationError
+
+RIDE_ID = 1
+DRIVER = 'driver@xavier.ac.in'
+
+
+def stress_rides(seats):
+    return [{
+        'id': RIDE_ID, 'driver_name': 'Stress Driver', 'driver_email': DRIVER,
+        'from_location': 'Dadar Railway Station', 'to_location': 'Xavier Institute of Engineering, Mahim',
+        'departure_time': '08:00', 'date': '2099-01-01', 'available_seats': seats, 'total_seats': seats,
+        'price_per_seat': 25, 'phone': '7700090035'
+    }]
+
+
+def open_quiet(backend, data_dir, seats):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return open_store(backend, data_dir, dict, lambda: stress_rides(seats))
+
+
+def book_many(backend, data_dir, seats, passengers, threads):
+    """Book one seat for each passenger from a thread pool; returns (booked ids, full count, seats seen)"""
+    store = open_quiet(backend, data_dir, seats)
+    seats_seen = []
+
+    def book(passenger):
+        def build_booking(ride, booking_id):
+            seats_seen.append(ride['available_seats'])  # Already decremented for this booking
+            return {'id': booking_id, 'ride_id': RIDE_ID, 'passenger_email': passenger, 'status': 'confirmed'}
+        try:
+            _, booking = store.reserve_seat(RIDE_ID, passenger, build_booking)
+            return booking['id']
+        except ReservationError as e:
+            if e.reason != ReservationError.FULL:
+                raise
+            return None
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(book, passengers))
+    booked = [booking_id for booking_id in results if booking_id is not None]
+    return booked, len(results) - len(booked), min(seats_seen, default=seats)
+
+
+def process_worker(args):
+    return book_many(*args)
+
+
+def main():
+    backend = sys.argv[1] if len(sys.argv) > 1 else 'json'
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    seats = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else 64
+    processes = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        open_quiet(backend, data_dir, seats)  # Create the data files once
+
+        passengers = [f'passenger{i}@student.xavier.ac.in' for i in range(total)]
+        chunks = [(backend, data_dir, seats, passengers[i::processes], threads) for i in range(processes)]
+        start = time.perf_counter()
+        if processes == 1:
+            results = [process_worker(chunks[0])]
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                results = pool.map(process_worker, chunks)
+        elapsed = time.perf_counter() - start
+
+        booked = [booking_id for ids, _, _ in results for booking_id in ids]
+        full = sum(count for _, count, _ in results)
+        lowest_seen = min(low for _, _, low in results)
+        store = open_quiet(backend, data_dir, seats)
+        remaining = store.get_ride(RIDE_ID)['available_seats']
+
+        print("=" * 60)
+        print(f" book_ride stress test - {backend} backend")
+        print("=" * 60)
+        print(f"Attempts: {total} ({processes} processes x {threads} threads) for {seats} seats")
+        print(f"Booked: {len(booked)}  Rejected as full: {full}  Seats left: {remaining}")
+        print(f"Throughput: {total / elapsed:.0f} attempts/s ({elapsed:.2f}s)")
+
+        failures = []
+        if remaining < 0 or lowest_seen < 0:
+            failures.append("seat count went negative")
+        if len(booked) != min(total, seats) or remaining != seats - len(booked):
+            failures.append("seats sold do not match bookings")
+        if len(set(booked)) != len(booked):
+            failures.append("duplicate booking ids")
+        if store.count_bookings() != len(booked):
+            failures.append("persisted bookings do not match")
+        for failure in failures:
+            print(f"✗ {failure}")
+        if failures:
+            sys.exit(1)
+        print("✓ No overselling, booking ids unique")
+
+
+if __name__ == '__main__':
+    main()
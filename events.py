@@ -0,0 +1,173 @@
+# LiftLink Carpool - Live seat availability over server-sent events
+# book_ride, edit_ride and cancel_ride publish seat-count changes to a seat
+# broker; every open find_ride page holds one /events/seats stream and
+# updates its ride cards in place instead of reloading to check seats.
+#
+# 'memory' fans events out inside one process. 'file' is a local stand-in
+# for a real broker (e.g. Redis pub/sub) when gunicorn runs several workers:
+# each publish is appended to a shared log in the data directory and every
+# worker tails it. Seat counts are advisory - book_ride still re-checks.
+
+import os
+import json
+import threading
+
+
+def seat_event(ride, cancelled=False):
+    """Payload pushed to pages showing this ride"""
+    event = {'ride_id': ride['id'], 'available_seats': ride['available_seats'], 'total_seats': ride['total_seats']}
+    if cancelled:
+        event['available_seats'] = 0
+        event['cancelled'] = True
+    return event
+
+
+def format_sse(event_name, data):
+    """One server-sent event frame"""
+    return f"event: {event_name}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """One listener's pending events - only the latest count per ride is kept, so a slow page never backs up"""
+
+    def __init__(self, broker, ride_ids):
+        self.broker = broker
+        self.ride_ids = ride_ids  # None = every ride
+        self._pending = {}
+        self._ready = threading.Condition()
+
+    def offer(self, event):
+        if self.ride_ids is not None and event['ride_id'] not in self.ride_ids:
+            return
+        with self._ready:
+            self._pending[event['ride_id']] = event
+            self._ready.notify()
+
+    def wait(self, timeout):
+        """Events since the last call, or [] if nothing changed within timeout seconds"""
+        with self._ready:
+            if not self._pending:
+                self._ready.wait(timeout)
+            events = list(self._pending.values())
+            self._pending.clear()
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SeatBroker:
+    """In-process pub/sub for seat events (single worker)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+
+    def subscribe(self, ride_ids=None):
+        subscription = Subscription(self, ride_ids)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event):
+        self._deliver(event)
+
+    def _deliver(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.offer(event)
+
+
+class FileSeatBroker(SeatBroker):
+    """Seat events shared between worker processes through an append-only log file
+
+    Publishes are delivered locally at once and appended to the log; a
+    daemon thread, started with the first subscriber, tails the log for
+    events from other workers.
+    """
+
+    MAX_LOG_BYTES = 1024 * 1024  # Truncated past this - late readers just miss a few advisory updates
+
+    def __init__(self, path, poll_interval=0.5):
+        super().__init__()
+        self.path = path
+        self.poll_interval = poll_interval
+        self.origin = os.urandom(6).hex()  # Lets the tailer skip this worker's own events
+        self._tailer = None
+
+    def subscribe(self, ride_ids=None):
+        subscription = super().subscribe(ride_ids)
+        if self._tailer is None:
+            with self._lock:
+                if self._tailer is None:
+                    self._tailer = threading.Thread(target=self._tail, name='seat-events', daemon=True)
+                    self._tailer.start()
+        return subscription
+
+    def publish(self, event):
+        self._deliver(event)
+        line = json.dumps(dict(event, origin=self.origin), separators=(',', ':')).encode('utf-8') + b'\n'
+        try:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size > self.MAX_LOG_BYTES:
+                    os.ftruncate(fd, 0)
+                os.write(fd, line)  # One small O_APPEND write - lines from different workers never interleave
+            finally:
+                os.close(fd)
+        except OSError as e:
+            print(f"✗ Could not publish seat event: {e}")
+
+    def _tail(self):
+        try:
+            offset = os.path.getsize(self.path)
+        except OSError:
+            offset = 0
+        partial = b''
+        stop = threading.Event()
+        while not stop.wait(self.poll_interval):
+            if not self._subscribers:
+                continue
+            try:
+                with open(self.path, 'rb') as f:
+                    size = os.fstat(f.fileno()).st_size
+                    if size < offset:  # Truncated by a publisher
+                        offset, partial = 0, b''
+                    if size == offset:
+                        continue
+                    f.seek(offset)
+                    chunk = f.read(size - offset)
+            except FileNotFoundError:
+                continue
+            offset += len(chunk)
+            *lines, partial = (partial + chunk).split(b'\n')
+            for line in lines:
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.pop('origin', None) != self.origin:
+                    self._deliver(event)
+
+
+def open_seat_broker(kind, data_dir):
+    """Create the seat broker for this worker process"""
+    if kind == 'memory':
+        return SeatBroker()
+    if kind == 'file':
+        return FileSeatBroker(os.path.join(data_dir, 'seat_events.log'))
+    raise ValueError(f"Unknown seat event broker: {kind}")
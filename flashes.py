@@ -0,0 +1,161 @@
+# LiftLink Carpool - Server-side flash messages
+# Flask keeps flash() messages in the signed session cookie, so every byte of
+# a pending message is sent, verified and re-signed on each request until a
+# page shows it. FlashSessionInterface moves them out of the cookie: the
+# messages go to a flash store and the cookie only carries a short id.
+# flash() and get_flashed_messages() work exactly as before.
+#
+# 'memory' is an LRU with a TTL inside one process. 'file' keeps one small
+# file per pending message list in the data directory, so the redirect that
+# shows a message may land on any gunicorn worker.
+
+import os
+import re
+import json
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from flask.sessions import SecureCookieSessionInterface
+
+FLASHES_KEY = '_flashes'   # Where flask.flash() keeps messages in the session
+FLASH_ID_KEY = '_flash_id'  # What the cookie carries instead
+
+FLASH_ID = re.compile(r'^[A-Za-z0-9_-]{16}$')
+
+
+def new_flash_id():
+    return secrets.token_urlsafe(12)
+
+
+def _decode(payload):
+    # JSON turns the (category, message) tuples into lists
+    return [tuple(item) for item in json.loads(payload)]
+
+
+class FlashStore:
+    """In-process LRU of pending flash messages; entries expire after ttl seconds"""
+
+    def __init__(self, ttl=3600, max_entries=10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # id -> (expires, flashes)
+
+    def put(self, flashes):
+        flash_id = new_flash_id()
+        with self._lock:
+            self._entries[flash_id] = (time.monotonic() + self.ttl, list(flashes))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return flash_id
+
+    def get(self, flash_id):
+        with self._lock:
+            entry = self._entries.get(flash_id)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[flash_id]
+                return None
+            self._entries.move_to_end(flash_id)
+            return list(entry[1])
+
+    def delete(self, flash_id):
+        with self._lock:
+            self._entries.pop(flash_id, None)
+
+
+class FileFlashStore:
+    """Pending flash messages as one file each, shared by every worker on the host"""
+
+    SWEEP_INTERVAL = 300  # Seconds between scans for expired files
+
+    def __init__(self, directory, ttl=3600):
+        self.directory = directory
+        self.ttl = ttl
+        self._next_sweep = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, flash_id):
+        if not FLASH_ID.match(flash_id):
+            raise ValueError(f"Invalid flash id: {flash_id!r}")
+        return os.path.join(self.directory, flash_id)
+
+    def put(self, flashes):
+        flash_id = new_flash_id()
+        path = self._path(flash_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(list(flashes), f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_path, path)
+        if time.monotonic() >= self._next_sweep:
+            self._next_sweep = time.monotonic() + self.SWEEP_INTERVAL
+            self.sweep()
+        return flash_id
+
+    def get(self, flash_id):
+        try:
+            path = self._path(flash_id)
+            with open(path, encoding='utf-8') as f:
+                if os.fstat(f.fileno()).st_mtime < time.time() - self.ttl:
+                    return None
+                return _decode(f.read())
+        except (OSError, ValueError):
+            return None
+
+    def delete(self, flash_id):
+        try:
+            os.remove(self._path(flash_id))
+        except (OSError, ValueError):
+            pass
+
+    def sweep(self):
+        """Remove messages nobody came back for"""
+        cutoff = time.time() - self.ttl
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                continue
+
+
+def open_flash_store(kind, data_dir, ttl=3600):
+    """Create the flash store for this worker process"""
+    if kind == 'memory':
+        return FlashStore(ttl)
+    if kind == 'file':
+        return FileFlashStore(os.path.join(data_dir, 'flashes'), ttl)
+    raise ValueError(f"Unknown flash store: {kind}")
+
+
+class FlashSessionInterface(SecureCookieSessionInterface):
+    """Signed cookie sessions whose flashed messages live in a flash store (get_flash_store opens it)"""
+
+    def __init__(self, get_flash_store):
+        self.get_flash_store = get_flash_store
+
+    def open_session(self, app, request):
+        session = super().open_session(app, request)
+        # dict methods throughout: reading through the session would mark it accessed (Vary: Cookie)
+        flash_id = dict.get(session, FLASH_ID_KEY) if session is not None else None
+        if flash_id:
+            flashes = self.get_flash_store().get(flash_id)
+            if flashes:
+                dict.__setitem__(session, FLASHES_KEY, flashes)  # Not a change - the cookie already points here
+            else:
+                session.pop(FLASH_ID_KEY)  # Expired - drop the dangling id from the cookie
+        return session
+
+    def save_session(self, app, session, response):
+        flashes = dict.pop(session, FLASHES_KEY, None)  # Never part of the cookie
+        if session.modified:
+            # Messages were added or shown (or something else changed) - store what is still pending
+            flash_store = self.get_flash_store()
+            old_id = dict.pop(session, FLASH_ID_KEY, None)
+            if old_id:
+                flash_store.delete(old_id)
+            if flashes:
+                dict.__setitem__(session, FLASH_ID_KEY, flash_store.put(flashes))
+        super().save_session(app, session, response)
@@ -0,0 +1,92 @@
+# LiftLink Carpool - Template fragment cache
+# Listing pages render the same ride cards over and over, though a card only
+# changes when its ride is edited or booked. Templates wrap a card in
+#   {% cache 'find_ride_card', ride.id, ride.version, ride.available_seats, ... %}
+#     ...
+#   {% endcache %}
+# and the rendered HTML is reused for as long as the key matches. The key is
+# everything the fragment depends on - a stale fragment can only be served
+# if something it shows is missing from its key.
+#
+# The cache is an LRU bounded by the total size of the stored HTML.
+
+import threading
+from collections import OrderedDict
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class FragmentCache:
+    """LRU of rendered fragments, evicting the least recently used past max_bytes"""
+
+    def __init__(self, max_bytes=8 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> html
+
+    def get(self, key):
+        with self._lock:
+            html = self._entries.get(key)
+            if html is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return html
+
+    def put(self, key, html):
+        cost = len(html)
+        if cost > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._entries[key] = html
+            self.size += cost
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class FragmentCacheExtension(Extension):
+    """{% cache name, key... %} ... {% endcache %} - renders the body once per distinct key
+
+    The environment's fragment_cache attribute holds the FragmentCache to use.
+    """
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        # name, then any number of key expressions
+        args = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cached', [nodes.List(args)]), [], [], body).set_lineno(lineno)
+
+    def _cached(self, key, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        key = tuple(key)
+        html = cache.get(key)
+        if html is None:
+            html = caller()
+            cache.put(key, html)
+        return html
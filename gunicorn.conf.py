@@ -0,0 +1,15 @@
+# LiftLink Carpool - gunicorn settings (picked up automatically from the working directory)
+# Importing main.py no longer opens the databases, so each worker opens its
+# own store right after it boots instead of on its first request.
+
+# Threaded workers: every open find_ride page holds a /events/seats stream,
+# which would tie up a whole sync worker. Each stream uses one thread, and
+# at most SSE_MAX_STREAMS (main.py) of them per worker - pages beyond that
+# poll, so the remaining threads always serve normal requests.
+worker_class = 'gthread'
+threads = 16
+
+
+def post_worker_init(worker):
+    from main import get_store
+    get_store()
@@ -0,0 +1,239 @@
+# LiftLink Carpool - Content-addressed profile picture store
+# Uploads are named by a hash of their bytes, so identical uploads share one
+# set of files and are only processed once. edit_profile just streams the
+# upload into a staging directory; decoding, resizing and encoding run on a
+# small thread pool (Pillow releases the GIL while it resamples and encodes),
+# so the request returns straight away.
+#
+# Each processed upload becomes a set of variants:
+#   <hash>_300.jpg  <hash>_300.webp  <hash>_128.jpg  <hash>_128.webp
+# The user record keeps 'profile_pic_pending' while that runs and only
+# points 'profile_pic' at <hash>_300.jpg once every file is written, so a
+# stored name always exists. Legacy random-named files are resolved from a
+# manifest read once per process - rendering a page never touches the disk.
+# Files no user references are garbage-collected in the background.
+
+import os
+import re
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Pillow is optional - without it uploads are stored as-is, still content-addressed
+try:
+    from PIL import Image, features
+    PIL_AVAILABLE = True
+    WEBP_AVAILABLE = features.check('webp')
+except ImportError:
+    PIL_AVAILABLE = False
+    WEBP_AVAILABLE = False
+
+# Largest first: the first size is the one stored on the user record
+PROFILE_SIZES = (300, 128)
+MAIN_EXT = 'jpg'
+
+# (extension, Pillow format, save options); the main JPEG must stay last
+VARIANT_FORMATS = [('jpg', 'JPEG', {'quality': 90, 'optimize': True, 'progressive': True})]
+if WEBP_AVAILABLE:
+    VARIANT_FORMATS.insert(0, ('webp', 'WEBP', {'quality': 82, 'method': 4}))
+
+# <32 hex digest>[_<size>].<ext>
+HASHED_NAME = re.compile(r'^([0-9a-f]{32})(?:_\d+)?\.[a-z0-9]+$')
+
+# Unreferenced files younger than this are left alone - another worker may be about to use them
+GC_GRACE_SECONDS = 15 * 60
+
+CHUNK_SIZE = 64 * 1024
+
+
+def variant_name(stem, size, ext):
+    return f"{stem}_{size}.{ext}"
+
+
+def main_variant(stem):
+    """Filename stored on the user record for a processed upload"""
+    return variant_name(stem, PROFILE_SIZES[0], MAIN_EXT)
+
+
+def picture_stem(name):
+    """Content hash behind a stored name, or None for legacy random-named files"""
+    match = HASHED_NAME.match(name)
+    return match.group(1) if match else None
+
+
+def picture_variants(picture, ext):
+    """[(filename, width)] for every size of a processed upload; [] for single-file pictures"""
+    stem = picture_stem(picture) if picture else None
+    if stem is None or picture != main_variant(stem):
+        return []
+    if ext == 'webp' and not WEBP_AVAILABLE:
+        return []
+    return [(variant_name(stem, size, ext), size) for size in PROFILE_SIZES]
+
+
+class PictureStore:
+    """Content-addressed picture directory with an in-memory manifest and a bounded processing pool"""
+
+    def __init__(self, directory, staging_dir, workers=2, max_pending=16):
+        self.directory = directory
+        self.staging_dir = staging_dir
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._in_flight = {}  # stem -> on_done callbacks waiting for it
+        os.makedirs(directory, exist_ok=True)
+        os.makedirs(staging_dir, exist_ok=True)
+        # The one directory listing this process makes; kept current by add and collect_garbage
+        self.names = {entry.name for entry in os.scandir(directory) if entry.is_file()}
+
+    def exists(self, name):
+        """Hashed names are only stored on a user once written; legacy names come from the manifest"""
+        return picture_stem(name) is not None or name in self.names
+
+    def add(self, upload, on_queued, on_done):
+        """Store an uploaded FileStorage; returns (name, ready)
+
+        When ready is False the picture is still being processed: on_queued(name)
+        has been called first (to record it as pending) and on_done(name, ok) is
+        called from a worker thread once it has finished.
+        """
+        staged, stem, ext = self._stage(upload)
+        name = main_variant(stem) if PIL_AVAILABLE else f"{stem}.{ext}"
+
+        # Same bytes as an earlier upload - reuse its files
+        if name in self.names and self._touch(name):
+            os.remove(staged)
+            return name, True
+
+        if not PIL_AVAILABLE:
+            os.replace(staged, os.path.join(self.directory, name))
+            self.names.add(name)
+            return name, True
+
+        # Reading the header is cheap and rejects non-images while the user is still here
+        try:
+            with Image.open(staged):
+                pass
+        except Exception:
+            os.remove(staged)
+            raise ValueError("That file is not an image we can read")
+
+        # Recorded before any job can finish, so on_done always finds it
+        on_queued(name)
+        with self._lock:
+            waiters = self._in_flight.get(stem)
+            if waiters is not None:
+                waiters.append(on_done)  # Identical upload already being processed
+            else:
+                self._in_flight[stem] = [on_done]
+        if waiters is not None:
+            os.remove(staged)
+            return name, False
+        if self._slots.acquire(blocking=False):
+            self._executor.submit(self._run, staged, stem)
+            return name, False
+
+        # Queue is full - process in this request rather than queue without bound
+        print(f"⏳ Image queue full, processing {stem} inline")
+        if not self._finish(stem, self._process(staged, stem)):
+            raise ValueError("That image could not be processed")
+        return name, True
+
+    def _stage(self, upload):
+        """Copy the upload into staging while hashing it; returns (path, hash, extension)"""
+        _, ext = os.path.splitext(upload.filename or '')
+        ext = ext.lower().lstrip('.') or 'bin'
+        digest = hashlib.blake2b(digest_size=16)
+        tmp_path = os.path.join(self.staging_dir, f".upload-{os.getpid()}-{threading.get_ident()}")
+        with open(tmp_path, 'wb') as f:
+            for chunk in iter(lambda: upload.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                f.write(chunk)
+        stem = digest.hexdigest()
+        # Unique per upload: an identical upload arriving meanwhile must not touch this copy
+        staged = os.path.join(self.staging_dir, f"{stem}.{os.getpid()}-{threading.get_ident()}.{ext}")
+        os.replace(tmp_path, staged)
+        return staged, stem, ext
+
+    def _touch(self, name):
+        """Refresh a reused file's age so garbage collection keeps it; False if it has gone"""
+        try:
+            os.utime(os.path.join(self.directory, name))
+            return True
+        except OSError:
+            self.names.discard(name)  # Collected by another worker
+            return False
+
+    def _run(self, staged, stem):
+        try:
+            self._finish(stem, self._process(staged, stem))
+        finally:
+            self._slots.release()
+
+    def _finish(self, stem, ok):
+        with self._lock:
+            waiters = self._in_flight.pop(stem, [])
+        for on_done in waiters:
+            try:
+                on_done(main_variant(stem), ok)
+            except Exception as e:
+                print(f"✗ Profile picture callback failed for {stem}: {e}")
+        return ok
+
+    def _process(self, staged, stem):
+        """Write every variant for a staged upload, then remove it; returns True on success"""
+        try:
+            with Image.open(staged) as img:
+                # JPEG can decode at a reduced scale directly - far less work for phone photos
+                img.draft('RGB', (PROFILE_SIZES[0] * 2, PROFILE_SIZES[0] * 2))
+                img = img.convert('RGB') if img.mode != 'RGB' else img.copy()
+            # Smallest first, so the main variant (largest size, JPEG) is the last file to appear
+            for size in reversed(PROFILE_SIZES):
+                variant = img.copy()
+                variant.thumbnail((size, size), Image.Resampling.LANCZOS)
+                for ext, fmt, options in VARIANT_FORMATS:
+                    name = variant_name(stem, size, ext)
+                    path = os.path.join(self.directory, name)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    variant.save(tmp_path, fmt, **options)
+                    os.replace(tmp_path, path)
+                    self.names.add(name)
+            print(f"✓ Profile picture processed: {main_variant(stem)}")
+            return True
+        except Exception as e:
+            print(f"✗ Profile picture processing failed for {stem}: {e}")
+            return False
+        finally:
+            try:
+                os.remove(staged)
+            except OSError:
+                pass
+
+    def collect_garbage(self, referenced):
+        """Delete files no user references (referenced: stored picture names); returns the count removed"""
+        with self._lock:
+            keep_stems = ({picture_stem(name) for name in referenced} | set(self._in_flight)) - {None}
+        cutoff = time.time() - GC_GRACE_SECONDS
+        removed = 0
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or entry.name in referenced or picture_stem(entry.name) in keep_stems:
+                continue
+            try:
+                if entry.stat().st_mtime > cutoff:
+                    continue
+                os.remove(entry.path)
+            except OSError:
+                continue
+            self.names.discard(entry.name)
+            removed += 1
+        if removed:
+            print(f"✓ Removed {removed} unreferenced profile picture files")
+        return removed
+
+    def submit(self, fn, *args):
+        """Run a maintenance job (e.g. garbage collection) on the image pool"""
+        return self._executor.submit(fn, *args)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
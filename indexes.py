@@ -0,0 +1,257 @@
+# LiftLink Carpool - In-memory indexes for the JSON storage backend
+# Kept up to date incrementally by JsonStore so routes never scan whole tables.
+# Not thread-safe on their own: JsonStore reads and writes them under its store lock.
+
+import bisect
+from collections import defaultdict
+
+
+def trigrams(text):
+    """All 3-character substrings of text"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SubstringIndex:
+    """Trigram inverted index answering case-insensitive substring queries
+
+    search(query) returns exactly the keys whose text satisfies
+    query.lower() in text.lower() - posting lists only narrow the candidates,
+    every candidate is then checked against its pre-lowered text.
+
+    Postings point at distinct lowered texts rather than keys: pickup points
+    repeat across thousands of rides, so adding a ride with a known location
+    is a dict lookup instead of a trigram walk.
+    """
+
+    def __init__(self):
+        self.postings = defaultdict(set)  # trigram -> lowered texts
+        self.keys_by_text = {}  # lowered text -> keys
+        self.lowered = {}  # key -> lowered text
+
+    def add(self, key, text):
+        lowered = text.lower()
+        self.lowered[key] = lowered
+        keys = self.keys_by_text.get(lowered)
+        if keys is None:
+            keys = self.keys_by_text[lowered] = set()
+            for gram in trigrams(lowered):
+                self.postings[gram].add(lowered)
+        keys.add(key)
+
+    def remove(self, key):
+        lowered = self.lowered.pop(key, None)
+        if lowered is None:
+            return
+        keys = self.keys_by_text[lowered]
+        keys.discard(key)
+        if keys:
+            return
+        del self.keys_by_text[lowered]
+        for gram in trigrams(lowered):
+            texts = self.postings.get(gram)
+            if texts is not None:
+                texts.discard(lowered)
+                if not texts:
+                    del self.postings[gram]
+
+    def update(self, key, text):
+        if self.lowered.get(key) == text.lower():
+            return
+        self.remove(key)
+        self.add(key, text)
+
+    def clear(self):
+        self.postings.clear()
+        self.keys_by_text.clear()
+        self.lowered.clear()
+
+    def search(self, query):
+        """Keys whose text contains query, ignoring case"""
+        needle = query.lower()
+        if len(needle) < 3:
+            # Too short for trigrams - scan the distinct texts instead
+            texts = [text for text in self.keys_by_text if needle in text]
+        else:
+            posting_lists = []
+            for gram in trigrams(needle):
+                candidates = self.postings.get(gram)
+                if not candidates:
+                    return set()
+                posting_lists.append(candidates)
+            posting_lists.sort(key=len)
+
+            candidates = set(posting_lists[0])
+            for texts in posting_lists[1:]:
+                candidates &= texts
+                if not candidates:
+                    return set()
+            # Trigrams can match out of order - confirm the real substring
+            texts = [text for text in candidates if needle in text]
+        return set().union(*(self.keys_by_text[text] for text in texts))
+
+
+class DatePartitionIndex:
+    """Rides bucketed by date, each bucket sorted by (departure_time, id)
+
+    Date-filtered and upcoming searches walk only the buckets they need and
+    get rides back already in display order.
+    """
+
+    def __init__(self):
+        self.dates = []  # Sorted partition keys
+        self.partitions = {}  # date -> sorted [(departure_time, id)]
+        self.placement = {}  # id -> (date, departure_time)
+
+    def add(self, ride_id, ride_date, departure_time):
+        placement = (ride_date, departure_time)
+        current = self.placement.get(ride_id)
+        if current == placement:
+            return
+        if current is not None:
+            self.remove(ride_id)
+        if ride_date not in self.partitions:
+            bisect.insort(self.dates, ride_date)
+            self.partitions[ride_date] = []
+        bisect.insort(self.partitions[ride_date], (departure_time, ride_id))
+        self.placement[ride_id] = placement
+
+    def remove(self, ride_id):
+        placement = self.placement.pop(ride_id, None)
+        if placement is None:
+            return
+        ride_date, departure_time = placement
+        bucket = self.partitions[ride_date]
+        bucket.pop(bisect.bisect_left(bucket, (departure_time, ride_id)))
+        if not bucket:
+            del self.partitions[ride_date]
+            self.dates.pop(bisect.bisect_left(self.dates, ride_date))
+
+    def clear(self):
+        self.dates.clear()
+        self.partitions.clear()
+        self.placement.clear()
+
+    def rebuild(self, entries):
+        """Replace the contents with (id, date, departure_time) entries, sorting each bucket once"""
+        self.clear()
+        for ride_id, ride_date, departure_time in entries:
+            self.placement[ride_id] = (ride_date, departure_time)
+            self.partitions.setdefault(ride_date, []).append((departure_time, ride_id))
+        for bucket in self.partitions.values():
+            bucket.sort()
+        self.dates.extend(sorted(self.partitions))
+
+    def ids_on(self, ride_date, after=None):
+        """Ride ids on one date, in departure order
+
+        after is an optional (date, departure_time, id) key; only rides sorting
+        after it are returned, for keyset pagination.
+        """
+        return list(self._bucket_ids(ride_date, after))
+
+    def count_on(self, ride_date):
+        return len(self.partitions.get(ride_date, ()))
+
+    def ids_from(self, first_date, after=None):
+        """Ride ids from first_date onwards, in (date, departure) order, optionally after a key"""
+        if after is not None and after[0] > first_date:
+            first_date = after[0]
+        for ride_date in self.dates[bisect.bisect_left(self.dates, first_date):]:
+            yield from self._bucket_ids(ride_date, after)
+
+    def _bucket_ids(self, ride_date, after):
+        bucket = self.partitions.get(ride_date, [])
+        start = 0
+        if after is not None:
+            if after[0] > ride_date:
+                return
+            if after[0] == ride_date:
+                start = bisect.bisect_right(bucket, (after[1], after[2]))
+        for _, ride_id in bucket[start:]:
+            yield ride_id
+
+    def count_from(self, first_date):
+        return sum(len(self.partitions[d]) for d in self.dates[bisect.bisect_left(self.dates, first_date):])
+
+    def ids_before(self, cutoff_date):
+        """Ride ids in partitions strictly before cutoff_date"""
+        return [ride_id for ride_date in self.dates[:bisect.bisect_left(self.dates, cutoff_date)]
+                for _, ride_id in self.partitions[ride_date]]
+
+
+def earning_sort_key(earning):
+    # Ids break ties between records written in the same minute
+    return (earning['date'], earning['time'], earning['id'])
+
+
+class DriverLedger:
+    """One driver's earnings: records in time order plus running totals and rollups"""
+
+    def __init__(self, records=()):
+        self.records = []  # Oldest first, ordered by earning_sort_key
+        self.keys = []  # earning_sort_key of each record, for bisect
+        self.by_id = {}
+        self.total = 0
+        self.count = 0
+        self.daily = {}  # 'YYYY-MM-DD' -> [amount, count]
+        self.monthly = {}  # 'YYYY-MM' -> [amount, count]
+        for record in sorted(records, key=earning_sort_key):
+            self.add(record)
+
+    def add(self, record):
+        """Add a record, replacing any earlier record with the same id"""
+        if record['id'] in self.by_id:
+            self._remove(self.by_id[record['id']])
+        key = earning_sort_key(record)
+        position = bisect.bisect(self.keys, key)  # New records almost always land at the end
+        self.keys.insert(position, key)
+        self.records.insert(position, record)
+        self.by_id[record['id']] = record
+        self._tally(record, 1)
+
+    def _remove(self, record):
+        position = bisect.bisect_left(self.keys, earning_sort_key(record))
+        del self.keys[position]
+        del self.records[position]
+        del self.by_id[record['id']]
+        self._tally(record, -1)
+
+    def _tally(self, record, sign):
+        amount = record['amount'] * sign
+        self.total += amount
+        self.count += sign
+        for rollup, period in ((self.daily, record['date']), (self.monthly, record['date'][:7])):
+            bucket = rollup.setdefault(period, [0, 0])
+            bucket[0] += amount
+            bucket[1] += sign
+            if not bucket[1]:
+                del rollup[period]
+
+    def newest_first(self, before=None, limit=None):
+        """Records newest first, optionally only those sorting before a key, at most limit of them"""
+        end = len(self.keys) if before is None else bisect.bisect_left(self.keys, before)
+        start = 0 if limit is None else max(0, end - limit)
+        return self.records[start:end][::-1]
+
+
+class EarningsLedger:
+    """Per-driver ledgers, built from the earnings table the first time a driver is looked up"""
+
+    def __init__(self):
+        self.drivers = {}
+
+    def get(self, driver_email):
+        return self.drivers.get(driver_email)
+
+    def build(self, driver_email, records):
+        ledger = self.drivers[driver_email] = DriverLedger(records)
+        return ledger
+
+    def add(self, driver_email, record):
+        """Apply a new record; drivers not built yet pick it up when they are"""
+        ledger = self.drivers.get(driver_email)
+        if ledger is not None:
+            ledger.add(record)
+
+    def clear(self):
+        self.drivers.clear()
@@ -3,66 +3,93 @@
 # Version 10.0 - One Booking Per User, Emergency Contacts, Enhanced Communication
 
 import os
-import sys
-import json
 import urllib.parse
 from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory, jsonify
-from werkzeug.utils import secure_filename
-from functools import wraps
+from flask import Response, stream_template, get_flashed_messages, g, make_response, has_request_context
+from werkzeug.security import safe_join
+from werkzeug.local import LocalProxy
+from functools import wraps, lru_cache
 import hashlib
-import secrets
+import threading
+import time
+from collections import OrderedDict, ChainMap
 from datetime import datetime, date
-
-# Try to import PIL for image processing, fallback if not available
-try:
-    from PIL import Image
-    PIL_AVAILABLE = True
-except ImportError:
-    PIL_AVAILABLE = False
-    print("PIL not available - images will be saved without resizing")
-
-# Ensure we're in the right directory
-script_dir = os.path.dirname(os.path.abspath(__file__))
-os.chdir(script_dir)
-
-# Debug info
-print("=" * 60)
-print(" LIFTLINK CARPOOL - ENHANCED VERSION 10.0")
-print("=" * 60)
-print(f"Current directory: {os.getcwd()}")
-print(f"Templates exist: {os.path.exists('templates')}")
-print(f"Static folder exists: {os.path.exists('static')}")
-
-if os.path.exists('templates'):
-    try:
-        print(f"Template files: {os.listdir('templates')}")
-    except PermissionError:
-        print("Permission denied accessing templates folder")
-
-print("=" * 60)
+from storage import open_store, ReservationError, encode_cursor, decode_cursor, ride_sort_key
+from indexes import earning_sort_key
+from events import open_seat_broker, seat_event, format_sse
+from images import PictureStore, picture_variants, picture_stem
+from passwords import PasswordHasher, ScryptHasher
+from flashes import FlashSessionInterface, open_flash_store
+from fragments import FragmentCache, FragmentCacheExtension
+from metrics import Registry, Counter, TimedStore, install_structured_logging
 
 # Initialize Flask app
 app = Flask(__name__)
 app.secret_key = 'xie-liftlink-secretkey-2025-enhanced-v10'
 
-# Profile Picture Configuration
+# Profile Picture Configuration (relative paths resolve against app.root_path)
 UPLOAD_FOLDER = 'static/uploads/profilepics'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
 
-# Create upload directory if it doesn't exist
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-os.makedirs('static/uploads', exist_ok=True)
-os.makedirs('static/images', exist_ok=True)
-os.makedirs('data', exist_ok=True)  # Create data directory for persistent storage
-
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# File paths for persistent storage
-USERS_DB_FILE = 'data/users_db.json'
-RIDES_DB_FILE = 'data/rides_db.json'
-BOOKINGS_DB_FILE = 'data/bookings_db.json'
-EARNINGS_DB_FILE = 'data/earnings_db.json'
+# Uploads wait here until the background image workers have produced every size
+app.config['UPLOAD_STAGING_FOLDER'] = 'static/uploads/staging'
+app.config['IMAGE_WORKERS'] = 2
+# Unreferenced picture files are swept at most this often per worker
+app.config['PICTURE_GC_INTERVAL'] = 3600
+
+# Persistent storage - 'json' (snapshots + write-ahead log) or 'sqlite'
+app.config['DATA_DIR'] = os.environ.get('LIFTLINK_DATA_DIR', os.path.join(app.root_path, 'data'))
+app.config['STORAGE_BACKEND'] = os.environ.get('LIFTLINK_STORAGE_BACKEND', 'json')
+# Rows per page on find_ride, my_rides and earnings_history (keyset pagination)
+app.config['PAGE_SIZE'] = 20
+# JSON backend snapshot files - 'json' or 'binary' (memory-mapped, faster worker boot)
+app.config['SNAPSHOT_FORMAT'] = os.environ.get('LIFTLINK_SNAPSHOT_FORMAT', 'json')
+# Live seat updates - 'file' shares events between gunicorn workers, 'memory' is single-process only
+app.config['SEAT_EVENT_BROKER'] = os.environ.get('LIFTLINK_SEAT_EVENT_BROKER', 'file')
+# Each open stream holds a worker thread, so keep this well below gunicorn's threads;
+# pages turned away poll /events/seats/current instead
+app.config['SSE_MAX_STREAMS'] = int(os.environ.get('LIFTLINK_SSE_MAX_STREAMS', 4))
+# Flashed messages wait server-side; the session cookie only carries their id
+# ('file' works across gunicorn workers, 'memory' is single-process only)
+app.config['FLASH_STORE'] = os.environ.get('LIFTLINK_FLASH_STORE', 'file')
+app.config['FLASH_TTL'] = 3600
+# Instrumentation - per-route and storage latency, served as Prometheus text on /metrics
+app.config['METRICS_ENABLED'] = os.environ.get('LIFTLINK_METRICS', '1') != '0'
+# 'text' prints as usual; 'json' turns every print into a buffered structured log record
+app.config['LOG_FORMAT'] = os.environ.get('LIFTLINK_LOG_FORMAT', 'text')
+# Rendered ride cards kept per worker, keyed by ride version and viewer state (LRU, bytes of HTML)
+app.config['FRAGMENT_CACHE_BYTES'] = 8 * 1024 * 1024
+# Password hashing - scrypt cost is log2 of N (14 = 16 MB and ~50 ms per hash); older hashes
+# are upgraded on the next successful login. Workers bound concurrent hashes per process
+app.config['PASSWORD_HASH_COST'] = int(os.environ.get('LIFTLINK_PASSWORD_HASH_COST', 14))
+app.config['PASSWORD_HASH_WORKERS'] = 4
+# Logged-in users kept materialized per worker (LRU)
+app.config['USER_CACHE_SIZE'] = 1024
+
+# Metrics (see metrics.py) - recorded by the request hooks, TimedStore and book_ride
+metrics = Registry()
+REQUEST_SECONDS = metrics.histogram('liftlink_request_duration_seconds',
+                                    'Time to produce each response (streamed pages: until the first byte)',
+                                    ('endpoint', 'method'))
+REQUESTS = metrics.counter('liftlink_requests_total', 'Responses by endpoint and status', ('endpoint', 'method', 'status'))
+STORAGE_SECONDS = metrics.histogram('liftlink_storage_operation_seconds', 'Storage backend call latency',
+                                    ('operation', 'kind'))
+BOOKINGS = metrics.counter('liftlink_booking_attempts_total',
+                           'book_ride outcomes - full and already_booked rise when many people chase one ride',
+                           ('outcome',))
+# Counted here for the caches main.py owns; reported with the others by collect_cache_lookups
+CACHE_LOOKUPS = Counter('liftlink_cache_lookups', 'Cache lookups counted in main.py', ('cache', 'result'))
+
+def log_context():
+    """Fields added to structured log records printed while handling a request"""
+    if has_request_context():
+        return {'endpoint': request.endpoint, 'method': request.method, 'path': request.path}
+    return {}
+
+if app.config['LOG_FORMAT'] == 'json':
+    install_structured_logging(log_context)
 
 # Profile Picture Helper Functions
 def allowed_file(filename):
@@ -70,146 +97,80 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def save_picture(form_picture, current_user_email):
-    """Save and optionally resize profile picture"""
-    random_hex = secrets.token_hex(8)
-    _, f_ext = os.path.splitext(form_picture.filename)
-    picture_fn = f"{current_user_email.replace('@', '_').replace('.', '_')}_{random_hex}{f_ext}"
-    picture_path = os.path.join(app.root_path, 'static', 'uploads', 'profilepics', picture_fn)
-    
-    # Create directory if it doesn't exist
-    os.makedirs(os.path.dirname(picture_path), exist_ok=True)
-    
-    if PIL_AVAILABLE:
-        output_size = (300, 300)
-        try:
-            img = Image.open(form_picture)
-            # Convert to RGB if it's RGBA for PNG with transparency
-            if img.mode == 'RGBA':
-                img = img.convert('RGB')
-            img.thumbnail(output_size, Image.Resampling.LANCZOS)
-            img.save(picture_path, quality=90, optimize=True)
-            print(f"✓ Profile picture saved and resized: {picture_fn}")
-        except Exception as e:
-            print(f"✗ PIL resize failed, saving directly: {e}")
-            form_picture.save(picture_path)
-    else:
-        # If PIL is not available, just save the file directly
-        form_picture.save(picture_path)
-        print(f"✓ Profile picture saved: {picture_fn}")
+    """Store a profile picture by content hash; returns (filename, ready)
+
+    Resizing runs in the background (see images.py). Until it finishes the
+    user record holds the name in 'profile_pic_pending', and picture_processed
+    moves it to 'profile_pic'.
+    """
+    def mark_pending(picture_fn):
+        store.update_user(current_user_email, {'profile_pic_pending': picture_fn})
     
-    # Verify file was saved
-    if os.path.exists(picture_path):
-        file_size = os.path.getsize(picture_path)
-        print(f"✓ File saved successfully: {picture_path} ({file_size} bytes)")
-    else:
-        print(f"✗ File NOT saved: {picture_path}")
+    def on_processed(picture_fn, ok):
+        picture_processed(current_user_email, picture_fn, ok)
     
-    return picture_fn
-
-# Persistent Storage Functions
+    picture_fn, ready = picture_store.add(form_picture, mark_pending, on_processed)
+    print(f"✓ Profile picture {'saved' if ready else 'queued for processing'}: {picture_fn}")
+    return picture_fn, ready
+
+def picture_processed(user_email, picture_fn, ok):
+    """Point the user at their new picture once every size exists (runs on an image worker)"""
+    with store.transaction():
+        user_data = store.get_user(user_email)
+        if not user_data or user_data.get('profile_pic_pending') != picture_fn:
+            return  # Replaced by a newer upload meanwhile
+        updates = {'profile_pic_pending': None}
+        if ok:
+            updates['profile_pic'] = picture_fn
+        store.update_user(user_email, updates)
+    forget_user(user_email)
+    if ok:
+        schedule_picture_gc()
+
+_last_picture_gc = None
+
+def schedule_picture_gc():
+    """Sweep picture files no user references any more, on the image pool, at most once per interval"""
+    global _last_picture_gc
+    now = time.monotonic()
+    if _last_picture_gc is not None and now - _last_picture_gc < app.config['PICTURE_GC_INTERVAL']:
+        return
+    _last_picture_gc = now
+    pictures, users = get_picture_store(), get_store()
+    pictures.submit(lambda: pictures.collect_garbage(users.profile_pictures()))
+
+# Persistent Storage Functions - thin wrappers over the configured backend (see storage.py)
 def load_users_db():
-    """Load users database from JSON file"""
-    try:
-        if os.path.exists(USERS_DB_FILE):
-            with open(USERS_DB_FILE, 'r', encoding='utf-8') as f:
-                users_data = json.load(f)
-                print(f"✓ Loaded {len(users_data)} users from database")
-                return users_data
-        else:
-            print("Creating new users database...")
-            return get_default_users()
-    except Exception as e:
-        print(f"✗ Error loading users database: {e}")
-        return get_default_users()
+    """Load users database from the storage backend"""
+    return store.load_users()
 
 def save_users_db(users_data):
-    """Save users database to JSON file"""
-    try:
-        with open(USERS_DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(users_data, f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved {len(users_data)} users to database")
-        return True
-    except Exception as e:
-        print(f"✗ Error saving users database: {e}")
-        return False
+    """Save users database to the storage backend"""
+    return store.save_users(users_data)
 
 def load_rides_db():
-    """Load rides database from JSON file"""
-    try:
-        if os.path.exists(RIDES_DB_FILE):
-            with open(RIDES_DB_FILE, 'r', encoding='utf-8') as f:
-                rides_data = json.load(f)
-                print(f"✓ Loaded {len(rides_data)} rides from database")
-                return rides_data
-        else:
-            print("Creating new rides database...")
-            return get_default_rides()
-    except Exception as e:
-        print(f"✗ Error loading rides database: {e}")
-        return get_default_rides()
+    """Load rides database from the storage backend"""
+    return store.load_rides()
 
 def save_rides_db(rides_data):
-    """Save rides database to JSON file"""
-    try:
-        with open(RIDES_DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(rides_data, f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved {len(rides_data)} rides to database")
-        return True
-    except Exception as e:
-        print(f"✗ Error saving rides database: {e}")
-        return False
+    """Save rides database to the storage backend"""
+    return store.save_rides(rides_data)
 
 def load_bookings_db():
-    """Load bookings database from JSON file"""
-    try:
-        if os.path.exists(BOOKINGS_DB_FILE):
-            with open(BOOKINGS_DB_FILE, 'r', encoding='utf-8') as f:
-                bookings_data = json.load(f)
-                print(f"✓ Loaded {len(bookings_data)} bookings from database")
-                return bookings_data
-        else:
-            print("Creating new bookings database...")
-            return []
-    except Exception as e:
-        print(f"✗ Error loading bookings database: {e}")
-        return []
+    """Load bookings database from the storage backend"""
+    return store.load_bookings()
 
 def save_bookings_db(bookings_data):
-    """Save bookings database to JSON file"""
-    try:
-        with open(BOOKINGS_DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(bookings_data, f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved {len(bookings_data)} bookings to database")
-        return True
-    except Exception as e:
-        print(f"✗ Error saving bookings database: {e}")
-        return False
+    """Save bookings database to the storage backend"""
+    return store.save_bookings(bookings_data)
 
 def load_earnings_db():
-    """Load earnings database from JSON file"""
-    try:
-        if os.path.exists(EARNINGS_DB_FILE):
-            with open(EARNINGS_DB_FILE, 'r', encoding='utf-8') as f:
-                earnings_data = json.load(f)
-                print(f"✓ Loaded earnings data from database")
-                return earnings_data
-        else:
-            print("Creating new earnings database...")
-            return {}
-    except Exception as e:
-        print(f"✗ Error loading earnings database: {e}")
-        return {}
+    """Load earnings database from the storage backend"""
+    return store.load_earnings()
 
 def save_earnings_db(earnings_data):
-    """Save earnings database to JSON file"""
-    try:
-        with open(EARNINGS_DB_FILE, 'w', encoding='utf-8') as f:
-            json.dump(earnings_data, f, indent=2, ensure_ascii=False)
-        print(f"✓ Saved earnings data to database")
-        return True
-    except Exception as e:
-        print(f"✗ Error saving earnings database: {e}")
-        return False
+    """Save earnings database to the storage backend"""
+    return store.save_earnings(earnings_data)
 
 def get_default_users():
     """Get default users for first-time setup"""
@@ -275,17 +236,122 @@ def get_default_rides():
         }
     ]
 
-# Initialize persistent databases
-users_db = load_users_db()
-sample_rides = load_rides_db()
-bookings_db = load_bookings_db()
-earnings_db = load_earnings_db()
+# Persistent databases - opened on first use in each worker process, so importing
+# this module (gunicorn pre-fork, tests) touches no files
+_store_lock = threading.Lock()
+
+def get_store():
+    """Open the configured storage backend once per process"""
+    opened = app.extensions.get('liftlink_store')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_store')
+            if opened is None:
+                os.makedirs(app.config['DATA_DIR'], exist_ok=True)
+                opened = open_store(app.config['STORAGE_BACKEND'], app.config['DATA_DIR'],
+                                    get_default_users, get_default_rides,
+                                    snapshot_format=app.config['SNAPSHOT_FORMAT'])
+                if app.config['METRICS_ENABLED']:
+                    opened = TimedStore(opened, STORAGE_SECONDS)
+                app.extensions['liftlink_store'] = opened
+    return opened
+
+store = LocalProxy(get_store)
+
+def get_seat_broker():
+    """Create the live seat event broker once per process"""
+    opened = app.extensions.get('liftlink_seats')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_seats')
+            if opened is None:
+                os.makedirs(app.config['DATA_DIR'], exist_ok=True)
+                opened = open_seat_broker(app.config['SEAT_EVENT_BROKER'], app.config['DATA_DIR'])
+                app.extensions['liftlink_seats'] = opened
+    return opened
+
+seat_broker = LocalProxy(get_seat_broker)
+
+def get_picture_store():
+    """Open the profile picture store (manifest + image workers) once per process"""
+    opened = app.extensions.get('liftlink_images')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_images')
+            if opened is None:
+                opened = PictureStore(os.path.join(app.root_path, app.config['UPLOAD_FOLDER']),
+                                      os.path.join(app.root_path, app.config['UPLOAD_STAGING_FOLDER']),
+                                      workers=app.config['IMAGE_WORKERS'])
+                app.extensions['liftlink_images'] = opened
+    return opened
+
+picture_store = LocalProxy(get_picture_store)
+
+def get_password_hasher():
+    """Create the password hasher (and its KDF threads) once per process"""
+    opened = app.extensions.get('liftlink_passwords')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_passwords')
+            if opened is None:
+                opened = PasswordHasher(ScryptHasher(cost=app.config['PASSWORD_HASH_COST']),
+                                        workers=app.config['PASSWORD_HASH_WORKERS'])
+                app.extensions['liftlink_passwords'] = opened
+    return opened
+
+password_hasher = LocalProxy(get_password_hasher)
+
+def get_flash_store():
+    """Open the server-side flash message store once per process"""
+    opened = app.extensions.get('liftlink_flashes')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_flashes')
+            if opened is None:
+                opened = open_flash_store(app.config['FLASH_STORE'], app.config['DATA_DIR'],
+                                          ttl=app.config['FLASH_TTL'])
+                app.extensions['liftlink_flashes'] = opened
+    return opened
+
+app.session_interface = FlashSessionInterface(get_flash_store)
+
+def get_fragment_cache():
+    """Create the rendered-fragment cache ({% cache %} in templates) once per process"""
+    opened = app.extensions.get('liftlink_fragments')
+    if opened is None:
+        with _store_lock:
+            opened = app.extensions.get('liftlink_fragments')
+            if opened is None:
+                opened = FragmentCache(app.config['FRAGMENT_CACHE_BYTES'])
+                app.extensions['liftlink_fragments'] = opened
+    return opened
+
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.fragment_cache = LocalProxy(get_fragment_cache)
+
+def create_app(config=None):
+    """Application factory: apply config overrides; the store opens lazily on first request"""
+    if config:
+        app.config.update(config)
+        if app.config['LOG_FORMAT'] == 'json':
+            install_structured_logging(log_context)
+        app.extensions.pop('liftlink_store', None)  # Re-open with the new settings
+        app.extensions.pop('liftlink_seats', None)
+        app.extensions.pop('liftlink_images', None)
+        app.extensions.pop('liftlink_passwords', None)
+        app.extensions.pop('liftlink_flashes', None)
+        app.extensions.pop('liftlink_fragments', None)
+        with _user_cache_lock:
+            _user_cache.clear()
+    return app
 
 class User:
     """Enhanced User class with emergency contacts"""
-    def __init__(self, email):
+    __slots__ = ('email', 'data')
+
+    def __init__(self, email, data=None):
         self.email = email
-        self.data = users_db.get(email, {})
+        self.data = data if data is not None else store.get_user(email) or {}
         if not self.data:
             print(f"User not found in database: {email}")
 
@@ -348,20 +414,147 @@ class User:
     @property
     def profile_pic(self):
         pic = self.data.get('profile_pic', None)
-        if pic:
-            # Verify file exists
-            pic_path = os.path.join(app.root_path, 'static', 'uploads', 'profilepics', pic)
-            if os.path.exists(pic_path):
-                return pic
-            else:
-                print(f"Profile picture file not found: {pic_path}")
-                return None
+        # Resolved from the picture store's manifest - rendering never touches the disk
+        if pic and picture_store.exists(pic):
+            return pic
         return None
 
+    @property
+    def profile_pic_processing(self):
+        """Upload accepted but still being resized - pages show a placeholder meanwhile"""
+        return bool(self.data.get('profile_pic_pending'))
+
+    def profile_pic_variants(self, ext):
+        """(filename, width) for each resized copy of the picture, for srcset"""
+        return picture_variants(self.profile_pic, ext)
+
     @property
     def verified(self):
         return self.data.get('verified', False)
 
+# Materialized User views shared by every request in this worker, least recently used first.
+# Each entry remembers the users-table version it was read at, so a change made by any
+# worker is never served stale; edit_profile and register also drop entries directly
+_user_cache = OrderedDict()
+_user_cache_lock = threading.Lock()
+
+def load_user(email):
+    """User view for email from the per-worker LRU, or None if there is no such user"""
+    version = store.users_version()  # Read first - an entry may be older than its tag, never newer
+    with _user_cache_lock:
+        cached = _user_cache.get(email)
+        if cached is not None and cached[0] == version:
+            _user_cache.move_to_end(email)
+            CACHE_LOOKUPS.inc('users', 'hit')
+            return cached[1]
+    CACHE_LOOKUPS.inc('users', 'miss')
+    user_data = store.get_user(email)
+    if user_data is None:
+        return None
+    user = User(email, user_data)
+    with _user_cache_lock:
+        _user_cache[email] = (version, user)
+        _user_cache.move_to_end(email)
+        while len(_user_cache) > app.config['USER_CACHE_SIZE']:
+            _user_cache.popitem(last=False)
+    return user
+
+def forget_user(email):
+    """Drop a cached User view after its record changes"""
+    with _user_cache_lock:
+        _user_cache.pop(email, None)
+
+def current_user():
+    """The logged-in User, resolved once per request (login_required already did it)"""
+    if 'user' not in g:
+        g.user = load_user(session['user_email'])
+    return g.user
+
+# Registered first, so the timing covers the other before_request hooks too
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+        REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+# Pick up changes other gunicorn workers wrote before handling each request
+@app.before_request
+def sync_shared_state():
+    # Read the generation first: the data seen after refresh is at least this new,
+    # so an ETag can only ever be older than the page it labels, never newer
+    g.data_generation = store.generation()
+    store.refresh()
+
+# Conditional GETs - listings carry a weak ETag derived from the data generation, so a
+# refresh with nothing changed is answered with 304 before any query or rendering
+_etag_salt = None
+
+def etag_salt():
+    """Changes when the code or templates change, so a deploy invalidates cached pages"""
+    global _etag_salt
+    if _etag_salt is None:
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        stamps = [os.stat(__file__).st_mtime_ns] + sorted(
+            (name, os.stat(os.path.join(template_dir, name)).st_mtime_ns) for name in os.listdir(template_dir))
+        _etag_salt = hashlib.sha256(repr(stamps).encode()).hexdigest()[:12]
+    return _etag_salt
+
+def conditional_get(f):
+    """Answer 304 Not Modified when the caller already has this page for the current data generation"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if session.get('_flashes'):
+            # Pages showing flashed messages are one-offs - never validate them
+            return f(*args, **kwargs)
+        key = '|'.join([etag_salt(), str(g.data_generation), date.today().isoformat(),
+                        session.get('user_email', ''), request.full_path])
+        etag = hashlib.blake2b(key.encode('utf-8'), digest_size=12).hexdigest()
+        if request.if_none_match.contains_weak(etag):
+            CACHE_LOOKUPS.inc('conditional_get', 'hit')
+            response = Response(status=304)
+        else:
+            CACHE_LOOKUPS.inc('conditional_get', 'miss')
+            response = make_response(f(*args, **kwargs))
+        response.set_etag(etag, weak=True)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
+    return decorated_function
+
+# Static assets - url_for('static') adds a content fingerprint, so the files can be cached for a year
+_static_fingerprints = {}
+
+@app.url_defaults
+def fingerprint_static_urls(endpoint, values):
+    if endpoint != 'static' or 'filename' not in values:
+        return
+    filename = values['filename']
+    fingerprint = _static_fingerprints.get(filename)
+    if fingerprint is None:
+        path = safe_join(app.static_folder, filename)
+        try:
+            with open(path, 'rb') as f:
+                fingerprint = hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+        except (OSError, TypeError):
+            return  # Missing file (or unsafe name) - leave the URL alone
+        _static_fingerprints[filename] = fingerprint
+    values['v'] = fingerprint
+
+@app.after_request
+def cache_fingerprinted_assets(response):
+    if request.endpoint == 'static' and request.args.get('v') and response.status_code == 200:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = 365 * 24 * 3600
+        response.cache_control.immutable = True
+    return response
+
 # Enhanced login decorator
 def login_required(f):
     @wraps(f)
@@ -370,8 +563,8 @@ def login_required(f):
             flash('Please log in to access this page.', 'error')
             return redirect(url_for('login'))
         
-        # Verify user still exists in database
-        if session['user_email'] not in users_db:
+        # Verify user still exists in database - the User is kept on g for the view
+        if current_user() is None:
             session.clear()
             flash('Your session has expired. Please log in again.', 'error')
             return redirect(url_for('login'))
@@ -382,34 +575,40 @@ def login_required(f):
 # Enhanced Booking Helper Functions
 def check_user_booking_status(user_email, ride_id):
     """Check if user has already booked this ride"""
-    user_bookings = [booking for booking in bookings_db if 
-                    booking['passenger_email'] == user_email and 
-                    booking['ride_id'] == ride_id and 
-                    booking['status'] == 'confirmed']
-    return len(user_bookings) > 0
+    return store.get_confirmed_booking(user_email, ride_id) is not None
 
 def get_user_booking_for_ride(user_email, ride_id):
     """Get user's booking for a specific ride"""
-    user_booking = next((booking for booking in bookings_db if 
-                        booking['passenger_email'] == user_email and 
-                        booking['ride_id'] == ride_id and 
-                        booking['status'] == 'confirmed'), None)
-    return user_booking
+    return store.get_confirmed_booking(user_email, ride_id)
+
+# Messages for seats that could not be reserved (see ReservationError)
+BOOKING_ERRORS = {
+    ReservationError.NOT_FOUND: 'Ride not found.',
+    ReservationError.FULL: 'Sorry, this ride is full.',
+    ReservationError.OWN_RIDE: 'You cannot book your own ride.',
+    ReservationError.ALREADY_BOOKED: 'You have already booked this ride. You can only book one seat per ride.'
+}
 
 # Communication Helper Functions
-def generate_whatsapp_url(phone, message):
-    """Generate WhatsApp URL with pre-filled message"""
-    # Remove any non-digit characters and ensure proper format
+# A ride's WhatsApp number and maps URL are stored on it when it is created or edited;
+# older rides fall back to the memoized helpers below
+@lru_cache(maxsize=4096)
+def normalize_whatsapp_phone(phone):
+    """Digits-only phone with the 91 country code, as wa.me expects"""
     phone_clean = ''.join(filter(str.isdigit, phone))
     if phone_clean.startswith('0'):
         phone_clean = '91' + phone_clean[1:]
     elif not phone_clean.startswith('91'):
         phone_clean = '91' + phone_clean
-    
+    return phone_clean
+
+def generate_whatsapp_url(phone, message):
+    """Generate WhatsApp URL with pre-filled message"""
     encoded_message = urllib.parse.quote(message)
-    whatsapp_url = f"https://wa.me/{phone_clean}?text={encoded_message}"
+    whatsapp_url = f"https://wa.me/{normalize_whatsapp_phone(phone)}?text={encoded_message}"
     return whatsapp_url
 
+@lru_cache(maxsize=4096)
 def generate_maps_url(from_location, to_location):
     """Generate Google Maps URL for route"""
     encoded_from = urllib.parse.quote(from_location)
@@ -417,13 +616,67 @@ def generate_maps_url(from_location, to_location):
     maps_url = f"https://www.google.com/maps/dir/{encoded_from}/{encoded_to}"
     return maps_url
 
+def ride_contact_fields(ride):
+    """Derived fields saved on a ride whenever it is created or edited"""
+    return {
+        'whatsapp_phone': normalize_whatsapp_phone(ride['phone']),
+        'maps_url': generate_maps_url(ride['from_location'], ride['to_location'])
+    }
+
+def ride_maps_url(ride):
+    return ride.get('maps_url') or generate_maps_url(ride['from_location'], ride['to_location'])
+
+# WhatsApp texts a passenger sends the driver, filled from the ride and the passenger
+WHATSAPP_TEMPLATES = {
+    'interested': "Hi {driver_name}, I'm interested in your ride from {from_location} to {to_location} on {date} at {departure_time}. Can we coordinate for pickup?",
+    'booked': "Hi {driver_name}, this is {passenger_name}. I have already booked your ride from {from_location} to {to_location} on {date} at {departure_time}. Please let me know the pickup details.",
+    'confirmation': "Hi {driver_name}, I've booked your ride from {from_location} to {to_location} on {date} at {departure_time}. My name is {passenger_name} and my phone is {passenger_phone}. Looking forward to the ride!"
+}
+WHATSAPP_RIDE_FIELDS = ('driver_name', 'from_location', 'to_location', 'date', 'departure_time')
+
+@lru_cache(maxsize=8192)
+def _whatsapp_link(whatsapp_phone, template, ride_values, passenger_name, passenger_phone):
+    message = WHATSAPP_TEMPLATES[template].format(passenger_name=passenger_name, passenger_phone=passenger_phone,
+                                                  **dict(zip(WHATSAPP_RIDE_FIELDS, ride_values)))
+    return f"https://wa.me/{whatsapp_phone}?text={urllib.parse.quote(message)}"
+
+def whatsapp_link(ride, template, passenger_name='', passenger_phone=''):
+    """Memoized wa.me URL with one of WHATSAPP_TEMPLATES about a ride"""
+    whatsapp_phone = ride.get('whatsapp_phone') or normalize_whatsapp_phone(ride['phone'])
+    ride_values = tuple(ride[field] for field in WHATSAPP_RIDE_FIELDS)
+    return _whatsapp_link(whatsapp_phone, template, ride_values, passenger_name, passenger_phone)
+
+def ride_whatsapp_link(ride, passenger_name, has_booked):
+    """WhatsApp link on a ride card, depending on whether the passenger already booked"""
+    if has_booked:
+        return whatsapp_link(ride, 'booked', passenger_name)
+    return whatsapp_link(ride, 'interested')  # Same text for every viewer - one cache entry per ride
+
+def ride_view(ride, **viewer_fields):
+    """Per-request view of a shared ride record: viewer fields sit on top and are never written into it"""
+    return ChainMap(viewer_fields, ride)
+
+def booking_confirmation(ride, passenger):
+    """Small record flashed (category 'booking') after a booking; find_ride.html renders it"""
+    fields = ('from_location', 'to_location', 'date', 'departure_time', 'driver_name', 'price_per_seat', 'phone')
+    confirmation = {field: ride[field] for field in fields}
+    confirmation.update(ride_id=ride['id'], passenger_name=passenger.name, passenger_phone=passenger.phone)
+    return confirmation
+
+@app.template_global()
+def booking_contact_links(confirmation):
+    """WhatsApp, call and maps URLs for a booking confirmation"""
+    return {
+        'whatsapp_url': whatsapp_link(confirmation, 'confirmation',
+                                      confirmation['passenger_name'], confirmation['passenger_phone']),
+        'call_url': f"tel:{confirmation['phone']}",
+        'maps_url': ride_maps_url(confirmation)
+    }
+
 def add_earning_record(driver_email, passenger_name, passenger_email, amount, ride_details):
     """Add earning record to earnings history"""
-    if driver_email not in earnings_db:
-        earnings_db[driver_email] = []
-    
     earning_record = {
-        'id': len(earnings_db.get(driver_email, [])) + 1,
+        'id': store.next_earning_id(driver_email),
         'passenger_name': passenger_name,
         'passenger_email': passenger_email,
         'amount': amount,
@@ -435,14 +688,77 @@ def add_earning_record(driver_email, passenger_name, passenger_email, amount, ri
         'ride_time': ride_details['departure_time']
     }
     
-    earnings_db[driver_email].append(earning_record)
-    save_earnings_db(earnings_db)
+    store.add_earning(driver_email, earning_record)
     print(f"💰 Earning recorded: {driver_email} earned ₹{amount} from {passenger_name}")
 
+# Paged listings
+def split_page(items, limit, sort_key):
+    """Trim a fetch of limit + 1 items to one page; returns (page, cursor for the next page or None)"""
+    if len(items) <= limit:
+        return items, None
+    items = items[:limit]
+    return items, encode_cursor(sort_key(items[-1]))
+
+def paginate(items, sort_key, endpoint, **args):
+    """Trim a fetch of PAGE_SIZE + 1 items to one page; returns (page, next page URL or None)"""
+    items, cursor = split_page(items, app.config['PAGE_SIZE'], sort_key)
+    if cursor is None:
+        return items, None
+    args = {name: value for name, value in args.items() if value}
+    return items, url_for(endpoint, cursor=cursor, **args)
+
+def stream_page(template_name, **context):
+    """Render a template as a streamed response (stream_template wraps stream_with_context)"""
+    # Pop flashed messages now: the session cookie is sent before the body is generated
+    get_flashed_messages()
+    return Response(stream_template(template_name, **context))
+
+# Metrics read from their sources at scrape time
+def opened_store():
+    """The store if this worker has opened it - scraping must not open it"""
+    opened = app.extensions.get('liftlink_store')
+    if opened is None:
+        raise LookupError('store not open')
+    return opened
+
+def collect_cache_lookups():
+    lookups = CACHE_LOOKUPS.snapshot()
+    fragments = app.extensions.get('liftlink_fragments')
+    if fragments is not None:
+        lookups[('fragments', 'hit')] = fragments.hits
+        lookups[('fragments', 'miss')] = fragments.misses
+    for name, cached in (('maps_url', generate_maps_url), ('whatsapp_url', _whatsapp_link),
+                         ('whatsapp_phone', normalize_whatsapp_phone)):
+        info = cached.cache_info()
+        lookups[(name, 'hit')] = info.hits
+        lookups[(name, 'miss')] = info.misses
+    return lookups
+
+metrics.collected('liftlink_cache_lookups_total', 'Lookups in the request-path caches', 'counter',
+                  ('cache', 'result'), collect_cache_lookups)
+metrics.collected('liftlink_storage_bytes_written_total', 'Bytes this worker wrote to the data files',
+                  'counter', ('table',),
+                  lambda: {(table,): count for table, count in opened_store().bytes_written().items()})
+metrics.collected('liftlink_store_lock_waits_total', 'Write transactions that waited for another writer',
+                  'counter', (), lambda: {(): opened_store().contended_transactions})
+metrics.collected('liftlink_fragment_cache_bytes', 'Rendered HTML held in the fragment cache', 'gauge', (),
+                  lambda: {(): app.extensions['liftlink_fragments'].size})
+metrics.collected('liftlink_user_cache_entries', 'User views in the per-worker LRU', 'gauge', (),
+                  lambda: {(): len(_user_cache)})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics"""
+    if not app.config['METRICS_ENABLED']:
+        return Response('Metrics are disabled\n', status=404, mimetype='text/plain')
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
 # Static file serving for uploaded images
 @app.route('/static/uploads/profilepics/<filename>')
 def uploaded_file(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # Content-addressed names never change meaning, so browsers may keep them for good
+    max_age = 365 * 24 * 3600 if picture_stem(filename) else None
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=max_age)
 
 # Main Routes
 @app.route('/')
@@ -488,7 +804,7 @@ def register():
             flash('Password must be at least 6 characters long.', 'error')
             return render_template('register.html')
         
-        if email in users_db:
+        if store.get_user(email) is not None:
             flash('Email already registered. Please use a different email.', 'error')
             return render_template('register.html')
         
@@ -504,7 +820,7 @@ def register():
         user_data = {
             'name': name,
             'email': email,
-            'password': hashlib.sha256(password.encode()).hexdigest(),
+            'password': password_hasher.hash(password),
             'phone': phone,
             'emergency_contact_name': emergency_name,
             'emergency_contact_phone': emergency_phone,
@@ -529,9 +845,13 @@ def register():
                 'max_passengers': 0
             })
         
-        # Save to persistent database
-        users_db[email] = user_data
-        save_users_db(users_db)
+        # Save to persistent database (re-check inside the transaction - another worker may have just registered it)
+        with store.transaction():
+            if store.get_user(email) is not None:
+                flash('Email already registered. Please use a different email.', 'error')
+                return render_template('register.html')
+            store.add_user(email, user_data)
+        forget_user(email)
         
         print(f"New {user_type} registered: {name} ({email})")
         flash('Registration successful! Please log in with your credentials.', 'success')
@@ -560,13 +880,23 @@ def login():
             flash('Use only Institute E-Mail ID (@xavier.ac.in for staff)', 'error')
             return render_template('login.html')
         
-        user_data = users_db.get(email)
-        if user_data and user_data['password'] == hashlib.sha256(password.encode()).hexdigest():
+        user_data = store.get_user(email)
+        if user_data:
+            password_ok, needs_rehash = password_hasher.verify(password, user_data['password'])
+        else:
+            password_ok, needs_rehash = password_hasher.verify_missing(password), False
+        if password_ok:
             # Verify user type matches
             if user_data.get('user_type') != user_type:
                 flash('Invalid user type selected. Please choose the correct account type.', 'error')
                 return render_template('login.html')
             
+            if needs_rehash:
+                # Legacy SHA-256 (or an older scrypt cost) - store it with the current settings
+                store.update_user(email, {'password': password_hasher.hash(password)})
+                forget_user(email)
+                print(f"✓ Password hash upgraded for {email}")
+            
             session['user_email'] = email
             print(f"User logged in: {user_data['name']} ({email})")
             flash(f"Welcome back, {user_data['name']}!", 'success')
@@ -589,15 +919,15 @@ def logout():
 @login_required
 def dashboard():
     """Enhanced dashboard with ride statistics"""
-    user = User(session['user_email'])
+    user = current_user()
     
     # Calculate user's ride statistics
-    user_rides = [ride for ride in sample_rides if ride['driver_email'] == user.email]
+    user_rides = store.rides_by_driver(user.email)
     
     stats = {
         'rides_offered': len(user_rides),
         'active_rides': len([r for r in user_rides if r['available_seats'] > 0]),
-        'total_earnings': sum(ride['price_per_seat'] * (ride['total_seats'] - ride['available_seats']) for ride in user_rides)
+        'total_earnings': store.earnings_summary(user.email)['total']
     }
     
     return render_template('dashboard.html', user=user, stats=stats, user_rides=user_rides)
@@ -606,20 +936,19 @@ def dashboard():
 @login_required
 def profile():
     """Enhanced profile page with earnings stats and history"""
-    user = User(session['user_email'])
+    user = current_user()
     
     # Calculate user's ride statistics for profile
-    user_rides = [ride for ride in sample_rides if ride['driver_email'] == user.email]
+    user_rides = store.rides_by_driver(user.email)
     
     stats = {
         'rides_offered': len(user_rides),
         'active_rides': len([r for r in user_rides if r['available_seats'] > 0]),
-        'total_earnings': sum(ride['price_per_seat'] * (ride['total_seats'] - ride['available_seats']) for ride in user_rides)
+        'total_earnings': store.earnings_summary(user.email)['total']
     }
     
     # Get earnings history
-    earnings_history = earnings_db.get(user.email, [])
-    earnings_history.sort(key=lambda x: (x['date'], x['time']), reverse=True)
+    earnings_history = store.earnings_for_driver(user.email)
     
     return render_template('profile.html', user=user, stats=stats, earnings_history=earnings_history)
 
@@ -627,7 +956,7 @@ def profile():
 @login_required
 def edit_profile():
     """Enhanced profile editing with emergency contacts"""
-    user = User(session['user_email'])
+    user = current_user()
     
     if request.method == 'POST':
         # Common fields
@@ -642,22 +971,22 @@ def edit_profile():
         if user.user_type == 'student':
             year = request.form.get('year', '').strip()
             gender = request.form.get('gender', '').strip()
-            users_db[user.email].update({
+            updates = {
                 'year': int(year) if year.isdigit() else user.year,
                 'gender': gender
-            })
+            }
         else:  # staff
             designation = request.form.get('designation', '').strip()
             car_model = request.form.get('car_model', '').strip()
             max_passengers = request.form.get('max_passengers', '').strip()
-            users_db[user.email].update({
+            updates = {
                 'designation': designation,
                 'car_model': car_model,
                 'max_passengers': int(max_passengers) if max_passengers.isdigit() else 0
-            })
+            }
         
         # Update common fields
-        users_db[user.email].update({
+        updates.update({
             'name': name or user.name,
             'phone': phone or user.phone,
             'emergency_contact_name': emergency_name or user.emergency_contact_name,
@@ -671,14 +1000,19 @@ def edit_profile():
             file = request.files['profile_pic']
             if file and file.filename != '' and allowed_file(file.filename):
                 try:
-                    picture_file = save_picture(file, user.email)
-                    users_db[user.email]['profile_pic'] = picture_file
-                    flash('Profile picture updated successfully!', 'success')
+                    picture_file, ready = save_picture(file, user.email)
+                    if ready:
+                        updates['profile_pic'] = picture_file
+                        updates['profile_pic_pending'] = None
+                        flash('Profile picture updated successfully!', 'success')
+                    else:
+                        flash('Profile picture uploaded - it will appear in a few seconds.', 'success')
                 except Exception as e:
                     flash(f'Error uploading profile picture: {str(e)}', 'error')
         
         # Save changes to persistent database
-        save_users_db(users_db)
+        store.update_user(user.email, updates)
+        forget_user(user.email)
         
         flash('Profile updated successfully!', 'success')
         return redirect(url_for('profile'))
@@ -687,64 +1021,44 @@ def edit_profile():
 
 @app.route('/find_ride', methods=['GET'])
 @login_required
+@conditional_get
 def find_ride():
     """Enhanced find ride with booking status checking"""
-    user = User(session['user_email'])
+    user = current_user()
     search_from = request.args.get('from', '').strip()
     search_to = request.args.get('to', '').strip()
     search_date = request.args.get('date', '').strip()
     
-    # Start with ALL rides
-    rides = sample_rides.copy()
-    
     print(f"🔍 SEARCH DEBUG:")
     print(f"📧 Current user: {user.email}")
-    print(f"📊 Total rides in database: {len(rides)}")
     print(f"🔍 Search filters - From: '{search_from}', To: '{search_to}', Date: '{search_date}'")
     
-    # Apply search filters if provided
-    if search_from:
-        rides = [r for r in rides if search_from.lower() in r['from_location'].lower()]
-        print(f"📍 After 'from' filter: {len(rides)} rides")
+    # One page of rides from OTHER users with available seats matching the filters, sorted by date and time
+    cursor = decode_cursor(request.args.get('cursor'))
+    rides = store.search_rides(search_from, search_to, search_date, exclude_driver=user.email,
+                               after=cursor, limit=app.config['PAGE_SIZE'] + 1)
+    search_args = {name: value for name, value in
+                   (('from', search_from), ('to', search_to), ('date', search_date)) if value}
+    rides, next_url = paginate(rides, ride_sort_key, 'find_ride', **search_args)
+    print(f"👥 Matching rides on this page: {len(rides)} rides")
     
-    if search_to:
-        rides = [r for r in rides if search_to.lower() in r['to_location'].lower()]
-        print(f"🏁 After 'to' filter: {len(rides)} rides")
+    # One lookup of the user's bookings for the whole page: {ride_id: booking}
+    user_bookings = store.user_bookings(user.email)
     
-    if search_date:
-        rides = [r for r in rides if r['date'] == search_date]
-        print(f"📅 After date filter: {len(rides)} rides")
-    
-    # Only show rides with available seats
-    rides = [r for r in rides if r['available_seats'] > 0]
-    print(f"💺 After seat availability filter: {len(rides)} rides")
-    
-    # Show rides from OTHER users (not your own rides in find section)
-    rides = [r for r in rides if r['driver_email'] != user.email]
-    print(f"👥 After removing own rides: {len(rides)} rides")
-    
-    # Add communication URLs and booking status to each ride
+    # Per-viewer booking status and communication URLs, on views - the store's ride dicts are shared
+    views = []
     for ride in rides:
         # Check if current user has already booked this ride
-        user_has_booked = check_user_booking_status(user.email, ride['id'])
-        user_booking = get_user_booking_for_ride(user.email, ride['id'])
-        
-        ride['user_has_booked'] = user_has_booked
-        ride['user_booking'] = user_booking
-        
-        # WhatsApp message
-        if user_has_booked:
-            whatsapp_message = f"Hi {ride['driver_name']}, this is {user.name}. I have already booked your ride from {ride['from_location']} to {ride['to_location']} on {ride['date']} at {ride['departure_time']}. Please let me know the pickup details."
-        else:
-            whatsapp_message = f"Hi {ride['driver_name']}, I'm interested in your ride from {ride['from_location']} to {ride['to_location']} on {ride['date']} at {ride['departure_time']}. Can we coordinate for pickup?"
-        
-        ride['whatsapp_url'] = generate_whatsapp_url(ride['phone'], whatsapp_message)
-        
-        # Maps URL for route
-        ride['maps_url'] = generate_maps_url(ride['from_location'], ride['to_location'])
+        user_booking = user_bookings.get(ride['id'])
+        user_has_booked = user_booking is not None
         
-        # Phone call URL
-        ride['call_url'] = f"tel:{ride['phone']}"
+        views.append(ride_view(ride,
+                               user_has_booked=user_has_booked,
+                               user_booking=user_booking,
+                               whatsapp_url=ride_whatsapp_link(ride, user.name, user_has_booked),
+                               maps_url=ride_maps_url(ride),
+                               call_url=f"tel:{ride['phone']}"))
+    rides = views
     
     # Debug: Print all rides for troubleshooting
     print(f"🚗 Final rides to display:")
@@ -752,17 +1066,16 @@ def find_ride():
         booked_status = "BOOKED" if ride.get('user_has_booked', False) else "AVAILABLE"
         print(f"   {i}. {ride['driver_name']}: {ride['from_location']} → {ride['to_location']} ({booked_status})")
     
-    # Sort rides by date and time
-    rides.sort(key=lambda x: (x['date'], x['departure_time']))
-    
-    return render_template('find_ride.html', user=user, rides=rides, 
-                         search_from=search_from, search_to=search_to, search_date=search_date)
+    first_url = url_for('find_ride', **search_args) if cursor is not None else None
+    return stream_page('find_ride.html', user=user, rides=rides, next_url=next_url, first_url=first_url,
+                       search_from=search_from, search_to=search_to, search_date=search_date,
+                       sse_poll_seconds=SSE_POLL_SECONDS)
 
 @app.route('/create_ride', methods=['GET', 'POST'])
 @login_required
 def create_ride():
     """Enhanced create ride with car details and persistent storage"""
-    user = User(session['user_email'])
+    user = current_user()
     
     if request.method == 'POST':
         from_location = request.form.get('from_location', '').strip()
@@ -794,40 +1107,41 @@ def create_ride():
             flash('Please enter valid numbers for seats and price.', 'error')
             return render_template('create_ride.html', user=user)
         
-        # Generate unique ID for the new ride
-        new_ride_id = max([ride['id'] for ride in sample_rides], default=0) + 1
-        
-        # Create new ride
-        new_ride = {
-            'id': new_ride_id,
-            'driver_name': user.name,
-            'driver_email': user.email,
-            'from_location': from_location,
-            'to_location': to_location,
-            'departure_time': departure_time,
-            'date': date,
-            'available_seats': available_seats,
-            'total_seats': max_passengers,
-            'car_model': car_model,
-            'price_per_seat': price_per_seat,
-            'department': user.department,
-            'year': f'{user.year}rd Year' if user.user_type == 'student' else None,
-            'designation': user.designation if user.user_type == 'staff' else None,
-            'rating': 5.0,  # Default rating for new rides
-            'phone': user.phone,
-            'additional_info': additional_info or 'No additional information provided'
-        }
-        
-        sample_rides.append(new_ride)
-        save_rides_db(sample_rides)  # Save to persistent database
+        with store.transaction():
+            # Generate unique ID for the new ride (never one a cancelled ride had)
+            new_ride_id = store.allocate_ride_id()
+            
+            # Create new ride
+            new_ride = {
+                'id': new_ride_id,
+                'driver_name': user.name,
+                'driver_email': user.email,
+                'from_location': from_location,
+                'to_location': to_location,
+                'departure_time': departure_time,
+                'date': date,
+                'available_seats': available_seats,
+                'total_seats': max_passengers,
+                'car_model': car_model,
+                'price_per_seat': price_per_seat,
+                'department': user.department,
+                'year': f'{user.year}rd Year' if user.user_type == 'student' else None,
+                'designation': user.designation if user.user_type == 'staff' else None,
+                'rating': 5.0,  # Default rating for new rides
+                'phone': user.phone,
+                'additional_info': additional_info or 'No additional information provided'
+            }
+            new_ride.update(ride_contact_fields(new_ride))
+            
+            store.add_ride(new_ride)  # Save to persistent database
         
         # Update user's car details in profile if they're staff or don't have it set
         if user.user_type == 'staff' or not user.car_model:
-            users_db[user.email].update({
+            store.update_user(user.email, {
                 'car_model': car_model,
                 'max_passengers': max_passengers
             })
-            save_users_db(users_db)
+            forget_user(user.email)
         
         print(f"✅ New ride created by {user.name}: {from_location} -> {to_location} (ID: {new_ride_id})")
         flash('Ride created successfully! Other users can now find and book your ride.', 'success')
@@ -837,28 +1151,32 @@ def create_ride():
 
 @app.route('/my_rides')
 @login_required
+@conditional_get
 def my_rides():
     """Enhanced my rides page with edit/delete functionality"""
-    user = User(session['user_email'])
-    user_rides = [ride for ride in sample_rides if ride['driver_email'] == user.email]
+    user = current_user()
     
-    # Sort rides by date and time
-    user_rides.sort(key=lambda x: (x['date'], x['departure_time']), reverse=True)
+    # Newest rides first, one page at a time
+    cursor = decode_cursor(request.args.get('cursor'))
+    user_rides = store.driver_rides_newest(user.email, before=cursor, limit=app.config['PAGE_SIZE'] + 1)
+    user_rides, next_url = paginate(user_rides, ride_sort_key, 'my_rides')
     
-    print(f"📋 My Rides for {user.name}: {len(user_rides)} rides found")
+    print(f"📋 My Rides for {user.name}: {len(user_rides)} rides on this page")
     
-    return render_template('my_rides.html', user=user, rides=user_rides)
+    # Rides dated before today are archived and can no longer be edited or cancelled
+    return stream_page('my_rides.html', user=user, rides=user_rides, next_url=next_url, paged=cursor is not None,
+                       today=date.today().isoformat())
 
 @app.route('/edit_ride/<int:ride_id>', methods=['GET', 'POST'])
 @login_required
 def edit_ride(ride_id):
     """Edit a ride with persistent storage"""
-    user = User(session['user_email'])
+    user = current_user()
     
     # Find the ride
-    ride = next((r for r in sample_rides if r['id'] == ride_id and r['driver_email'] == user.email), None)
+    ride = store.get_ride(ride_id)
     
-    if not ride:
+    if not ride or ride['driver_email'] != user.email:
         flash('Ride not found or you do not have permission to edit it.', 'error')
         return redirect(url_for('my_rides'))
     
@@ -886,22 +1204,37 @@ def edit_ride(ride_id):
             flash('Please enter valid numbers for seats and price.', 'error')
             return render_template('edit_ride.html', user=user, ride=ride)
         
-        # Update the ride
-        ride.update({
-            'from_location': from_location,
-            'to_location': to_location,
-            'departure_time': departure_time,
-            'date': date,
-            'available_seats': available_seats,
-            'total_seats': max_passengers,
-            'car_model': car_model,
-            'price_per_seat': price_per_seat,
-            'additional_info': additional_info or 'No additional information provided'
-        })
-        
-        # Save changes to persistent database
-        save_rides_db(sample_rides)
+        # Update the ride - re-read inside the transaction so other workers' changes are kept
+        with store.transaction():
+            ride = store.get_ride(ride_id)
+            if not ride or ride['driver_email'] != user.email:
+                # Cancelled or archived by another worker while the form was open
+                flash('Ride not found or you do not have permission to edit it.', 'error')
+                return redirect(url_for('my_rides'))
+            
+            # Someone booked (or the driver saved from another tab) since this form was loaded
+            form_version = request.form.get('version', '').strip()
+            if form_version.isdigit() and int(form_version) != ride.get('version', 0):
+                flash('This ride was updated (possibly booked) while you were editing. Please review the latest details and save again.', 'error')
+                return render_template('edit_ride.html', user=user, ride=ride)
+            
+            ride.update({
+                'from_location': from_location,
+                'to_location': to_location,
+                'departure_time': departure_time,
+                'date': date,
+                'available_seats': available_seats,
+                'total_seats': max_passengers,
+                'car_model': car_model,
+                'price_per_seat': price_per_seat,
+                'additional_info': additional_info or 'No additional information provided'
+            })
+            ride.update(ride_contact_fields(ride))
+            
+            # Save changes to persistent database
+            store.update_ride(ride)
         
+        seat_broker.publish(seat_event(ride))
         print(f"✅ Ride updated by {user.name}: {from_location} -> {to_location}")
         flash('Ride updated successfully!', 'success')
         return redirect(url_for('my_rides'))
@@ -912,121 +1245,72 @@ def edit_ride(ride_id):
 @login_required
 def book_ride(ride_id):
     """Enhanced ride booking with one booking per user restriction"""
-    user = User(session['user_email'])
+    user = current_user()
     
-    # Find the ride
-    ride = next((r for r in sample_rides if r['id'] == ride_id), None)
-    
-    if not ride:
-        flash('Ride not found.', 'error')
-        return redirect(url_for('find_ride'))
-    
-    if ride['available_seats'] <= 0:
-        flash('Sorry, this ride is full.', 'error')
-        return redirect(url_for('find_ride'))
+    def build_booking(ride, booking_id):
+        return {
+            'id': booking_id,
+            'ride_id': ride_id,
+            'passenger_name': user.name,
+            'passenger_email': user.email,
+            'passenger_phone': user.phone,
+            'driver_name': ride['driver_name'],
+            'driver_email': ride['driver_email'],
+            'driver_phone': ride['phone'],
+            'from_location': ride['from_location'],
+            'to_location': ride['to_location'],
+            'date': ride['date'],
+            'departure_time': ride['departure_time'],
+            'price_paid': ride['price_per_seat'],
+            'booking_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'status': 'confirmed'
+        }
     
-    if ride['driver_email'] == user.email:
-        flash('You cannot book your own ride.', 'error')
-        return redirect(url_for('find_ride'))
+    def record_earning(ride, booking):
+        # Add earning record for driver
+        add_earning_record(
+            driver_email=ride['driver_email'],
+            passenger_name=user.name,
+            passenger_email=user.email,
+            amount=ride['price_per_seat'],
+            ride_details=ride
+        )
     
-    # Check if user has already booked this ride
-    if check_user_booking_status(user.email, ride_id):
-        flash('You have already booked this ride. You can only book one seat per ride.', 'error')
+    # Check seats, decrement and record the booking atomically (one store transaction)
+    try:
+        ride, booking = store.reserve_seat(ride_id, user.email, build_booking, on_reserved=record_earning)
+    except ReservationError as e:
+        BOOKINGS.inc(e.reason)
+        flash(BOOKING_ERRORS[e.reason], 'error')
         return redirect(url_for('find_ride'))
+    BOOKINGS.inc('confirmed')
     
-    # Book the ride (decrease available seats)
-    ride['available_seats'] -= 1
-    
-    # Create booking record
-    booking = {
-        'id': len(bookings_db) + 1,
-        'ride_id': ride_id,
-        'passenger_name': user.name,
-        'passenger_email': user.email,
-        'passenger_phone': user.phone,
-        'driver_name': ride['driver_name'],
-        'driver_email': ride['driver_email'],
-        'driver_phone': ride['phone'],
-        'from_location': ride['from_location'],
-        'to_location': ride['to_location'],
-        'date': ride['date'],
-        'departure_time': ride['departure_time'],
-        'price_paid': ride['price_per_seat'],
-        'booking_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'status': 'confirmed'
-    }
-    
-    bookings_db.append(booking)
-    
-    # Add earning record for driver
-    add_earning_record(
-        driver_email=ride['driver_email'],
-        passenger_name=user.name,
-        passenger_email=user.email,
-        amount=ride['price_per_seat'],
-        ride_details=ride
-    )
-    
-    # Save all changes
-    save_rides_db(sample_rides)
-    save_bookings_db(bookings_db)
-    
-    # Generate communication URLs
-    whatsapp_message = f"Hi {ride['driver_name']}, I've booked your ride from {ride['from_location']} to {ride['to_location']} on {ride['date']} at {ride['departure_time']}. My name is {user.name} and my phone is {user.phone}. Looking forward to the ride!"
-    whatsapp_url = generate_whatsapp_url(ride['phone'], whatsapp_message)
-    call_url = f"tel:{ride['phone']}"
-    maps_url = generate_maps_url(ride['from_location'], ride['to_location'])
+    seat_broker.publish(seat_event(ride))
     
     print(f"🎫 Ride booked by {user.name} for ride {ride_id} ({ride['from_location']} -> {ride['to_location']})")
     
-    # Success message with communication options
-    success_message = f"""
-    <div style="text-align: center; padding: 2rem;">
-        <h3 style="color: #10B981; margin-bottom: 1rem;">🎉 Ride Booked Successfully!</h3>
-        <p><strong>Route:</strong> {ride['from_location']} → {ride['to_location']}</p>
-        <p><strong>Date & Time:</strong> {ride['date']} at {ride['departure_time']}</p>
-        <p><strong>Driver:</strong> {ride['driver_name']}</p>
-        <p><strong>Price:</strong> ₹{ride['price_per_seat']}</p>
-        <hr style="margin: 2rem 0;">
-        <h4 style="color: #667eea;">📞 Contact Driver:</h4>
-        <div style="margin: 1rem 0;">
-            <a href="{whatsapp_url}" target="_blank" style="display: inline-block; background: #25D366; color: white; padding: 12px 20px; text-decoration: none; border-radius: 8px; margin: 5px;">
-                📱 WhatsApp Driver
-            </a>
-            <a href="{call_url}" style="display: inline-block; background: #007bff; color: white; padding: 12px 20px; text-decoration: none; border-radius: 8px; margin: 5px;">
-                📞 Call Driver
-            </a>
-        </div>
-        <h4 style="color: #667eea; margin-top: 2rem;">🗺️ View Route:</h4>
-        <div style="margin: 1rem 0;">
-            <a href="{maps_url}" target="_blank" style="display: inline-block; background: #4285F4; color: white; padding: 12px 20px; text-decoration: none; border-radius: 8px; margin: 5px;">
-                🗺️ View on Google Maps
-            </a>
-        </div>
-        <p style="margin-top: 2rem; color: #666;">
-            <strong>Phone:</strong> {ride['phone']}<br>
-            <strong>Note:</strong> You can only book one seat per ride.<br>
-            Have a safe journey! 🚗
-        </p>
-    </div>
-    """
-    
-    flash(success_message, 'success')
+    # Confirmation with communication options - a small record, rendered by find_ride.html
+    flash(booking_confirmation(ride, user), 'booking')
     return redirect(url_for('find_ride'))
 
 @app.route('/cancel_ride/<int:ride_id>')
 @login_required
 def cancel_ride(ride_id):
     """Cancel a ride - Enhanced with proper deletion and persistent storage"""
-    user = User(session['user_email'])
+    user = current_user()
     
-    # Find and remove the ride
-    global sample_rides
-    ride = next((r for r in sample_rides if r['id'] == ride_id and r['driver_email'] == user.email), None)
+    # Find and remove the ride, cancelling its passengers' bookings with it
+    with store.transaction():
+        ride = store.get_ride(ride_id)
+        owned = ride is not None and ride['driver_email'] == user.email
+        if owned:
+            for booking in store.ride_bookings(ride_id):
+                booking['status'] = 'cancelled'
+                store.update_booking(booking)
+            store.delete_ride(ride_id)  # Save changes to persistent database
     
-    if ride:
-        sample_rides = [r for r in sample_rides if r['id'] != ride_id]
-        save_rides_db(sample_rides)  # Save changes to persistent database
+    if owned:
+        seat_broker.publish(seat_event(ride, cancelled=True))
         print(f"❌ Ride deleted by {user.name}: {ride['from_location']} -> {ride['to_location']}")
         flash('Ride cancelled successfully.', 'success')
     else:
@@ -1036,33 +1320,239 @@ def cancel_ride(ride_id):
 
 @app.route('/earnings_history')
 @login_required
+@conditional_get
 def earnings_history():
     """View detailed earnings history"""
-    user = User(session['user_email'])
+    user = current_user()
+    
+    # One page of earnings history for current user, newest first
+    cursor = decode_cursor(request.args.get('cursor'))
+    user_earnings = store.earnings_for_driver(user.email, before=cursor, limit=app.config['PAGE_SIZE'] + 1)
+    user_earnings, next_url = paginate(user_earnings, earning_sort_key, 'earnings_history')
+    
+    # Running totals from the earnings ledger
+    summary = store.earnings_summary(user.email)
+    total_earnings = summary['total']
+    total_passengers = summary['count']
+    
+    return stream_page('earnings_history.html', 
+                       user=user, 
+                       earnings=user_earnings,
+                       total_earnings=total_earnings,
+                       total_passengers=total_passengers,
+                       next_url=next_url,
+                       paged=cursor is not None)
+
+# Live seat availability - find_ride pages listen here instead of reloading
+SSE_MAX_RIDES = 200
+SSE_KEEPALIVE_SECONDS = 15
+SSE_STREAM_SECONDS = 300  # Streams end periodically; the browser reconnects on its own
+SSE_RETRY_MS = 3000
+SSE_POLL_SECONDS = 20  # How often pages without a stream ask for the current counts
+
+_sse_lock = threading.Lock()
+_sse_open = 0  # Streams this worker is serving
+
+def acquire_sse_slot():
+    """Claim one of this worker's SSE_MAX_STREAMS stream slots; False if they are all taken"""
+    global _sse_open
+    with _sse_lock:
+        if _sse_open >= app.config['SSE_MAX_STREAMS']:
+            return False
+        _sse_open += 1
+        return True
+
+def release_sse_slot():
+    global _sse_open
+    with _sse_lock:
+        _sse_open -= 1
+
+def requested_ride_ids():
+    return {int(part) for part in request.args.get('rides', '').split(',')[:SSE_MAX_RIDES] if part.isdigit()}
+
+@app.route('/events/seats')
+@login_required
+def seat_events():
+    """Server-sent events with seat counts for the rides on the caller's page (?rides=1,2,3)"""
+    if not acquire_sse_slot():
+        # 204 tells EventSource not to reconnect; the page falls back to polling
+        return Response(status=204)
+    ride_ids = requested_ride_ids()
+    broker = get_seat_broker()
     
-    # Get earnings history for current user
-    user_earnings = earnings_db.get(user.email, [])
-    user_earnings.sort(key=lambda x: (x['date'], x['time']), reverse=True)
+    def generate():
+        with broker.subscribe(ride_ids or None) as subscription:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            deadline = time.monotonic() + SSE_STREAM_SECONDS
+            while time.monotonic() < deadline:
+                events = subscription.wait(SSE_KEEPALIVE_SECONDS)
+                if not events:
+                    yield ": keepalive\n\n"
+                for event in events:
+                    yield format_sse('seats', event)
     
-    # Calculate statistics
-    total_earnings = sum(earning['amount'] for earning in user_earnings)
-    total_passengers = len(user_earnings)
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # Don't let a proxy buffer the stream
+    response.call_on_close(release_sse_slot)  # Runs when the stream ends or the client goes away
+    return response
+
+@app.route('/events/seats/current')
+@login_required
+def current_seats():
+    """Current seat counts for the rides on the caller's page (?rides=1,2,3) - the polling fallback"""
+    events = []
+    for ride_id in sorted(requested_ride_ids()):
+        ride = store.get_ride(ride_id)
+        events.append(seat_event(ride) if ride is not None else
+                      seat_event({'id': ride_id, 'available_seats': 0, 'total_seats': 0}, cancelled=True))
+    response = jsonify({'rides': events})
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+# JSON API v1 - compact payloads from the same store queries as the HTML pages
+API_MAX_LIMIT = 100
+
+# Selectable fields per resource (?fields=a,b,c); derived fields are only computed when selected
+API_RIDE_FIELDS = ('id', 'driver_name', 'from_location', 'to_location', 'date', 'departure_time',
+                   'available_seats', 'total_seats', 'price_per_seat', 'car_model', 'department', 'year',
+                   'designation', 'rating', 'phone', 'additional_info', 'version',
+                   'booked', 'whatsapp_url', 'maps_url', 'call_url')
+API_RIDE_DEFAULT_FIELDS = ('id', 'driver_name', 'from_location', 'to_location', 'date', 'departure_time',
+                           'available_seats', 'price_per_seat', 'booked')
+API_BOOKING_FIELDS = ('id', 'ride_id', 'driver_name', 'driver_phone', 'from_location', 'to_location',
+                      'date', 'departure_time', 'price_paid', 'booking_time', 'status')
+API_BOOKING_DEFAULT_FIELDS = ('id', 'ride_id', 'from_location', 'to_location', 'date', 'departure_time', 'status')
+API_EARNING_FIELDS = ('id', 'passenger_name', 'passenger_email', 'amount', 'date', 'time',
+                      'ride_from', 'ride_to', 'ride_date', 'ride_time')
+API_EARNING_DEFAULT_FIELDS = ('id', 'passenger_name', 'amount', 'date', 'time')
+
+app.json.compact = True
+app.json.sort_keys = False  # Keep fields in the order the client asked for
+
+class ApiError(Exception):
+    """Bad API request; rendered as {"error": message} with the given status"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+@app.errorhandler(ApiError)
+def api_error(error):
+    return jsonify(error=str(error)), error.status
+
+def api_login_required(f):
+    """Like login_required, but answers 401 JSON instead of redirecting"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if 'user_email' not in session or current_user() is None:
+            raise ApiError('Authentication required', 401)
+        return f(*args, **kwargs)
+    return decorated_function
+
+def api_fields(allowed, default):
+    """Fields selected with ?fields=, in request order"""
+    requested = request.args.get('fields', '').strip()
+    if not requested:
+        return default
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in allowed]
+    if unknown:
+        raise ApiError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def api_limit():
+    limit = request.args.get('limit', '')
+    if not limit:
+        return app.config['PAGE_SIZE']
+    if not limit.isdigit() or not 1 <= int(limit) <= API_MAX_LIMIT:
+        raise ApiError(f'limit must be between 1 and {API_MAX_LIMIT}')
+    return int(limit)
+
+def api_cursor():
+    token = request.args.get('cursor')
+    cursor = decode_cursor(token)
+    if token and cursor is None:
+        raise ApiError('Invalid cursor')
+    return cursor
+
+def api_ride(ride, fields, viewer_name, booking):
+    """Project a ride onto the selected fields"""
+    out = {}
+    for field in fields:
+        if field == 'booked':
+            out[field] = booking is not None
+        elif field == 'whatsapp_url':
+            out[field] = ride_whatsapp_link(ride, viewer_name, booking is not None)
+        elif field == 'maps_url':
+            out[field] = ride_maps_url(ride)
+        elif field == 'call_url':
+            out[field] = f"tel:{ride['phone']}"
+        else:
+            out[field] = ride.get(field)
+    return out
+
+@app.route('/api/v1/rides')
+@api_login_required
+@conditional_get
+def api_rides():
+    """Ride search with the find_ride filters, or the caller's own rides with ?mine=1"""
+    user = current_user()
+    fields = api_fields(API_RIDE_FIELDS, API_RIDE_DEFAULT_FIELDS)
+    limit = api_limit()
+    cursor = api_cursor()
     
-    return render_template('earnings_history.html', 
-                         user=user, 
-                         earnings=user_earnings,
-                         total_earnings=total_earnings,
-                         total_passengers=total_passengers)
+    if request.args.get('mine') == '1':
+        rides = store.driver_rides_newest(user.email, before=cursor, limit=limit + 1)
+    else:
+        rides = store.search_rides(request.args.get('from', '').strip(), request.args.get('to', '').strip(),
+                                   request.args.get('date', '').strip(), exclude_driver=user.email,
+                                   after=cursor, limit=limit + 1)
+    rides, next_cursor = split_page(rides, limit, ride_sort_key)
+    
+    user_bookings = store.user_bookings(user.email) if {'booked', 'whatsapp_url'} & set(fields) else {}
+    return jsonify(rides=[api_ride(ride, fields, user.name, user_bookings.get(ride['id'])) for ride in rides],
+                   next_cursor=next_cursor)
+
+@app.route('/api/v1/bookings')
+@api_login_required
+@conditional_get
+def api_bookings():
+    """The caller's confirmed bookings, newest first"""
+    fields = api_fields(API_BOOKING_FIELDS, API_BOOKING_DEFAULT_FIELDS)
+    bookings = sorted(store.user_bookings(session['user_email']).values(), key=lambda b: b['id'], reverse=True)
+    return jsonify(bookings=[{field: booking.get(field) for field in fields} for booking in bookings])
+
+@app.route('/api/v1/earnings')
+@api_login_required
+@conditional_get
+def api_earnings():
+    """The caller's earnings: ledger totals, optional ?rollup=day|month, and paged records newest first"""
+    email = session['user_email']
+    fields = api_fields(API_EARNING_FIELDS, API_EARNING_DEFAULT_FIELDS)
+    limit = api_limit()
+    cursor = api_cursor()
+    rollup = request.args.get('rollup', '')
+    if rollup not in ('', 'day', 'month'):
+        raise ApiError('rollup must be day or month')
+    
+    earnings = store.earnings_for_driver(email, before=cursor, limit=limit + 1)
+    earnings, next_cursor = split_page(earnings, limit, earning_sort_key)
+    payload = {'summary': store.earnings_summary(email)}
+    if rollup:
+        payload['rollup'] = store.earnings_rollup(email, rollup)
+    payload['earnings'] = [{field: earning.get(field) for field in fields} for earning in earnings]
+    payload['next_cursor'] = next_cursor
+    return jsonify(payload)
 
 # Debug route to check all rides (for troubleshooting)
 @app.route('/debug/rides')
 @login_required
 def debug_rides():
     """Debug route to check all rides in database"""
-    user = User(session['user_email'])
+    user = current_user()
     rides_info = []
     
-    for ride in sample_rides:
+    for ride in store.all_rides():
         rides_info.append({
             'id': ride['id'],
             'driver': ride['driver_name'],
@@ -1075,9 +1565,9 @@ def debug_rides():
     return f"""
     <h1>🔍 DEBUG: All Rides in Database</h1>
     <p><strong>Current User:</strong> {user.name} ({user.email})</p>
-    <p><strong>Total Rides:</strong> {len(sample_rides)}</p>
-    <p><strong>Total Bookings:</strong> {len(bookings_db)}</p>
-    <p><strong>Total Earnings Records:</strong> {len(earnings_db)}</p>
+    <p><strong>Total Rides:</strong> {len(rides_info)}</p>
+    <p><strong>Total Bookings:</strong> {store.count_bookings()}</p>
+    <p><strong>Total Earnings Records:</strong> {store.count_earning_drivers()}</p>
     <hr>
     {''.join([f"<p><strong>ID {r['id']}:</strong> {r['driver']} ({r['email']}) - {r['route']} on {r['date']} - Seats: {r['seats']}</p>" for r in rides_info])}
     <hr>
@@ -1105,6 +1595,9 @@ if __name__ == '__main__':
     print("=" * 60)
     print(" LIFTLINK CARPOOL - ENHANCED VERSION 10.0")
     print("=" * 60)
+    print(f"App directory: {app.root_path}")
+    print(f"Data directory: {app.config['DATA_DIR']}")
+    print("=" * 60)
     print("Local URL: http://127.0.0.1:5000")
     print("Network URL: http://localhost:5000")
     print("Xavier's Institute of Engineering")
@@ -1121,21 +1614,19 @@ if __name__ == '__main__':
     print("- 🔍 SMART SEARCH & FILTERING")
     print("- 📊 COMPREHENSIVE ANALYTICS")
     
-    print(f"- Sample Routes: {len(sample_rides)} rides loaded")
-    print(f"- Registered Users: {len(users_db)} users available")
-    print(f"- Total Bookings: {len(bookings_db)} bookings recorded")
-    print(f"- Earnings Records: {len(earnings_db)} drivers have earnings")
+    print(f"- Sample Routes: {store.count_rides()} rides loaded")
+    print(f"- Registered Users: {store.count_users()} users available")
+    print(f"- Total Bookings: {store.count_bookings()} bookings recorded")
+    print(f"- Earnings Records: {store.count_earning_drivers()} drivers have earnings")
     print("=" * 60)
     print("🔐 TEST LOGIN CREDENTIALS:")
     print("Student - Email: test@student.xavier.ac.in")
     print("Staff - Email: john.doe@xavier.ac.in")
     print("Password: password123 / staff123")
     print("=" * 60)
-    print("💾 DATABASE FILES:")
-    print(f"- Users: {USERS_DB_FILE}")
-    print(f"- Rides: {RIDES_DB_FILE}")
-    print(f"- Bookings: {BOOKINGS_DB_FILE}")
-    print(f"- Earnings: {EARNINGS_DB_FILE}")
+    print(f"💾 DATABASE FILES ({store.name} backend):")
+    for db_file in store.files:
+        print(f"- {db_file}")
     print("=" * 60)
     print("🎉 NEW FEATURES ADDED:")
     print("✅ One booking per user per ride restriction")
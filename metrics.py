@@ -0,0 +1,255 @@
+# LiftLink Carpool - Instrumentation
+# Counters and latency histograms kept in memory by each worker process and
+# served as Prometheus text on /metrics. Recording a sample is a dict lookup
+# and a few additions under a lock - nothing is written anywhere until the
+# endpoint is scraped. Each gunicorn worker reports its own numbers, the
+# same as prometheus_client without its multiprocess mode;
+# liftlink_process_info names the worker that answered a scrape.
+#
+# TimedStore wraps the storage backend so every read and write is timed
+# without touching storage.py. StructuredLogWriter can replace stdout: the
+# emoji print() lines become buffered JSON records written in batches.
+
+import os
+import sys
+import json
+import time
+import bisect
+import atexit
+import threading
+
+# Seconds - from a cached 304 to a slow scrypt login
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self):
+        """{label values: count} - for merging into a Collected metric"""
+        with self._lock:
+            return dict(self._values)
+
+    def lines(self):
+        for label_values, value in sorted(self.snapshot().items()):
+            yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def lines(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), values):
+                cumulative += count
+                le = 'le="+Inf"' if bound == '+Inf' else f'le="{bound}"'
+                yield f"{self.name}_bucket{_labels(self.label_names, label_values, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.label_names, label_values)} {values[-1]!r}"
+            yield f"{self.name}_count{_labels(self.label_names, label_values)} {cumulative}"
+
+
+class Collected:
+    """Values read from elsewhere at scrape time: collect() returns {label values: number}"""
+
+    def __init__(self, name, help_text, kind, labels, collect):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.label_names = tuple(labels)
+        self.collect = collect
+
+    def lines(self):
+        try:
+            values = self.collect()
+        except Exception:
+            return  # A source that is not open yet (e.g. the store before the first request)
+        for label_values, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.label_names, label_values)} {_number(value)}"
+
+
+class Registry:
+    """Every metric of this process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labels=()):
+        return self._add(Counter(name, help_text, labels))
+
+    def histogram(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help_text, labels, buckets))
+
+    def collected(self, name, help_text, kind='gauge', labels=(), collect=dict):
+        return self._add(Collected(name, help_text, kind, labels, collect))
+
+    def render(self):
+        out = []
+        for metric in self._metrics:
+            out.append(f"# HELP {metric.name} {metric.help}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines())
+        out.append("# HELP liftlink_process_info Worker process reporting these metrics")
+        out.append("# TYPE liftlink_process_info gauge")
+        out.append(f'liftlink_process_info{{pid="{os.getpid()}"}} 1')
+        return '\n'.join(out) + '\n'
+
+
+# Storage calls timed by TimedStore; anything else passes straight through
+STORE_READS = frozenset({
+    'get_user', 'get_ride', 'all_rides', 'search_rides', 'rides_by_driver', 'driver_rides_newest',
+    'user_bookings', 'ride_bookings', 'get_confirmed_booking', 'earnings_for_driver', 'earnings_summary', 'earnings_rollup',
+    'count_users', 'count_rides', 'count_bookings', 'count_earning_drivers', 'profile_pictures',
+    'load_users', 'load_rides', 'load_bookings', 'load_earnings', 'refresh', 'next_earning_id',
+})
+STORE_WRITES = frozenset({
+    'add_user', 'update_user', 'add_ride', 'update_ride', 'delete_ride', 'reserve_seat',
+    'add_booking', 'update_booking', 'add_earning', 'save_users', 'save_rides', 'save_bookings',
+    'save_earnings', 'allocate_ride_id', 'allocate_booking_id', 'archive_past_rides',
+})
+
+
+class TimedStore:
+    """Storage backend proxy recording the latency of every read and write call"""
+
+    def __init__(self, store, histogram):
+        self._store = store
+        self._histogram = histogram
+
+    def __getattr__(self, name):
+        attr = getattr(self._store, name)
+        kind = 'read' if name in STORE_READS else 'write' if name in STORE_WRITES else None
+        if kind is None or not callable(attr):
+            return attr
+        histogram = self._histogram
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - start, name, kind)
+
+        self.__dict__[name] = timed  # Later lookups skip __getattr__
+        return timed
+
+
+class StructuredLogWriter:
+    """Stand-in for sys.stdout: each printed line becomes one buffered JSON record
+
+    context() supplies extra fields (e.g. the request endpoint). Records are
+    written when the buffer fills or every flush_interval seconds, on a
+    background thread, instead of one synchronous write per print().
+    """
+
+    def __init__(self, stream, context=None, flush_interval=1.0, max_buffer=256):
+        self.stream = stream
+        self.context = context
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self._partial = threading.local()
+        self._records = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        threading.Thread(target=self._flush_loop, name='structured-log', daemon=True).start()
+        atexit.register(self.flush)
+
+    def write(self, text):
+        partial = getattr(self._partial, 'text', '') + text
+        *lines, self._partial.text = partial.split('\n')
+        for line in lines:
+            if not line.strip():
+                continue
+            record = {'ts': round(time.time(), 3), 'pid': os.getpid(), 'msg': line.strip()}
+            if self.context is not None:
+                try:
+                    record.update(self.context())
+                except Exception:
+                    pass
+            with self._lock:
+                self._records.append(record)
+                full = len(self._records) >= self.max_buffer
+            if full:
+                self._wake.set()
+        return len(text)
+
+    def flush(self):
+        with self._lock:
+            records, self._records = self._records, []
+        if records:
+            self.stream.write(''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records))
+            self.stream.flush()
+
+    def _flush_loop(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+    def isatty(self):
+        return False
+
+    @property
+    def encoding(self):
+        return getattr(self.stream, 'encoding', 'utf-8')
+
+
+def install_structured_logging(context=None, flush_interval=1.0):
+    """Route print() output from every module through a StructuredLogWriter"""
+    if not isinstance(sys.stdout, StructuredLogWriter):
+        sys.stdout = StructuredLogWriter(sys.stdout, context, flush_interval)
+    return sys.stdout
@@ -0,0 +1,122 @@
+# LiftLink Carpool - Password hashing
+# Passwords are stored as scrypt hashes with a per-user salt:
+#   scrypt$<log2 N>$<r>$<p>$<salt>$<hash>        (salt and hash base64)
+# Accounts created before this kept a bare unsalted SHA-256 hex digest; they
+# still log in, and login replaces the hash with a scrypt one on success.
+#
+# scrypt is deliberately slow and memory-hard (128 * r * N bytes per call -
+# 16 MB at the default cost), so it runs on a small bounded thread pool:
+# hashlib.scrypt releases the GIL, other request threads keep serving pages,
+# and a login spike queues for the pool instead of exhausting memory.
+
+import os
+import base64
+import hashlib
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _b64encode(raw):
+    return base64.b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _b64decode(text):
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+class ScryptHasher:
+    """scrypt with tunable cost; cost is log2 of N, the CPU/memory factor"""
+    scheme = 'scrypt'
+
+    def __init__(self, cost=14, block_size=8, parallelism=1, salt_bytes=16, hash_bytes=32):
+        self.cost = cost
+        self.block_size = block_size
+        self.parallelism = parallelism
+        self.salt_bytes = salt_bytes
+        self.hash_bytes = hash_bytes
+
+    def _derive(self, password, salt, cost, block_size, parallelism):
+        n = 1 << cost
+        # OpenSSL refuses anything above its 32 MB default unless told how much to allow
+        maxmem = 128 * block_size * (n + parallelism + 2) + 1024 * 1024
+        return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=block_size,
+                              p=parallelism, maxmem=maxmem, dklen=self.hash_bytes)
+
+    def hash(self, password):
+        salt = os.urandom(self.salt_bytes)
+        digest = self._derive(password, salt, self.cost, self.block_size, self.parallelism)
+        return '$'.join([self.scheme, str(self.cost), str(self.block_size), str(self.parallelism),
+                         _b64encode(salt), _b64encode(digest)])
+
+    def verify(self, password, encoded):
+        try:
+            _, cost, block_size, parallelism, salt, digest = encoded.split('$')
+            expected = _b64decode(digest)
+            actual = self._derive(password, _b64decode(salt), int(cost), int(block_size), int(parallelism))
+        except (ValueError, TypeError):
+            return False
+        return hmac.compare_digest(actual, expected)
+
+    def needs_rehash(self, encoded):
+        """True when the hash was made with different settings than the current ones"""
+        return encoded.split('$')[1:4] != [str(self.cost), str(self.block_size), str(self.parallelism)]
+
+
+class Sha256Hasher:
+    """The original unsalted SHA-256 hex digest - only verified, always upgraded"""
+    scheme = 'sha256'
+
+    def hash(self, password):
+        return hashlib.sha256(password.encode('utf-8')).hexdigest()
+
+    def verify(self, password, encoded):
+        return hmac.compare_digest(self.hash(password), encoded)
+
+    def needs_rehash(self, encoded):
+        return True
+
+
+class PasswordHasher:
+    """Hashes with the current scheme and verifies any known one, on a bounded pool of KDF threads"""
+
+    def __init__(self, hasher, legacy=(Sha256Hasher(),), workers=4):
+        self.hasher = hasher
+        self._schemes = {h.scheme: h for h in legacy}
+        self._schemes[hasher.scheme] = hasher
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+        self._dummy = None
+        self._dummy_lock = threading.Lock()
+
+    def identify(self, encoded):
+        """The hasher that made a stored hash, or None if it is not one we know"""
+        if not encoded:
+            return None
+        scheme, sep, _ = encoded.partition('$')
+        if sep:
+            return self._schemes.get(scheme)
+        # Legacy rows are a bare hex digest with no scheme prefix
+        return self._schemes.get('sha256') if len(encoded) == 64 else None
+
+    def hash(self, password):
+        return self._executor.submit(self.hasher.hash, password).result()
+
+    def verify(self, password, encoded):
+        """(matches, needs_rehash) for a password against a stored hash"""
+        hasher = self.identify(encoded)
+        if hasher is None:
+            return False, False
+        ok = self._executor.submit(hasher.verify, password, encoded).result()
+        return ok, ok and (hasher is not self.hasher or hasher.needs_rehash(encoded))
+
+    def verify_missing(self, password):
+        """Spend the same time as a real check, so unknown emails cannot be told apart by timing"""
+        if self._dummy is None:
+            with self._dummy_lock:
+                if self._dummy is None:
+                    self._dummy = self.hash(os.urandom(16).hex())
+        self.verify(password, self._dummy)
+        return False
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,249 @@
+# LiftLink Carpool - Snapshot file formats for the JSON storage backend
+# 'json' is the original readable format. 'binary' is a compact
+# length-prefixed format that is memory-mapped on load: list tables
+# (rides, bookings) are one blob decoded in a single call, and map tables
+# (users, earnings) keep an offset index so each entry is decoded only
+# when it is first used. Worker boot no longer parses every user and
+# every driver's earnings history.
+#
+# Convert an existing data directory with:  python snapshots.py binary [data_dir]
+# (or back with "json"). Stores opened with a different format also
+# migrate automatically on their first load.
+
+import os
+import sys
+import json
+import mmap
+import struct
+from collections.abc import MutableMapping
+
+# msgpack is in requirements.txt; without it binary snapshots fall back to compact JSON
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+# Header: magic, codec tag, kind ('L' list / 'M' map), body offset, body length
+SNAPSHOT_MAGIC = b'LLSNAP1'
+SNAPSHOT_HEADER = struct.Struct('<7sccQQ')
+
+# Windows cannot replace a file that is still mapped, so read it instead
+MMAP_SNAPSHOTS = os.name != 'nt'
+
+
+def _msgpack_dumps(value):
+    return msgpack.packb(value, use_bin_type=True)
+
+
+def _msgpack_loads(payload):
+    return msgpack.unpackb(payload, raw=False, strict_map_key=False)
+
+
+def _json_dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _json_loads(payload):
+    return json.loads(bytes(payload))
+
+
+# Codec tag -> (dumps, loads). Neither codec can run code from a tampered data file
+CODECS = {b'j': (_json_dumps, _json_loads)}
+if MSGPACK_AVAILABLE:
+    CODECS[b'm'] = (_msgpack_dumps, _msgpack_loads)
+DEFAULT_CODEC = b'm' if MSGPACK_AVAILABLE else b'j'
+
+# Snapshots written by earlier versions without msgpack used pickle. Loading
+# them runs pickle.loads, so it is opt-in - set this once, convert, unset.
+if os.environ.get('LIFTLINK_ALLOW_PICKLE_SNAPSHOTS') == '1':
+    import pickle
+    CODECS[b'p'] = (None, pickle.loads)
+
+
+class SnapshotCodecError(ValueError):
+    """A snapshot written with a codec this process cannot (or will not) decode"""
+
+
+def _codec(tag):
+    try:
+        return CODECS[tag]
+    except KeyError:
+        if tag == b'p':
+            raise SnapshotCodecError("Snapshot uses the legacy pickle codec - convert it with "
+                                     "LIFTLINK_ALLOW_PICKLE_SNAPSHOTS=1 python snapshots.py binary") from None
+        raise SnapshotCodecError(f"Snapshot codec {tag!r} is not available (is msgpack installed?)") from None
+
+
+class LazyRecordMap(MutableMapping):
+    """Dict-like table backed by a mapped snapshot; entries are decoded on first access"""
+
+    def __init__(self, buffer, entries, codec_tag):
+        self._buffer = buffer  # Keeps the mapping alive
+        self._codec_tag = codec_tag
+        self._loads = _codec(codec_tag)[1]
+        self._raw = {key: (offset, length) for key, offset, length in entries}
+        self._decoded = {}
+        self._keys = dict.fromkeys(self._raw)  # Insertion-ordered key set
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, length = self._raw[key]
+        value = self._loads(self._buffer[offset:offset + length])
+        # setdefault keeps one shared object if two threads decode the same entry
+        return self._decoded.setdefault(key, value)
+
+    def __setitem__(self, key, value):
+        self._decoded[key] = value
+        self._keys[key] = None
+
+    def __delitem__(self, key):
+        del self._keys[key]
+        self._raw.pop(key, None)
+        self._decoded.pop(key, None)
+
+    def __contains__(self, key):
+        return key in self._keys
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def raw_entry(self, key, codec_tag):
+        """Encoded bytes of an entry that was never decoded, or None"""
+        if codec_tag != self._codec_tag or key in self._decoded:
+            return None
+        offset, length = self._raw[key]
+        return self._buffer[offset:offset + length]
+
+
+class JsonSnapshot:
+    """Plain JSON document - readable, but parsed in full on every load"""
+
+    name = 'json'
+    ext = '.json'
+
+    def encode(self, data, pretty=False):
+        if not isinstance(data, (list, dict)):
+            data = dict(data.items())
+        if pretty:
+            return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+        return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def load(self, path):
+        """Returns (data, file signature)"""
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+            st = os.fstat(f.fileno())
+        return data, (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class BinarySnapshot:
+    """Length-prefixed binary snapshot, memory-mapped and decoded lazily"""
+
+    name = 'binary'
+    ext = '.snap'
+
+    def __init__(self, codec_tag=DEFAULT_CODEC):
+        self.codec_tag = codec_tag
+
+    def encode(self, data, pretty=False):
+        dumps = _codec(self.codec_tag)[0]
+        if isinstance(data, list):
+            body = dumps(data)
+            return SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.codec_tag, b'L',
+                                        SNAPSHOT_HEADER.size, len(body)) + body
+
+        # Map: every value is its own blob, followed by an index of (key, offset, length)
+        chunks = []
+        entries = []
+        offset = SNAPSHOT_HEADER.size
+        for key in list(data):
+            payload = None
+            if isinstance(data, LazyRecordMap):
+                payload = data.raw_entry(key, self.codec_tag)  # Untouched entries are copied as-is
+            if payload is None:
+                payload = dumps(data[key])
+            chunks.append(payload)
+            entries.append((key, offset, len(payload)))
+            offset += len(payload)
+        index = dumps(entries)
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, self.codec_tag, b'M', offset, len(index))
+        return b''.join([header] + chunks + [index])
+
+    def load(self, path):
+        """Returns (data, file signature); maps come back as LazyRecordMap"""
+        with open(path, 'rb') as f:
+            st = os.fstat(f.fileno())
+            if MMAP_SNAPSHOTS and st.st_size:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buffer = f.read()
+        signature = (st.st_ino, st.st_size, st.st_mtime_ns)
+
+        if len(buffer) < SNAPSHOT_HEADER.size:
+            raise ValueError(f"Truncated snapshot {path}")
+        magic, codec_tag, kind, body_offset, body_length = SNAPSHOT_HEADER.unpack_from(buffer)
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"Not a LiftLink snapshot: {path}")
+        loads = _codec(codec_tag)[1]
+        body = buffer[body_offset:body_offset + body_length]
+        if kind == b'L':
+            return loads(body), signature
+        return LazyRecordMap(buffer, loads(body), codec_tag), signature
+
+
+SNAPSHOT_FORMATS = {'json': JsonSnapshot(), 'binary': BinarySnapshot()}
+
+
+def get_snapshot_format(name):
+    try:
+        return SNAPSHOT_FORMATS[name]
+    except KeyError:
+        raise ValueError(f"Unknown snapshot format: {name}") from None
+
+
+def find_snapshot(base_path, preferred):
+    """Existing snapshot for base_path as (path, format), trying the preferred format first"""
+    for fmt in [preferred] + [f for f in SNAPSHOT_FORMATS.values() if f is not preferred]:
+        path = base_path + fmt.ext
+        if os.path.exists(path):
+            return path, fmt
+    return None, None
+
+
+def convert(data_dir, target):
+    """Rewrite every table in data_dir in the target snapshot format"""
+    import contextlib
+    import io
+    import time
+    from storage import JsonStore
+
+    if find_snapshot(os.path.join(data_dir, 'users_db'), get_snapshot_format(target))[0] is None:
+        print(f"✗ No LiftLink data found in {data_dir}")
+        sys.exit(1)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Opening the store with the target format migrates each table it finds
+        store = JsonStore(data_dir, dict, list, snapshot_format=target)
+        # Rewrite the rest too, so tables already in the target format pick up the current codec
+        store.save_users()
+        store.save_rides()
+        store.save_bookings()
+        store.save_earnings()
+    elapsed = (time.perf_counter() - start) * 1000
+    for path in store.files:
+        print(f"✓ {path} ({os.path.getsize(path)} bytes)")
+    print(f"✓ Converted {data_dir} to {target} snapshots in {elapsed:.0f} ms")
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] not in SNAPSHOT_FORMATS:
+        print(f"Usage: python snapshots.py [{'|'.join(SNAPSHOT_FORMATS)}] [data_dir]")
+        sys.exit(1)
+    convert(sys.argv[2] if len(sys.argv) > 2 else 'data', sys.argv[1])
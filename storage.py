@@ -0,0 +1,1683 @@
+# LiftLink Carpool - Persistent Storage Engine
+# Append-only write-ahead log (WAL) with compacted JSON snapshots, plus the
+# JSON and SQLite backends the routes query through
+#
+# Every mutation is written as one JSON line to "<table>.wal" next to the
+# snapshot file, so the cost of a write depends on the size of the change and
+# not on the size of the table. Once enough records pile up, a background
+# checkpoint writes a fresh snapshot and truncates the log. At startup the
+# snapshot is loaded and the log is replayed on top of it.
+#
+# Several gunicorn workers can share the same data directory: writers hold an
+# exclusive lock on data/.liftlink.lock, and every request first checks the
+# file signatures (inode, size, mtime) and tails only the log bytes other
+# workers appended since the last look.
+#
+# Snapshots are JSON by default; the compact binary format in snapshots.py is
+# memory-mapped and decoded lazily for faster worker boot.
+#
+# Appends reach the OS immediately but are fsync'd in groups: a request that
+# wrote log records waits in sync_to() after releasing the locks, and one
+# fsync covers every record written by the requests waiting alongside it.
+
+import os
+import json
+import base64
+import itertools
+import collections
+import contextlib
+import mmap
+import struct
+import sqlite3
+import threading
+import time
+from datetime import date
+
+from indexes import SubstringIndex, DatePartitionIndex, EarningsLedger
+from snapshots import SNAPSHOT_FORMATS, SnapshotCodecError, get_snapshot_format, find_snapshot
+
+# File locking for multi-process deployments (not available on Windows)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Number of logged mutations before a background checkpoint is triggered
+WAL_CHECKPOINT_EVERY = 500
+
+# Group commit: how long the first writer waiting for durability lingers so
+# concurrent writers can share its fsync (seconds)
+WAL_GROUP_COMMIT_DELAY = 0.002
+
+
+def replay_list_records(items, records):
+    """Apply logged put/delete records to a list of dicts keyed by 'id'"""
+    by_id = {item['id']: item for item in items}
+    for record in records:
+        if record['op'] == 'put':
+            value = record['value']
+            by_id[value['id']] = value  # Existing ids keep their position
+        elif record['op'] == 'delete':
+            by_id.pop(record['key'], None)
+    return list(by_id.values())
+
+
+def replay_keyed_records(table, records):
+    """Apply logged put/delete records to a dict keyed by the record key (e.g. email -> user)"""
+    for record in records:
+        if record['op'] == 'put':
+            table[record['key']] = record['value']
+        elif record['op'] == 'delete':
+            table.pop(record['key'], None)
+    return table
+
+
+def replay_grouped_records(groups, records):
+    """Apply logged put records to a dict of lists (e.g. driver -> earnings) keyed by 'id'"""
+    touched = {}
+    for record in records:
+        key = record['key']
+        if key not in touched:
+            touched[key] = {item['id']: item for item in groups.get(key, [])}
+        if record['op'] == 'put':
+            value = record['value']
+            touched[key][value['id']] = value
+    for key, by_id in touched.items():
+        groups[key] = list(by_id.values())
+    return groups
+
+
+def file_signature(path):
+    """Cheap change detector for a file: (inode, size, mtime) or None if missing"""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+class WriteAheadLog:
+    """Append-only mutation log for one snapshot file"""
+
+    def __init__(self, snapshot_path, replay, checkpoint_every=WAL_CHECKPOINT_EVERY,
+                 commit_delay=WAL_GROUP_COMMIT_DELAY, fmt=None, pretty=False):
+        self.snapshot_path = snapshot_path
+        self.base_path = os.path.splitext(snapshot_path)[0]
+        self.fmt = fmt or SNAPSHOT_FORMATS['json']
+        self.pretty = pretty  # Indented JSON snapshots, for tables people edit by hand
+        self.log_path = self.base_path + '.wal'
+        # Log being folded into a snapshot by an in-flight checkpoint
+        self.rotated_log_path = self.log_path + '.old'
+        self.replay = replay
+        self.checkpoint_every = checkpoint_every
+        self.source = None  # Callable returning the live data, used by background checkpoints
+        self.guard = contextlib.nullcontext  # Cross-process write lock, provided by the store
+        self.replayed = 0
+        self._lock = threading.RLock()
+        self._checkpoint_lock = threading.Lock()
+        self._log_file = None
+        self._pending = 0
+        self._checkpoint_running = False
+        # What has been applied to memory: the snapshot file, and the live log up to _offset
+        self._snapshot_sig = None
+        self._log_ino = None
+        self._offset = 0
+        # Group commit: records are numbered as written; _synced_seq is on disk
+        self.commit_delay = commit_delay
+        self._sync_cond = threading.Condition()
+        self._sync_leader = False
+        self._written_seq = 0
+        self._synced_seq = 0
+        self.bytes_written = 0  # Log records and snapshots, for metrics
+
+    def load(self, default_factory):
+        """Load the snapshot and replay logged mutations on top of it"""
+        with self._lock:
+            self._close_log()
+            # A snapshot in the other format is loaded once and rewritten in ours
+            source_path, source_fmt = find_snapshot(self.base_path, self.fmt)
+            created = source_path is None
+            if created:
+                data = default_factory()
+                self._snapshot_sig = None
+            else:
+                data, self._snapshot_sig = source_fmt.load(source_path)
+
+            rotated_records, _, _ = self._read_records(self.rotated_log_path)
+            self._offset = 0
+            self._log_ino = None
+            log_records = self._read_new_records()
+            records = rotated_records + log_records
+            if records:
+                data = self.replay(data, records)
+            self.replayed = len(records)
+            self._pending = len(records)
+
+            if created:
+                # Persist the starting point so later log records have a base to replay onto
+                self._checkpoint(data)
+            elif source_path != self.snapshot_path:
+                self._checkpoint(data)
+                os.remove(source_path)
+                print(f"✓ Converted {source_path} to {self.snapshot_path}")
+        return data
+
+    def changed(self):
+        """True if another process has touched the snapshot or appended to the log"""
+        if file_signature(self.snapshot_path) != self._snapshot_sig:
+            return True
+        ino, size = self._log_state()
+        return ino != self._log_ino or size != self._offset
+
+    def sync(self, data, default_factory):
+        """Bring data up to date with the files, tailing the log when possible
+
+        Returns (data, records): records are log records other processes
+        appended since the last look, for the caller to apply to data in
+        place, or None if the table had to be reloaded from scratch.
+        """
+        with self._lock:
+            ino, size = self._log_state()
+            if file_signature(self.snapshot_path) != self._snapshot_sig or \
+                    (self._log_ino is not None and ino != self._log_ino):
+                # Snapshot replaced or log rotated by a checkpoint elsewhere
+                return self.load(default_factory), None
+            if ino is None or size == self._offset:
+                return data, []
+            return data, self._read_new_records()
+
+    def append(self, op, key=None, value=None):
+        """Append one mutation record; returns its sequence number for sync_to()"""
+        line = (json.dumps({'op': op, 'key': key, 'value': value},
+                           ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8')
+        with self._lock:
+            if self._log_file is None:
+                self._log_file = open(self.log_path, 'ab')
+            st = os.fstat(self._log_file.fileno())
+            if self._log_ino is None and self._offset == 0:
+                self._log_ino = st.st_ino
+            # flush() hands the bytes to the OS so other workers can tail them; fsync is batched
+            self._log_file.write(line)
+            self._log_file.flush()
+            self.bytes_written += len(line)
+            self._written_seq += 1
+            seq = self._written_seq
+            if st.st_ino == self._log_ino and st.st_size == self._offset:
+                # We were fully caught up, so our own record needs no replay
+                self._offset += len(line)
+            self._pending += 1
+            start_checkpoint = (self.source is not None and not self._checkpoint_running
+                                and self._pending >= self.checkpoint_every)
+            if start_checkpoint:
+                self._checkpoint_running = True
+
+        if start_checkpoint:
+            threading.Thread(target=self._background_checkpoint, daemon=True).start()
+        return seq
+
+    def sync_to(self, seq):
+        """Block until record seq is on disk; concurrent callers share one fsync"""
+        with self._sync_cond:
+            while self._synced_seq < seq and self._sync_leader:
+                self._sync_cond.wait()
+            if self._synced_seq >= seq:
+                return
+            self._sync_leader = True
+
+        target = self._synced_seq
+        try:
+            if self.commit_delay:
+                time.sleep(self.commit_delay)  # Let concurrent writers join this batch
+            with self._lock:
+                target = self._written_seq
+                # A closed log was fsync'd when it was closed
+                fd = os.dup(self._log_file.fileno()) if self._log_file is not None else None
+            if fd is not None:
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+        finally:
+            with self._sync_cond:
+                self._synced_seq = max(self._synced_seq, target)
+                self._sync_leader = False
+                self._sync_cond.notify_all()
+
+    def checkpoint(self, data=None):
+        """Write a compacted snapshot of data (default: the live source) and drop covered log records"""
+        with self.guard():
+            self._checkpoint(data)
+
+    def invalidate(self):
+        """Forget what has been applied, so the next sync() reloads from the files"""
+        with self._lock:
+            self._snapshot_sig = None
+
+    def close(self):
+        """Close the log file handle"""
+        with self._lock:
+            self._close_log()
+
+    def _checkpoint(self, data=None):
+        with self._checkpoint_lock:
+            with self._lock:
+                if data is None:
+                    data = self.source()
+                self._rotate_log()
+                # Serialize under the lock so the snapshot matches the rotated log.
+                # Compact JSON output uses the C encoder, which is also much faster.
+                payload = self.fmt.encode(data, pretty=self.pretty)
+                self._pending = 0
+
+                tmp_path = self.snapshot_path + '.tmp'
+                with open(tmp_path, 'wb') as f:
+                    f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.snapshot_path)
+                self._snapshot_sig = file_signature(self.snapshot_path)
+                self.bytes_written += len(payload)
+
+                if os.path.exists(self.rotated_log_path):
+                    os.remove(self.rotated_log_path)
+
+    def _background_checkpoint(self):
+        try:
+            self.checkpoint()
+            print(f"✓ Checkpointed {self.snapshot_path}")
+        except Exception as e:
+            print(f"✗ Checkpoint failed for {self.snapshot_path}: {e}")
+        finally:
+            with self._lock:
+                self._checkpoint_running = False
+
+    def _close_log(self):
+        if self._log_file is not None:
+            # Make every record written so far durable before the handle goes away
+            self._log_file.flush()
+            os.fsync(self._log_file.fileno())
+            self._log_file.close()
+            self._log_file = None
+
+    def _log_state(self):
+        try:
+            st = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None, 0
+        return st.st_ino, st.st_size
+
+    def _rotate_log(self):
+        """Move the live log aside so a crash mid-checkpoint still replays it"""
+        self._close_log()
+        self._log_ino = None
+        self._offset = 0
+        if not os.path.exists(self.log_path):
+            return
+        if os.path.exists(self.rotated_log_path):
+            # A previous checkpoint did not finish - fold the live log into it
+            with open(self.log_path, 'rb') as src, open(self.rotated_log_path, 'ab') as dst:
+                dst.write(src.read())
+            os.remove(self.log_path)
+        else:
+            os.replace(self.log_path, self.rotated_log_path)
+
+    def _read_new_records(self):
+        """Read records appended to the live log since the last read"""
+        records, ino, consumed = self._read_records(self.log_path, self._offset)
+        if ino is not None:
+            self._log_ino = ino
+            self._offset += consumed
+        return records
+
+    def _read_records(self, path, offset=0):
+        """Parse complete log lines from offset; returns (records, inode, bytes consumed)"""
+        records = []
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return records, None, 0
+        with f:
+            ino = os.fstat(f.fileno()).st_ino
+            f.seek(offset)
+            chunk = f.read()
+        # A line still being written by another process has no newline yet
+        consumed = chunk.rfind(b'\n') + 1
+        for line_no, line in enumerate(chunk[:consumed].splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                # A torn write from a crash - keep going with the intact records
+                print(f"✗ Ignoring corrupt log record {path}:+{offset} line {line_no}")
+        return records, ino, consumed
+
+
+# ---------------------------------------------------------------------------
+# Storage backends
+#
+# Routes talk to a store object instead of scanning module globals, so each
+# page issues targeted lookups. JsonStore keeps the tables in memory on top of
+# the snapshot + WAL files above; SqliteStore keeps them in an indexed SQLite
+# database running in WAL journal mode. Both expose the same methods.
+# ---------------------------------------------------------------------------
+
+class ReservationError(Exception):
+    """A seat could not be reserved; args[0] is the reason code"""
+
+    NOT_FOUND = 'not_found'
+    FULL = 'full'
+    OWN_RIDE = 'own_ride'
+    ALREADY_BOOKED = 'already_booked'
+
+    @property
+    def reason(self):
+        return self.args[0]
+
+
+def contains_ci(haystack, needle):
+    """Case-insensitive substring match shared by every backend's ride search"""
+    return needle.lower() in haystack.lower()
+
+
+def check_reservation(ride, passenger_email, existing_booking):
+    """Raise ReservationError unless passenger_email may book a seat on ride"""
+    if ride is None:
+        raise ReservationError(ReservationError.NOT_FOUND)
+    if ride['available_seats'] <= 0:
+        raise ReservationError(ReservationError.FULL)
+    if ride['driver_email'] == passenger_email:
+        raise ReservationError(ReservationError.OWN_RIDE)
+    if existing_booking is not None:
+        raise ReservationError(ReservationError.ALREADY_BOOKED)
+
+
+# Fields whose values repeat across many records: places, people, departments, dates.
+# JSON decoding gives every record its own copy of each string; pooling makes the
+# thousands of rides from one pickup point share a single object.
+POOLED_FIELDS = frozenset({
+    'from_location', 'to_location', 'date', 'departure_time', 'status',
+    'driver_name', 'driver_email', 'driver_phone', 'phone', 'car_model', 'department', 'year', 'designation',
+    'passenger_name', 'passenger_email', 'passenger_phone', 'user_type', 'gender',
+    'ride_from', 'ride_to', 'ride_date', 'ride_time', 'time',
+})
+
+
+class StringPool:
+    """One shared string object per distinct value of the pooled fields - a store-scoped sys.intern
+
+    Unlike sys.intern the pool belongs to the store, so its strings are not immortal.
+    """
+
+    def __init__(self):
+        self._strings = {}
+
+    def compact(self, record):
+        """Swap the record's pooled string values for their shared copies, in place"""
+        strings = self._strings
+        for key, value in record.items():
+            if key in POOLED_FIELDS and type(value) is str:
+                record[key] = strings.setdefault(value, value)
+        return record
+
+    def compact_all(self, records):
+        for record in records:
+            self.compact(record)
+
+
+def ride_sort_key(ride):
+    # Ride ids grow with creation order, so they break ties the way list order used to
+    return (ride['date'], ride['departure_time'], ride['id'])
+
+
+def encode_cursor(key):
+    """Opaque page token for a (date, time, id) sort key"""
+    return base64.urlsafe_b64encode(json.dumps(list(key), separators=(',', ':')).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """Sort key from encode_cursor(), or None for a missing or malformed token"""
+    if not token:
+        return None
+    try:
+        ride_date, ride_time, record_id = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+    except (ValueError, TypeError):
+        return None
+    if isinstance(ride_date, str) and isinstance(ride_time, str) and isinstance(record_id, int):
+        return (ride_date, ride_time, record_id)
+    return None
+
+
+def today_str():
+    return date.today().isoformat()
+
+
+class JsonStore:
+    """In-memory tables persisted as JSON snapshots plus write-ahead logs"""
+
+    name = 'json'
+
+    def __init__(self, data_dir, default_users, default_rides, snapshot_format='json'):
+        self.fmt = get_snapshot_format(snapshot_format)
+        self.users_file = os.path.join(data_dir, 'users_db' + self.fmt.ext)
+        self.rides_file = os.path.join(data_dir, 'rides_db' + self.fmt.ext)
+        self.rides_archive_file = os.path.join(data_dir, 'rides_archive.jsonl')
+        self.bookings_file = os.path.join(data_dir, 'bookings_db' + self.fmt.ext)
+        self.earnings_file = os.path.join(data_dir, 'earnings_db' + self.fmt.ext)
+        self.files = [self.users_file, self.rides_file, self.bookings_file, self.earnings_file]
+        self.default_users = default_users
+        self.default_rides = default_rides
+        # Thread lock + cross-process file lock; see transaction()
+        self.lock = threading.RLock()
+        self._lock_file = open(os.path.join(data_dir, '.liftlink.lock'), 'a+')
+        # Counters shared by every worker, mapped from data/.generation: the data
+        # generation, then the highest ride id ever handed out
+        self._generation_file = open(os.path.join(data_dir, '.generation'), 'a+b')
+        self._generation_map = None
+        self._lock_depth = 0
+        self._local = threading.local()  # Log records this thread still has to see on disk
+        self._users_version = 0  # Bumped whenever this process sees the users table change
+
+        # Ride lookups: id -> ride, trigram indexes over the locations, date partitions
+        self.rides_by_id = {}
+        self.from_index = SubstringIndex()
+        self.to_index = SubstringIndex()
+        self.ride_dates = DatePartitionIndex()
+        self.driver_ride_ids = {}  # driver email -> ids of their hot rides
+        # Past rides moved out of the hot set, loaded only for driver history
+        self._archive_sig = None
+        self._archive_by_driver = {}
+        self._archive_max_id = 0
+        self._archived_before = None
+        # Booking lookups: id -> booking, passenger -> {ride_id -> confirmed booking},
+        # ride -> {booking id -> confirmed booking}
+        self.bookings_by_id = {}
+        self.confirmed_bookings = {}
+        self.ride_confirmed_bookings = {}
+        # Monotonic booking ids: never reused, even if bookings are removed by hand
+        self._next_booking_id = 1
+        # Per-driver earnings totals, rollups and time-ordered history
+        self.ledger = EarningsLedger()
+        self.contended_transactions = 0  # Write transactions that waited for another writer; counted under the lock
+        # Shared copies of repeated strings across every table's records
+        self.strings = StringPool()
+
+        # Append-only logs for every table; users stay indented so the file remains hand-editable
+        self.users_wal = WriteAheadLog(self.users_file, replay_keyed_records, fmt=self.fmt, pretty=True)
+        self.rides_wal = WriteAheadLog(self.rides_file, replay_list_records, fmt=self.fmt)
+        self.bookings_wal = WriteAheadLog(self.bookings_file, replay_list_records, fmt=self.fmt)
+        self.earnings_wal = WriteAheadLog(self.earnings_file, replay_grouped_records, fmt=self.fmt)
+
+        with self.lock:
+            # Exclusive while loading so only one worker creates the default files
+            self._flock(fcntl.LOCK_EX if fcntl else None)
+            try:
+                if os.fstat(self._generation_file.fileno()).st_size < 16:
+                    self._generation_file.truncate(16)
+                self._generation_map = mmap.mmap(self._generation_file.fileno(), 16)
+                self.users = self.load_users()
+                self.rides = self.load_rides()
+                self.bookings = self.load_bookings()
+                self.earnings = self.load_earnings()
+                self._rebuild_ride_indexes()
+                self._rebuild_booking_indexes()
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+
+        for wal in (self.users_wal, self.rides_wal, self.bookings_wal, self.earnings_wal):
+            wal.guard = self.transaction
+        # Background checkpoints snapshot whatever the live structures are at that moment
+        self.users_wal.source = lambda: self.users
+        self.rides_wal.source = lambda: self.rides
+        self.bookings_wal.source = lambda: self.bookings
+        self.earnings_wal.source = lambda: self.earnings
+        self._pool_loaded_tables()
+
+    # Multi-process coherence
+    def _flock(self, operation):
+        if operation is not None:
+            fcntl.flock(self._lock_file.fileno(), operation)
+
+    def _flock_exclusive(self):
+        """Take the cross-process write lock; True if another worker was holding it"""
+        if fcntl is None:
+            return False
+        try:
+            self._flock(fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return False
+        except BlockingIOError:
+            self._flock(fcntl.LOCK_EX)
+            return True
+
+    @contextlib.contextmanager
+    def transaction(self, durable=True):
+        """Exclusive write section across threads and worker processes, with the tables re-synced first
+
+        Returns only once the log records written inside it are on disk. That wait
+        happens after the locks are released, so concurrent transactions share fsyncs.
+        With durable=False the caller must call _wait_durable() itself.
+        """
+        outer = False
+        # Try first so a wait is seen where it happens; re-entry never waits
+        waited = not self.lock.acquire(blocking=False)
+        if waited:
+            self.lock.acquire()
+        try:
+            outer = self._lock_depth == 0
+            if outer:
+                waited = self._flock_exclusive() or waited
+                if waited:
+                    self.contended_transactions += 1
+            self._lock_depth += 1
+            try:
+                if outer:
+                    self._sync_tables()
+                yield
+            finally:
+                self._lock_depth -= 1
+                if outer:
+                    self._flock(fcntl.LOCK_UN if fcntl else None)
+        finally:
+            self.lock.release()
+            if outer and durable:
+                self._wait_durable()
+
+    def _wait_durable(self):
+        pending = getattr(self._local, 'pending', None)
+        if not pending:
+            return
+        self._local.pending = {}
+        for wal, seq in pending.items():
+            wal.sync_to(seq)
+
+    def refresh(self):
+        """Pick up changes other workers made to the data files (cheap when nothing changed)"""
+        if self._archived_before != today_str():
+            self.archive_past_rides()
+        with self.lock:
+            if self._lock_depth or not self._changed_on_disk():
+                return
+            # Shared lock: no writer is half-way through an append or checkpoint
+            self._flock(fcntl.LOCK_SH if fcntl else None)
+            try:
+                self._sync_tables()
+            finally:
+                self._flock(fcntl.LOCK_UN if fcntl else None)
+
+    def generation(self):
+        """Counter bumped by every change to users, rides, bookings or earnings, in any worker"""
+        return struct.unpack_from('<Q', self._generation_map)[0]
+
+    def _bump_generation(self):
+        # Callers hold the exclusive transaction lock, so the read-modify-write cannot race
+        struct.pack_into('<Q', self._generation_map, 0, self.generation() + 1)
+
+    def users_version(self):
+        """Changes whenever any worker changes the users table (as seen since the last refresh)"""
+        return self._users_version
+
+    def bytes_written(self):
+        """{table: bytes} this process has written to the data files (log records and snapshots)"""
+        return {'users': self.users_wal.bytes_written, 'rides': self.rides_wal.bytes_written,
+                'bookings': self.bookings_wal.bytes_written, 'earnings': self.earnings_wal.bytes_written}
+
+    def _changed_on_disk(self):
+        return (self.users_wal.changed() or self.rides_wal.changed()
+                or self.bookings_wal.changed() or self.earnings_wal.changed())
+
+    def _sync_tables(self):
+        reloaded = False
+        self.users, user_records = self.users_wal.sync(self.users, self.default_users)
+        if user_records is None:
+            self._users_version += 1
+            reloaded = True
+        elif user_records:
+            for record in user_records:
+                if record['op'] == 'put':
+                    self.strings.compact(record['value'])
+            replay_keyed_records(self.users, user_records)
+            self._users_version += 1
+        self.rides, ride_records = self.rides_wal.sync(self.rides, self.default_rides)
+        if ride_records is None:
+            self._rebuild_ride_indexes()
+            reloaded = True
+        else:
+            self._apply_ride_records(ride_records)
+        self.bookings, booking_records = self.bookings_wal.sync(self.bookings, list)
+        if booking_records is None:
+            self._rebuild_booking_indexes()
+            reloaded = True
+        else:
+            self._apply_booking_records(booking_records)
+        self.earnings, earning_records = self.earnings_wal.sync(self.earnings, dict)
+        if earning_records is None:
+            self.ledger.clear()
+            reloaded = True
+        else:
+            self._apply_earning_records(earning_records)
+        if reloaded:
+            self._pool_loaded_tables()
+
+    # Tailed log records: applied through the id indexes, so the cost depends on
+    # the records and not on the size of the tables
+    def _apply_ride_records(self, records):
+        deleted = set()
+        for record in records:
+            if record['op'] == 'put':
+                value = record['value']
+                current = self.rides_by_id.get(value['id'])
+                if current is None:
+                    self.rides.append(value)
+                else:
+                    # Update the existing object: the table and every index already point at it
+                    current.update(value)
+                    value = current
+                self._index_ride(value)
+            elif record['op'] == 'delete':
+                if record['key'] in self.rides_by_id:
+                    deleted.add(record['key'])
+                self._unindex_ride(record['key'])
+        if deleted:
+            # One pass over the table for the whole batch (e.g. another worker's daily archival)
+            self.rides = [ride for ride in self.rides
+                          if ride['id'] not in deleted or self.rides_by_id.get(ride['id']) is ride]
+
+    def _apply_booking_records(self, records):
+        for record in records:
+            if record['op'] != 'put':
+                continue
+            value = self.strings.compact(record['value'])
+            current = self.bookings_by_id.get(value['id'])
+            if current is None:
+                self.bookings.append(value)
+            else:
+                current.update(value)
+                value = current
+            self._index_booking(value)
+
+    def _apply_earning_records(self, records):
+        for record in records:
+            if record['op'] != 'put':
+                continue
+            value = self.strings.compact(record['value'])
+            history = self.earnings.setdefault(record['key'], [])
+            if history and history[-1]['id'] >= value['id']:
+                # Ids grow per driver, so only a rewritten record lands here
+                for position, earning in enumerate(history):
+                    if earning['id'] == value['id']:
+                        history[position] = value
+                        break
+                else:
+                    history.append(value)
+            else:
+                history.append(value)
+            self.ledger.add(record['key'], value)
+
+    def _pool_loaded_tables(self):
+        """Pool the strings of whole tables on a background thread, off the boot and request path
+
+        Swapping a value for an equal shared string is invisible to readers, so
+        requests can use the records while this runs.
+        """
+        tables = [self.rides, self.bookings]
+        if isinstance(self.users, dict):  # Lazily decoded binary maps are left as they are
+            tables.append(list(self.users.values()))
+        if isinstance(self.earnings, dict):  # Binary maps are pooled per driver on first use
+            tables.extend(list(self.earnings.values()))
+
+        def pool():
+            for records in tables:
+                self.strings.compact_all(records)
+        threading.Thread(target=pool, name='string-pool', daemon=True).start()
+
+    # Ride indexes
+    def _index_ride(self, ride):
+        self.strings.compact(ride)
+        self.rides_by_id[ride['id']] = ride
+        self.driver_ride_ids.setdefault(ride['driver_email'], set()).add(ride['id'])
+        self.from_index.update(ride['id'], ride['from_location'])
+        self.to_index.update(ride['id'], ride['to_location'])
+        self.ride_dates.add(ride['id'], ride['date'], ride['departure_time'])
+
+    def _unindex_ride(self, ride_id):
+        ride = self.rides_by_id.pop(ride_id, None)
+        if ride is not None:
+            self.driver_ride_ids.get(ride['driver_email'], set()).discard(ride_id)
+        self.from_index.remove(ride_id)
+        self.to_index.remove(ride_id)
+        self.ride_dates.remove(ride_id)
+
+    def _rebuild_ride_indexes(self):
+        self.rides_by_id = {ride['id']: ride for ride in self.rides}
+        self.driver_ride_ids = {}
+        for ride in self.rides:
+            self.driver_ride_ids.setdefault(ride['driver_email'], set()).add(ride['id'])
+        self.from_index.clear()
+        self.to_index.clear()
+        for ride in self.rides:
+            self.from_index.add(ride['id'], ride['from_location'])
+            self.to_index.add(ride['id'], ride['to_location'])
+        self.ride_dates.rebuild((ride['id'], ride['date'], ride['departure_time']) for ride in self.rides)
+
+    # Booking indexes
+    def _index_booking(self, booking):
+        self.bookings_by_id[booking['id']] = booking
+        if isinstance(booking['id'], int) and booking['id'] >= self._next_booking_id:
+            self._next_booking_id = booking['id'] + 1
+        by_ride = self.confirmed_bookings.setdefault(booking['passenger_email'], {})
+        on_ride = self.ride_confirmed_bookings.setdefault(booking['ride_id'], {})
+        if booking['status'] == 'confirmed':
+            by_ride[booking['ride_id']] = booking
+            on_ride[booking['id']] = booking
+        else:
+            current = by_ride.get(booking['ride_id'])
+            if current is not None and current['id'] == booking['id']:
+                del by_ride[booking['ride_id']]
+            on_ride.pop(booking['id'], None)
+
+    def _rebuild_booking_indexes(self):
+        self.bookings_by_id = {}
+        self.confirmed_bookings = {}
+        self.ride_confirmed_bookings = {}
+        for booking in self.bookings:
+            self._index_booking(booking)
+
+    # Load / save (whole tables)
+    def load_users(self):
+        """Load users database from its snapshot and replay the write-ahead log"""
+        try:
+            if find_snapshot(self.users_wal.base_path, self.fmt)[0] is None:
+                print("Creating new users database...")
+            users_data = self.users_wal.load(self.default_users)
+            self._users_version += 1
+            print(f"✓ Loaded {len(users_data)} users from database ({self.users_wal.replayed} log records replayed)")
+            return users_data
+        except SnapshotCodecError:
+            raise  # Falling back to the defaults would overwrite every account on the next save
+        except Exception as e:
+            print(f"✗ Error loading users database: {e}")
+            return self.default_users()
+
+    def save_users(self, users_data=None):
+        """Checkpoint users database: write a compacted snapshot and truncate the log"""
+        users_data = self.users if users_data is None else users_data
+        try:
+            with self.transaction():
+                self.users_wal.checkpoint(users_data)
+                self._users_version += 1
+                self._bump_generation()
+            print(f"✓ Saved {len(users_data)} users to database")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving users database: {e}")
+            return False
+
+    def load_rides(self):
+        """Load rides database from its snapshot and replay the write-ahead log"""
+        try:
+            if find_snapshot(self.rides_wal.base_path, self.fmt)[0] is None:
+                print("Creating new rides database...")
+            rides_data = self.rides_wal.load(self.default_rides)
+            print(f"✓ Loaded {len(rides_data)} rides from database ({self.rides_wal.replayed} log records replayed)")
+            return rides_data
+        except Exception as e:
+            print(f"✗ Error loading rides database: {e}")
+            return self.default_rides()
+
+    def save_rides(self, rides_data=None):
+        """Checkpoint rides database: write a compacted snapshot and truncate the log"""
+        rides_data = self.rides if rides_data is None else rides_data
+        try:
+            with self.transaction():
+                self.rides_wal.checkpoint(rides_data)
+                self._bump_generation()
+            print(f"✓ Saved {len(rides_data)} rides to database")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving rides database: {e}")
+            return False
+
+    def load_bookings(self):
+        """Load bookings database from its snapshot and replay the write-ahead log"""
+        try:
+            if find_snapshot(self.bookings_wal.base_path, self.fmt)[0] is None:
+                print("Creating new bookings database...")
+            bookings_data = self.bookings_wal.load(list)
+            print(f"✓ Loaded {len(bookings_data)} bookings from database ({self.bookings_wal.replayed} log records replayed)")
+            return bookings_data
+        except Exception as e:
+            print(f"✗ Error loading bookings database: {e}")
+            return []
+
+    def save_bookings(self, bookings_data=None):
+        """Checkpoint bookings database: write a compacted snapshot and truncate the log"""
+        bookings_data = self.bookings if bookings_data is None else bookings_data
+        try:
+            with self.transaction():
+                self.bookings_wal.checkpoint(bookings_data)
+                self._bump_generation()
+            print(f"✓ Saved {len(bookings_data)} bookings to database")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving bookings database: {e}")
+            return False
+
+    def load_earnings(self):
+        """Load earnings database from its snapshot and replay the write-ahead log"""
+        try:
+            if find_snapshot(self.earnings_wal.base_path, self.fmt)[0] is None:
+                print("Creating new earnings database...")
+            earnings_data = self.earnings_wal.load(dict)
+            print(f"✓ Loaded earnings data from database ({self.earnings_wal.replayed} log records replayed)")
+            return earnings_data
+        except Exception as e:
+            print(f"✗ Error loading earnings database: {e}")
+            return {}
+
+    def save_earnings(self, earnings_data=None):
+        """Checkpoint earnings database: write a compacted snapshot and truncate the log"""
+        earnings_data = self.earnings if earnings_data is None else earnings_data
+        try:
+            with self.transaction():
+                self.earnings_wal.checkpoint(earnings_data)
+                self._bump_generation()
+            print("✓ Saved earnings data to database")
+            return True
+        except Exception as e:
+            print(f"✗ Error saving earnings database: {e}")
+            return False
+
+    # Users
+    def get_user(self, email):
+        return self.users.get(email)
+
+    def add_user(self, email, user_data):
+        with self.transaction():
+            self.users[email] = user_data
+            self._users_version += 1
+            self._log(self.users_wal, 'put', email, user_data)
+
+    def update_user(self, email, updates):
+        """Log the changed user; the snapshot is rewritten only by checkpoints"""
+        with self.transaction():
+            user = self.users[email]
+            user.update(updates)
+            self._users_version += 1
+            self._log(self.users_wal, 'put', email, user)
+
+    def count_users(self):
+        return len(self.users)
+
+    def profile_pictures(self):
+        """Picture filenames any user points at, including uploads still being processed"""
+        with self.transaction():
+            return {user.get(field) for user in self.users.values()
+                    for field in ('profile_pic', 'profile_pic_pending') if user.get(field)}
+
+    # Rides
+    def get_ride(self, ride_id):
+        return self.rides_by_id.get(ride_id)
+
+    def all_rides(self):
+        return list(self.rides)
+
+    def rides_by_driver(self, driver_email):
+        """Driver's rides, including ones already archived"""
+        archived = self._load_archive().get(driver_email, [])
+        with self.lock:  # Writers change the indexes under the same lock
+            hot_ids = sorted(self.driver_ride_ids.get(driver_email, ()))
+            return archived + [self.rides_by_id[ride_id] for ride_id in hot_ids]
+
+    def driver_rides_newest(self, driver_email, before=None, limit=None):
+        """Driver's rides newest first by (date, departure_time, id), keyset-paginated below before"""
+        rides = sorted(self.rides_by_driver(driver_email), key=ride_sort_key, reverse=True)
+        if before is not None:
+            rides = [ride for ride in rides if ride_sort_key(ride) < before]
+        return rides if limit is None else rides[:limit]
+
+    def search_rides(self, search_from='', search_to='', search_date='', exclude_driver=None,
+                     after=None, limit=None):
+        """Rides with free seats matching the filters, ordered by date and time
+
+        Without a date only upcoming rides (today onwards) are considered.
+        after/limit page through the results by (date, departure_time, id).
+        """
+        # Read the indexes under the store lock - writers in other threads change them in place
+        with self.lock:
+            # Location filters intersect trigram posting lists instead of scanning every ride
+            ride_ids = None
+            if search_from:
+                ride_ids = self.from_index.search(search_from)
+            if search_to:
+                to_ids = self.to_index.search(search_to)
+                ride_ids = to_ids if ride_ids is None else ride_ids & to_ids
+
+            first_date = search_date or today_str()
+            date_count = self.ride_dates.count_on(search_date) if search_date else self.ride_dates.count_from(first_date)
+            if ride_ids is not None and len(ride_ids) < date_count:
+                # Few location matches - filter them by date and sort
+                rides = [self.rides_by_id[ride_id] for ride_id in ride_ids]
+                if search_date:
+                    rides = [r for r in rides if r['date'] == search_date]
+                else:
+                    rides = [r for r in rides if r['date'] >= first_date]
+                rides.sort(key=ride_sort_key)
+                if after is not None:
+                    rides = [r for r in rides if ride_sort_key(r) > after]
+            else:
+                # Walk the date partitions lazily - they are already in display order
+                ordered_ids = (self.ride_dates.ids_on(search_date, after) if search_date
+                               else self.ride_dates.ids_from(first_date, after))
+                rides = (self.rides_by_id[ride_id] for ride_id in ordered_ids
+                         if ride_ids is None or ride_id in ride_ids)
+            matches = (r for r in rides if r['available_seats'] > 0 and r['driver_email'] != exclude_driver)
+            return list(itertools.islice(matches, limit))
+
+    def allocate_ride_id(self):
+        """Reserve a new ride id; ids of cancelled and archived rides are never handed out again"""
+        with self.transaction():
+            ride_id = max(struct.unpack_from('<Q', self._generation_map, 8)[0],
+                          max(self.rides_by_id, default=0), self._load_archive_max_id()) + 1
+            struct.pack_into('<Q', self._generation_map, 8, ride_id)
+            return ride_id
+
+    def archive_past_rides(self, cutoff_date=None):
+        """Move rides dated before cutoff_date (default today) out of the hot set"""
+        cutoff_date = cutoff_date or today_str()
+        with self.transaction():
+            self._archived_before = cutoff_date
+            past_ids = self.ride_dates.ids_before(cutoff_date)
+            if not past_ids:
+                return 0
+            past_rides = [self.rides_by_id[ride_id] for ride_id in past_ids]
+            # Archive first: a crash before the deletes only leaves duplicates, which loading drops
+            with open(self.rides_archive_file, 'a', encoding='utf-8') as f:
+                for ride in past_rides:
+                    f.write(json.dumps(ride, ensure_ascii=False, separators=(',', ':')) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            past = set(past_ids)
+            self.rides = [r for r in self.rides if r['id'] not in past]
+            for ride_id in past_ids:
+                self._unindex_ride(ride_id)
+                self._log(self.rides_wal, 'delete', key=ride_id)
+        print(f"✓ Archived {len(past_ids)} rides dated before {cutoff_date}")
+        return len(past_ids)
+
+    def _load_archive(self):
+        """Archived rides grouped by driver, re-read only when the archive file changes"""
+        signature = file_signature(self.rides_archive_file)
+        if signature != self._archive_sig:
+            by_id = {}
+            if signature is not None:
+                with open(self.rides_archive_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        if not line.endswith('\n'):
+                            break  # Another worker is still writing this line
+                        if line.strip():
+                            ride = self.strings.compact(json.loads(line))
+                            by_id[ride['id']] = ride
+            by_driver = {}
+            for ride in by_id.values():
+                by_driver.setdefault(ride['driver_email'], []).append(ride)
+            self._archive_by_driver = by_driver
+            self._archive_max_id = max(by_id, default=0)
+            self._archive_sig = signature
+        return self._archive_by_driver
+
+    def _load_archive_max_id(self):
+        self._load_archive()
+        return self._archive_max_id
+
+    def add_ride(self, ride):
+        with self.transaction():
+            self.rides.append(ride)
+            self._index_ride(ride)
+            self._log(self.rides_wal, 'put', value=ride)
+
+    def update_ride(self, ride):
+        with self.transaction():
+            ride['version'] = ride.get('version', 0) + 1
+            current = self.rides_by_id.get(ride['id'])
+            if current is not None and current is not ride:
+                self.rides[self.rides.index(current)] = ride
+            self._index_ride(ride)
+            self._log(self.rides_wal, 'put', value=ride)
+
+    def delete_ride(self, ride_id):
+        with self.transaction():
+            self.rides = [r for r in self.rides if r['id'] != ride_id]
+            self._unindex_ride(ride_id)
+            self._log(self.rides_wal, 'delete', key=ride_id)
+
+    def count_rides(self):
+        return len(self.rides)
+
+    # Bookings
+    def get_confirmed_booking(self, passenger_email, ride_id):
+        return self.confirmed_bookings.get(passenger_email, {}).get(ride_id)
+
+    def user_bookings(self, passenger_email):
+        """Passenger's confirmed bookings as {ride_id: booking}"""
+        with self.lock:  # A copy - writers in other threads change the index in place
+            return dict(self.confirmed_bookings.get(passenger_email, {}))
+
+    def ride_bookings(self, ride_id):
+        """Confirmed bookings on a ride, oldest first"""
+        with self.lock:
+            bookings = self.ride_confirmed_bookings.get(ride_id, {})
+            return [bookings[booking_id] for booking_id in sorted(bookings)]
+
+    def next_booking_id(self):
+        return self._next_booking_id
+
+    def allocate_booking_id(self):
+        """Reserve the next booking id (call inside a transaction so every worker has synced)"""
+        with self.transaction():
+            booking_id = self._next_booking_id
+            self._next_booking_id += 1
+            return booking_id
+
+    def reserve_seat(self, ride_id, passenger_email, build_booking, on_reserved=None):
+        """Atomically take one seat on a ride and record the booking
+
+        The check, decrement and booking run in one store transaction, which
+        excludes every other writer in this and the other worker processes;
+        only the log appends happen inside it, the fsync waits after it.
+        build_booking(ride, booking_id) returns the booking dict and
+        on_reserved(ride, booking) runs inside the same atomic section.
+        Raises ReservationError if the seat cannot be taken.
+        """
+        try:
+            with self.transaction(durable=False):
+                ride = self.rides_by_id.get(ride_id)
+                check_reservation(ride, passenger_email, self.get_confirmed_booking(passenger_email, ride_id))
+                ride['available_seats'] -= 1
+                booking = build_booking(ride, self.allocate_booking_id())
+                self.add_booking(booking)
+                if on_reserved is not None:
+                    on_reserved(ride, booking)
+                self.update_ride(ride)
+        finally:
+            # Wait for the group commit outside the store lock so concurrent bookings share fsyncs
+            self._wait_durable()
+        return ride, booking
+
+    def add_booking(self, booking):
+        with self.transaction():
+            self.strings.compact(booking)
+            self.bookings.append(booking)
+            self._index_booking(booking)
+            self._log(self.bookings_wal, 'put', value=booking)
+
+    def update_booking(self, booking):
+        """Persist a changed booking, e.g. a status change on cancellation"""
+        with self.transaction():
+            current = self.bookings_by_id.get(booking['id'])
+            if current is not None and current is not booking:
+                self.bookings[self.bookings.index(current)] = booking
+            self._index_booking(booking)
+            self._log(self.bookings_wal, 'put', value=booking)
+
+    def count_bookings(self):
+        return len(self.bookings)
+
+    # Earnings
+    def _driver_ledger(self, driver_email):
+        ledger = self.ledger.get(driver_email)
+        if ledger is None:
+            # Built under the store lock so no concurrent add_earning is missed
+            with self.lock:
+                ledger = self.ledger.get(driver_email)
+                if ledger is None:
+                    records = self.earnings.get(driver_email, [])
+                    self.strings.compact_all(records)
+                    ledger = self.ledger.build(driver_email, records)
+        return ledger
+
+    def earnings_for_driver(self, driver_email, before=None, limit=None):
+        """Driver's earnings records, newest first, keyset-paginated below before"""
+        ledger = self._driver_ledger(driver_email)
+        with self.lock:  # Writers update the ledger's keys and records together
+            return ledger.newest_first(before, limit)
+
+    def earnings_summary(self, driver_email):
+        """Driver's running totals as {'total': amount, 'count': records}"""
+        ledger = self._driver_ledger(driver_email)
+        return {'total': ledger.total, 'count': ledger.count}
+
+    def earnings_rollup(self, driver_email, period='month'):
+        """Driver's totals per 'day' or 'month', oldest period first"""
+        ledger = self._driver_ledger(driver_email)
+        rollup = ledger.daily if period == 'day' else ledger.monthly
+        return [{'period': key, 'total': total, 'count': count}
+                for key, (total, count) in sorted(rollup.items())]
+
+    def next_earning_id(self, driver_email):
+        return len(self.earnings.get(driver_email, [])) + 1
+
+    def add_earning(self, driver_email, earning_record):
+        with self.transaction():
+            self.strings.compact(earning_record)
+            self.earnings.setdefault(driver_email, []).append(earning_record)
+            self.ledger.add(driver_email, earning_record)
+            self._log(self.earnings_wal, 'put', key=driver_email, value=earning_record)
+
+    def count_earning_drivers(self):
+        return len(self.earnings)
+
+    def _log(self, wal, op, key=None, value=None):
+        self._bump_generation()
+        try:
+            seq = wal.append(op, key=key, value=value)
+        except Exception as e:
+            # Memory already holds changes that never reached the log - reload the logged
+            # tables from disk on the next sync, and fail the transaction instead of reporting success
+            print(f"✗ Error logging to {wal.log_path}: {e}")
+            for table_wal in (self.users_wal, self.rides_wal, self.bookings_wal, self.earnings_wal):
+                table_wal.invalidate()
+            raise
+        if not hasattr(self._local, 'pending'):
+            self._local.pending = {}
+        self._local.pending[wal] = seq
+
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    email TEXT PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS rides (
+    id INTEGER PRIMARY KEY,
+    driver_email TEXT NOT NULL,
+    from_location TEXT NOT NULL,
+    to_location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    departure_time TEXT NOT NULL,
+    available_seats INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rides_driver ON rides(driver_email);
+CREATE INDEX IF NOT EXISTS idx_rides_date_time ON rides(date, departure_time);
+CREATE TABLE IF NOT EXISTS rides_archive (
+    id INTEGER PRIMARY KEY,
+    driver_email TEXT NOT NULL,
+    from_location TEXT NOT NULL,
+    to_location TEXT NOT NULL,
+    date TEXT NOT NULL,
+    departure_time TEXT NOT NULL,
+    available_seats INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_rides_archive_driver ON rides_archive(driver_email);
+CREATE TABLE IF NOT EXISTS bookings (
+    id INTEGER PRIMARY KEY,
+    passenger_email TEXT NOT NULL,
+    ride_id INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_bookings_passenger_ride_status ON bookings(passenger_email, ride_id, status);
+CREATE INDEX IF NOT EXISTS idx_bookings_ride_status ON bookings(ride_id, status);
+CREATE TABLE IF NOT EXISTS earnings (
+    driver_email TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    time TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (driver_email, id)
+);
+CREATE INDEX IF NOT EXISTS idx_earnings_driver_date ON earnings(driver_email, date);
+CREATE TABLE IF NOT EXISTS earnings_rollups (
+    driver_email TEXT NOT NULL,
+    period TEXT NOT NULL,  -- '' for all time, 'YYYY-MM' per month, 'YYYY-MM-DD' per day
+    amount NUMERIC NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (driver_email, period)
+);
+"""
+
+# Data generation: bumped by triggers on every change to users, rides, bookings or earnings.
+# ride_ids is the highest ride id ever handed out (see allocate_ride_id)
+SQLITE_GENERATION_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+INSERT OR IGNORE INTO meta VALUES ('users_generation', 0);
+INSERT OR IGNORE INTO meta VALUES ('ride_ids', 0);
+""" + ''.join(f"""
+CREATE TRIGGER IF NOT EXISTS {table}_generation_{event.lower()} AFTER {event} ON {table} BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'generation';
+END;""" for table in ('users', 'rides', 'bookings', 'earnings') for event in ('INSERT', 'UPDATE', 'DELETE')) + ''.join(f"""
+CREATE TRIGGER IF NOT EXISTS users_version_{event.lower()} AFTER {event} ON users BEGIN
+    UPDATE meta SET value = value + 1 WHERE key = 'users_generation';
+END;""" for event in ('INSERT', 'UPDATE', 'DELETE'))
+
+# Rollup periods for one earnings row: all time, month, day
+EARNINGS_ROLLUP_PERIODS = ("''", "substr({row}.date, 1, 7)", "{row}.date")
+
+
+def _earnings_rollup_sql(row, sign):
+    """Trigger statements adding (sign '') or removing (sign '-') one earnings row from the rollups"""
+    return ''.join(f"""
+    INSERT INTO earnings_rollups VALUES ({row}.driver_email, {period.format(row=row)},
+                                         {sign}json_extract({row}.data, '$.amount'), {sign}1)
+        ON CONFLICT(driver_email, period) DO UPDATE
+        SET amount = amount + excluded.amount, count = count + excluded.count;"""
+                   for period in EARNINGS_ROLLUP_PERIODS)
+
+
+# Triggers keep the rollups in step with every write to the earnings table
+SQLITE_EARNINGS_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS earnings_rollup_insert AFTER INSERT ON earnings BEGIN{_earnings_rollup_sql('NEW', '')}
+END;
+CREATE TRIGGER IF NOT EXISTS earnings_rollup_update AFTER UPDATE ON earnings BEGIN{_earnings_rollup_sql('OLD', '-')}{_earnings_rollup_sql('NEW', '')}
+    DELETE FROM earnings_rollups WHERE driver_email = OLD.driver_email AND count = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS earnings_rollup_delete AFTER DELETE ON earnings BEGIN{_earnings_rollup_sql('OLD', '-')}
+    DELETE FROM earnings_rollups WHERE driver_email = OLD.driver_email AND count = 0;
+END;
+"""
+
+# Backfill for databases created before the rollups table existed
+SQLITE_EARNINGS_BACKFILL = """
+INSERT INTO earnings_rollups
+SELECT driver_email, '', SUM(json_extract(data, '$.amount')), COUNT(*) FROM earnings GROUP BY driver_email
+UNION ALL
+SELECT driver_email, substr(date, 1, 7), SUM(json_extract(data, '$.amount')), COUNT(*)
+FROM earnings GROUP BY driver_email, substr(date, 1, 7)
+UNION ALL
+SELECT driver_email, date, SUM(json_extract(data, '$.amount')), COUNT(*) FROM earnings GROUP BY driver_email, date
+"""
+
+
+class SqliteStore:
+    """Tables kept in an indexed SQLite database (WAL journal mode)"""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path, default_users, default_rides, import_dir=None, snapshot_format='json'):
+        self.db_path = db_path
+        self.files = [db_path]
+        self._local = threading.local()
+        self._archived_before = None
+        self._bytes_written = collections.Counter()
+        self.contended_transactions = 0  # Write transactions that waited for another writer
+        self._contention_lock = threading.Lock()
+        conn = self._conn()
+        conn.executescript(SQLITE_SCHEMA)
+        conn.executescript(SQLITE_EARNINGS_TRIGGERS)
+        conn.executescript(SQLITE_GENERATION_SCHEMA)
+
+        # user_version marks a database that has already been seeded (older ones just have users)
+        seeded = (conn.execute("PRAGMA user_version").fetchone()[0] > 0 or
+                  conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] > 0)
+        if not seeded:
+            if import_dir and find_snapshot(os.path.join(import_dir, 'users_db'),
+                                            get_snapshot_format(snapshot_format))[0] is not None:
+                # First start on SQLite - migrate the existing JSON data
+                source = JsonStore(import_dir, default_users, default_rides, snapshot_format)
+                print(f"Importing JSON data from {import_dir} into {db_path}...")
+            else:
+                print("Creating new SQLite database...")
+                source = None
+            self.save_users(source.users if source else default_users())
+            self.save_rides(source.rides if source else default_rides())
+            self.save_bookings(source.bookings if source else [])
+            self.save_earnings(source.earnings if source else {})
+        with self.transaction() as tx:
+            if tx.execute("PRAGMA user_version").fetchone()[0] < 2:
+                # Version 2 added the earnings rollups - derive them from existing earnings once
+                tx.execute("DELETE FROM earnings_rollups")
+                tx.execute(SQLITE_EARNINGS_BACKFILL)
+                tx.execute("PRAGMA user_version = 2")
+        print(f"✓ Opened SQLite database {db_path} ({self.count_rides()} rides, {self.count_bookings()} bookings)")
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Write section; BEGIN IMMEDIATE takes SQLite's write lock up front across processes"""
+        local = self._local
+        conn = self._conn()
+        depth = getattr(local, 'depth', 0)
+        if depth == 0:
+            self._begin_immediate(conn)
+        local.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            local.depth = depth
+            if depth == 0:
+                conn.rollback()
+            raise
+        local.depth = depth
+        if depth == 0:
+            conn.commit()
+
+    def _begin_immediate(self, conn):
+        """BEGIN IMMEDIATE, counting the times another connection already held the write lock"""
+        conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            return
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+        finally:
+            conn.execute("PRAGMA busy_timeout = 30000")  # The connect() timeout, for the wait below
+        with self._contention_lock:
+            self.contended_transactions += 1
+        conn.execute("BEGIN IMMEDIATE")
+
+    def refresh(self):
+        """SQLite already gives every worker a coherent view - only run the daily archival"""
+        if self._archived_before != today_str():
+            self.archive_past_rides()
+
+    def generation(self):
+        """Counter bumped by every change to users, rides, bookings or earnings, in any worker"""
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+
+    def users_version(self):
+        """Counter bumped by every change to the users table, in any worker"""
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'users_generation'").fetchone()[0]
+
+    def bytes_written(self):
+        """{table: bytes} of row data this process has written (SQLite's own page writes not included)"""
+        return dict(self._bytes_written)
+
+    def _write_rows(self, conn, table, sql, rows):
+        # The JSON data column is always last - count it for bytes_written()
+        self._bytes_written[table] += sum(len(row[-1]) for row in rows)
+        conn.executemany(sql, rows)
+
+    def _conn(self):
+        # One connection per thread - sqlite3 connections are not shareable across threads
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.create_function('contains_ci', 2, contains_ci, deterministic=True)
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _ride_row(ride):
+        return (ride['id'], ride['driver_email'], ride['from_location'], ride['to_location'],
+                ride['date'], ride['departure_time'], ride['available_seats'],
+                json.dumps(ride, ensure_ascii=False))
+
+    @staticmethod
+    def _booking_row(booking):
+        return (booking['id'], booking['passenger_email'], booking['ride_id'], booking['status'],
+                json.dumps(booking, ensure_ascii=False))
+
+    @staticmethod
+    def _earning_row(driver_email, earning):
+        return (driver_email, earning['id'], earning['date'], earning['time'],
+                json.dumps(earning, ensure_ascii=False))
+
+    def _fetch_data(self, sql, params=()):
+        return [json.loads(row[0]) for row in self._conn().execute(sql, params)]
+
+    # Load / save (whole tables)
+    def load_users(self):
+        return {row[0]: json.loads(row[1]) for row in self._conn().execute("SELECT email, data FROM users")}
+
+    def save_users(self, users_data):
+        with self.transaction() as conn:
+            self._write_rows(conn, 'users', "INSERT OR REPLACE INTO users (email, data) VALUES (?, ?)",
+                             [(email, json.dumps(data, ensure_ascii=False)) for email, data in users_data.items()])
+        return True
+
+    def load_rides(self):
+        return self._fetch_data("SELECT data FROM rides ORDER BY id")
+
+    def save_rides(self, rides_data):
+        with self.transaction() as conn:
+            self._write_rows(conn, 'rides', "INSERT OR REPLACE INTO rides VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             [self._ride_row(ride) for ride in rides_data])
+        return True
+
+    def load_bookings(self):
+        return self._fetch_data("SELECT data FROM bookings ORDER BY id")
+
+    def save_bookings(self, bookings_data):
+        with self.transaction() as conn:
+            self._write_rows(conn, 'bookings', "INSERT OR REPLACE INTO bookings VALUES (?, ?, ?, ?, ?)",
+                             [self._booking_row(booking) for booking in bookings_data])
+        return True
+
+    def load_earnings(self):
+        earnings_data = {}
+        for driver_email, data in self._conn().execute("SELECT driver_email, data FROM earnings ORDER BY driver_email, id"):
+            earnings_data.setdefault(driver_email, []).append(json.loads(data))
+        return earnings_data
+
+    def save_earnings(self, earnings_data):
+        with self.transaction() as conn:
+            # Upsert rather than REPLACE so the rollup triggers see an UPDATE, not a silent delete
+            self._write_rows(conn, 'earnings',
+                             "INSERT INTO earnings VALUES (?, ?, ?, ?, ?) ON CONFLICT (driver_email, id) DO UPDATE "
+                             "SET date = excluded.date, time = excluded.time, data = excluded.data",
+                             [self._earning_row(driver_email, earning)
+                              for driver_email, records in earnings_data.items() for earning in records])
+        return True
+
+    # Users
+    def get_user(self, email):
+        row = self._conn().execute("SELECT data FROM users WHERE email = ?", (email,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def add_user(self, email, user_data):
+        self.save_users({email: user_data})
+
+    def update_user(self, email, updates):
+        with self.transaction() as conn:
+            row = conn.execute("SELECT data FROM users WHERE email = ?", (email,)).fetchone()
+            user_data = json.loads(row[0])
+            user_data.update(updates)
+            data = json.dumps(user_data, ensure_ascii=False)
+            self._bytes_written['users'] += len(data)
+            conn.execute("UPDATE users SET data = ? WHERE email = ?", (data, email))
+
+    def count_users(self):
+        return self._conn().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def profile_pictures(self):
+        """Picture filenames any user points at, including uploads still being processed"""
+        rows = self._conn().execute("SELECT json_extract(data, '$.profile_pic'), "
+                                    "json_extract(data, '$.profile_pic_pending') FROM users")
+        return {name for row in rows for name in row if name}
+
+    # Rides
+    def get_ride(self, ride_id):
+        rides = self._fetch_data("SELECT data FROM rides WHERE id = ?", (ride_id,))
+        return rides[0] if rides else None
+
+    def all_rides(self):
+        return self.load_rides()
+
+    def rides_by_driver(self, driver_email):
+        """Driver's rides, including ones already archived"""
+        rows = self._conn().execute(
+            "SELECT id, data FROM rides_archive WHERE driver_email = ? "
+            "UNION ALL SELECT id, data FROM rides WHERE driver_email = ? ORDER BY id",
+            (driver_email, driver_email))
+        return [json.loads(row[1]) for row in rows]
+
+    def driver_rides_newest(self, driver_email, before=None, limit=None):
+        """Driver's rides newest first by (date, departure_time, id), keyset-paginated below before"""
+        sql = ("SELECT data FROM (SELECT id, date, departure_time, data FROM rides_archive WHERE driver_email = ? "
+               "UNION ALL SELECT id, date, departure_time, data FROM rides WHERE driver_email = ?)")
+        params = [driver_email, driver_email]
+        if before is not None:
+            sql += " WHERE (date, departure_time, id) < (?, ?, ?)"
+            params.extend(before)
+        sql += " ORDER BY date DESC, departure_time DESC, id DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return self._fetch_data(sql, params)
+
+    def search_rides(self, search_from='', search_to='', search_date='', exclude_driver=None,
+                     after=None, limit=None):
+        """Rides with free seats matching the filters, ordered by date and time
+
+        Without a date only upcoming rides (today onwards) are considered.
+        after/limit page through the results by (date, departure_time, id).
+        """
+        sql = "SELECT data FROM rides WHERE available_seats > 0 AND driver_email != ?"
+        params = [exclude_driver or '']
+        if search_from:
+            sql += " AND contains_ci(from_location, ?)"
+            params.append(search_from)
+        if search_to:
+            sql += " AND contains_ci(to_location, ?)"
+            params.append(search_to)
+        if search_date:
+            sql += " AND date = ?"
+            params.append(search_date)
+        else:
+            sql += " AND date >= ?"
+            params.append(today_str())
+        if after is not None:
+            sql += " AND (date, departure_time, id) > (?, ?, ?)"
+            params.extend(after)
+        sql += " ORDER BY date, departure_time, id LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return self._fetch_data(sql, params)
+
+    def allocate_ride_id(self):
+        """Reserve a new ride id; ids of cancelled and archived rides are never handed out again"""
+        with self.transaction() as conn:
+            ride_id = conn.execute(
+                "SELECT MAX((SELECT value FROM meta WHERE key = 'ride_ids'), "
+                "(SELECT COALESCE(MAX(id), 0) FROM rides), "
+                "(SELECT COALESCE(MAX(id), 0) FROM rides_archive)) + 1").fetchone()[0]
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'ride_ids'", (ride_id,))
+            return ride_id
+
+    def archive_past_rides(self, cutoff_date=None):
+        """Move rides dated before cutoff_date (default today) out of the hot table"""
+        cutoff_date = cutoff_date or today_str()
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO rides_archive SELECT * FROM rides WHERE date < ?", (cutoff_date,))
+            archived = conn.execute("DELETE FROM rides WHERE date < ?", (cutoff_date,)).rowcount
+        self._archived_before = cutoff_date
+        if archived:
+            print(f"✓ Archived {archived} rides dated before {cutoff_date}")
+        return archived
+
+    def add_ride(self, ride):
+        self.save_rides([ride])
+
+    def update_ride(self, ride):
+        ride['version'] = ride.get('version', 0) + 1
+        self.save_rides([ride])
+
+    def delete_ride(self, ride_id):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM rides WHERE id = ?", (ride_id,))
+
+    def count_rides(self):
+        return self._conn().execute("SELECT COUNT(*) FROM rides").fetchone()[0]
+
+    # Bookings
+    def get_confirmed_booking(self, passenger_email, ride_id):
+        bookings = self._fetch_data(
+            "SELECT data FROM bookings WHERE passenger_email = ? AND ride_id = ? AND status = 'confirmed' "
+            "ORDER BY id LIMIT 1", (passenger_email, ride_id))
+        return bookings[0] if bookings else None
+
+    def user_bookings(self, passenger_email):
+        """Passenger's confirmed bookings as {ride_id: booking}"""
+        return {booking['ride_id']: booking for booking in self._fetch_data(
+            "SELECT data FROM bookings WHERE passenger_email = ? AND status = 'confirmed' ORDER BY id",
+            (passenger_email,))}
+
+    def ride_bookings(self, ride_id):
+        """Confirmed bookings on a ride, oldest first"""
+        return self._fetch_data("SELECT data FROM bookings WHERE ride_id = ? AND status = 'confirmed' ORDER BY id",
+                                (ride_id,))
+
+    def next_booking_id(self):
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) + 1 FROM bookings").fetchone()[0]
+
+    def allocate_booking_id(self):
+        """Next booking id; only unique inside the transaction that inserts it"""
+        return self.next_booking_id()
+
+    def reserve_seat(self, ride_id, passenger_email, build_booking, on_reserved=None):
+        """Atomically take one seat on a ride and record the booking
+
+        BEGIN IMMEDIATE holds SQLite's write lock from the seat check to the commit.
+        """
+        with self.transaction():
+            ride = self.get_ride(ride_id)
+            check_reservation(ride, passenger_email, self.get_confirmed_booking(passenger_email, ride_id))
+            ride['available_seats'] -= 1
+            booking = build_booking(ride, self.allocate_booking_id())
+            self.add_booking(booking)
+            if on_reserved is not None:
+                on_reserved(ride, booking)
+            self.update_ride(ride)
+            return ride, booking
+
+    def add_booking(self, booking):
+        self.save_bookings([booking])
+
+    def update_booking(self, booking):
+        """Persist a changed booking, e.g. a status change on cancellation"""
+        self.save_bookings([booking])
+
+    def count_bookings(self):
+        return self._conn().execute("SELECT COUNT(*) FROM bookings").fetchone()[0]
+
+    # Earnings
+    def earnings_for_driver(self, driver_email, before=None, limit=None):
+        """Driver's earnings records, newest first, keyset-paginated below before"""
+        sql = "SELECT data FROM earnings WHERE driver_email = ?"
+        params = [driver_email]
+        if before is not None:
+            sql += " AND (date, time, id) < (?, ?, ?)"
+            params.extend(before)
+        sql += " ORDER BY date DESC, time DESC, id DESC LIMIT ?"
+        params.append(-1 if limit is None else limit)
+        return self._fetch_data(sql, params)
+
+    def earnings_summary(self, driver_email):
+        """Driver's running totals as {'total': amount, 'count': records}"""
+        row = self._conn().execute("SELECT amount, count FROM earnings_rollups WHERE driver_email = ? AND period = ''",
+                                   (driver_email,)).fetchone()
+        return {'total': row[0], 'count': row[1]} if row else {'total': 0, 'count': 0}
+
+    def earnings_rollup(self, driver_email, period='month'):
+        """Driver's totals per 'day' or 'month', oldest period first"""
+        rows = self._conn().execute("SELECT period, amount, count FROM earnings_rollups "
+                                    "WHERE driver_email = ? AND length(period) = ? ORDER BY period",
+                                    (driver_email, 10 if period == 'day' else 7))
+        return [{'period': key, 'total': total, 'count': count} for key, total, count in rows]
+
+    def next_earning_id(self, driver_email):
+        return self._conn().execute("SELECT COUNT(*) + 1 FROM earnings WHERE driver_email = ?",
+                                    (driver_email,)).fetchone()[0]
+
+    def add_earning(self, driver_email, earning_record):
+        self.save_earnings({driver_email: [earning_record]})
+
+    def count_earning_drivers(self):
+        return self._conn().execute("SELECT COUNT(DISTINCT driver_email) FROM earnings").fetchone()[0]
+
+
+def open_store(backend, data_dir, default_users, default_rides, snapshot_format='json'):
+    """Create the storage backend selected in config ('json' or 'sqlite')
+
+    snapshot_format ('json' or 'binary') picks the JSON backend's file format.
+    """
+    if backend == 'sqlite':
+        return SqliteStore(os.path.join(data_dir, 'liftlink.db'), default_users, default_rides,
+                           import_dir=data_dir, snapshot_format=snapshot_format)
+    if backend == 'json':
+        return JsonStore(data_dir, default_users, default_rides, snapshot_format)
+    raise ValueError(f"Unknown storage backend: {backend}")
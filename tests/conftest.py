@@ -0,0 +1,60 @@
+# LiftLink Carpool - shared pytest fixtures
+# Stores are opened on a temporary data directory with a small synthetic
+# dataset; their load/save messages are silenced.
+
+import os
+import sys
+import io
+import contextlib
+from datetime import date, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import open_store
+
+DRIVERS = ['driver0@xavier.ac.in', 'driver1@xavier.ac.in']
+LOCALITIES = ['Dadar Railway Station', 'Bandra West', 'Andheri East', 'Matunga Road', 'Sion Circle',
+              'Worli Sea Face', 'Lower Parel', 'Thane Station', 'Vashi Sector 17']
+CAMPUS = ['Xavier Institute of Engineering, Mahim', 'XIE Main Gate', 'Mahim Church']
+
+
+def make_user(email, name):
+    return {'email': email, 'name': name, 'password': 'not-a-real-hash', 'phone': '9876543210',
+            'user_type': 'staff' if email in DRIVERS else 'student', 'verified': True}
+
+
+def make_ride(ride_id, seats=4, days_ahead=1, from_location=None, to_location=None):
+    driver = DRIVERS[ride_id % len(DRIVERS)]
+    return {'id': ride_id, 'driver_email': driver, 'driver_name': f'Driver {driver[6]}',
+            'phone': '9876543210', 'from_location': from_location or LOCALITIES[ride_id % len(LOCALITIES)],
+            'to_location': to_location or CAMPUS[ride_id % len(CAMPUS)],
+            'date': (date.today() + timedelta(days=days_ahead)).isoformat(),
+            'departure_time': f'{7 + ride_id % 3:02d}:{ride_id % 4 * 15:02d}',
+            'total_seats': seats, 'available_seats': seats, 'price_per_seat': 30}
+
+
+def default_users():
+    return {email: make_user(email, f'Driver {i}') for i, email in enumerate(DRIVERS)}
+
+
+def default_rides():
+    return [make_ride(1)]
+
+
+def quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+@pytest.fixture
+def open_data_store(tmp_path):
+    """open_data_store(backend, rides=None) -> a store on this test's data directory
+
+    Call it again to get a second store on the same files, like another gunicorn worker.
+    """
+    def opener(backend='json', rides=None, snapshot_format='json'):
+        rides_factory = default_rides if rides is None else (lambda: [dict(ride) for ride in rides])
+        return quiet(open_store, backend, str(tmp_path), default_users, rides_factory, snapshot_format)
+    return opener
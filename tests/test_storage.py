@@ -0,0 +1,238 @@
+# LiftLink Carpool - storage invariants
+# Seat reservations never oversell, booking ids are unique and increasing,
+# indexed ride search matches a plain substring scan, and JsonStore's
+# snapshots plus write-ahead logs rebuild exactly the in-memory tables.
+
+import os
+import sys
+import random
+import threading
+
+import pytest
+
+from conftest import make_ride, make_user, quiet, LOCALITIES, CAMPUS
+from storage import ReservationError, contains_ci, ride_sort_key
+
+BACKENDS = ['json', 'sqlite']
+
+
+def build_booking(passenger_email):
+    def build(ride, booking_id):
+        return {'id': booking_id, 'ride_id': ride['id'], 'passenger_email': passenger_email,
+                'passenger_name': passenger_email.split('@')[0], 'driver_email': ride['driver_email'],
+                'booking_time': '2025-01-01 08:00:00', 'status': 'confirmed'}
+    return build
+
+
+@pytest.fixture
+def fast_switching():
+    # Switch threads often so reservations really interleave
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+# Reservations
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_concurrent_reservations_never_oversell(open_data_store, backend, fast_switching):
+    seats = 3
+    stores = [open_data_store(backend, rides=[make_ride(1, seats=seats)]) for _ in range(2)]
+    reserved, refused = [], []
+    committed = []  # Booking ids in commit order: on_reserved runs inside the reservation
+
+    def book(worker, passenger):
+        try:
+            _, booking = stores[worker].reserve_seat(
+                1, passenger, build_booking(passenger),
+                on_reserved=lambda ride, booking: committed.append(booking['id']))
+            reserved.append(booking)
+        except ReservationError as e:
+            refused.append(e.reason)
+
+    threads = [threading.Thread(target=book, args=(i % 2, f'student{i}@student.xavier.ac.in')) for i in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(reserved) == seats
+    assert refused == [ReservationError.FULL] * (16 - seats)
+    for store in stores:
+        store.refresh()
+        assert store.get_ride(1)['available_seats'] == 0
+        assert sorted(b['id'] for b in store.ride_bookings(1)) == sorted(b['id'] for b in reserved)
+    assert committed == sorted(set(committed))
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_passenger_cannot_book_the_same_ride_twice(open_data_store, backend):
+    store = open_data_store(backend, rides=[make_ride(1)])
+    passenger = 'student1@student.xavier.ac.in'
+    store.reserve_seat(1, passenger, build_booking(passenger))
+    with pytest.raises(ReservationError) as excinfo:
+        store.reserve_seat(1, passenger, build_booking(passenger))
+    assert excinfo.value.reason == ReservationError.ALREADY_BOOKED
+    with pytest.raises(ReservationError) as excinfo:
+        store.reserve_seat(1, 'driver1@xavier.ac.in', build_booking('driver1@xavier.ac.in'))
+    assert excinfo.value.reason == ReservationError.OWN_RIDE
+    assert store.get_ride(1)['available_seats'] == 3
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_booking_ids_unique_and_increasing_across_workers(open_data_store, backend, fast_switching):
+    rides = [make_ride(ride_id, seats=20) for ride_id in range(1, 5)]
+    stores = [open_data_store(backend, rides=rides) for _ in range(2)]
+    committed = []
+
+    def book(worker):
+        for i in range(10):
+            passenger = f'w{worker}-{i}@student.xavier.ac.in'
+            stores[worker % 2].reserve_seat(
+                rides[i % len(rides)]['id'], passenger, build_booking(passenger),
+                on_reserved=lambda ride, booking: committed.append(booking['id']))
+
+    threads = [threading.Thread(target=book, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(committed) == 40
+    assert committed == sorted(set(committed))
+    # A later booking never reuses an id, even after the latest one is cancelled
+    store = stores[0]
+    store.refresh()
+    latest = store.ride_bookings(rides[0]['id'])[-1]
+    store.update_booking(dict(latest, status='cancelled'))
+    _, booking = store.reserve_seat(rides[1]['id'], 'late@student.xavier.ac.in',
+                                    build_booking('late@student.xavier.ac.in'))
+    assert booking['id'] > max(committed)
+
+
+# Search
+def scan_search(rides, search_from, search_to, search_date, exclude_driver):
+    """The pre-index find_ride filter: a substring scan over every ride (as in bench_find_ride_search.py)"""
+    first_date = min(r['date'] for r in rides)
+    results = [r for r in rides if
+               (not search_from or contains_ci(r['from_location'], search_from)) and
+               (not search_to or contains_ci(r['to_location'], search_to)) and
+               (r['date'] == search_date if search_date else r['date'] >= first_date) and
+               r['available_seats'] > 0 and r['driver_email'] != exclude_driver]
+    results.sort(key=ride_sort_key)
+    return results
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_indexed_search_matches_substring_scan(open_data_store, backend):
+    rng = random.Random(42)
+    rides = []
+    for ride_id in range(1, 401):
+        ride = make_ride(ride_id, days_ahead=rng.randint(0, 6),
+                         from_location=f"{rng.choice(LOCALITIES)} {rng.choice(['', 'Gate 2', 'West'])}".strip(),
+                         to_location=rng.choice(CAMPUS))
+        ride['available_seats'] = rng.randint(0, 4)
+        rides.append(ride)
+    store = open_data_store(backend, rides=rides)
+    some_date = rides[0]['date']
+    queries = [('', '', ''), ('dadar', '', ''), ('', 'xavier', ''), ('bandra', 'mahim', ''), ('st', '', ''),
+               ('SEA FACE', '', ''), ('a', 'a', ''), ('nowhere', '', ''), ('', '', some_date),
+               ('west', 'xie', some_date)]
+    for search_from, search_to, search_date in queries:
+        for exclude in (None, 'driver0@xavier.ac.in'):
+            expected = scan_search(rides, search_from, search_to, search_date, exclude)
+            actual = store.search_rides(search_from, search_to, search_date, exclude)
+            assert [r['id'] for r in actual] == [r['id'] for r in expected], (search_from, search_to, search_date)
+
+            # Keyset pages concatenate to the same list
+            paged, after = [], None
+            while True:
+                page = store.search_rides(search_from, search_to, search_date, exclude, after=after, limit=7)
+                paged.extend(page)
+                if len(page) < 7:
+                    break
+                after = ride_sort_key(page[-1])
+            assert [r['id'] for r in paged] == [r['id'] for r in expected]
+
+
+def test_search_follows_edits_from_another_worker(open_data_store):
+    writer, reader = open_data_store(), open_data_store()
+    ride = writer.get_ride(1)
+    ride['from_location'] = 'Colaba Causeway'
+    writer.update_ride(ride)
+    reader.refresh()
+    assert [r['id'] for r in reader.search_rides('colaba')] == [1]
+    assert reader.search_rides(LOCALITIES[1].split()[0]) == []
+
+
+# Snapshots and write-ahead logs
+def table_state(store):
+    """Every JsonStore table plus the derived indexes, as plain comparable values"""
+    drivers = sorted({r['driver_email'] for r in store.rides} | set(store.earnings))
+    return {
+        'users': {email: dict(user) for email, user in store.users.items()},
+        'rides': sorted(store.rides, key=lambda r: r['id']),
+        'bookings': sorted(store.bookings, key=lambda b: b['id']),
+        'earnings': {driver: list(history) for driver, history in store.earnings.items()},
+        'search': [r['id'] for r in store.search_rides()],
+        'confirmed': {email: sorted(by_ride) for email, by_ride in store.confirmed_bookings.items() if by_ride},
+        'ride_bookings': {ride_id: sorted(by_id) for ride_id, by_id in store.ride_confirmed_bookings.items() if by_id},
+        'earning_totals': {driver: store.earnings_summary(driver) for driver in drivers},
+        'next_booking_id': store.next_booking_id(),
+    }
+
+
+def mutate(store):
+    """One of every kind of logged write"""
+    store.add_user('new@student.xavier.ac.in', make_user('new@student.xavier.ac.in', 'New Student'))
+    store.update_user('driver0@xavier.ac.in', {'name': 'Renamed Driver'})
+    for _ in range(3):
+        store.add_ride(make_ride(store.allocate_ride_id()))
+    ride = store.get_ride(2)
+    ride['from_location'] = 'Colaba Causeway'
+    store.update_ride(ride)
+    for i, ride_id in enumerate([1, 2, 2, 3]):
+        passenger = f'student{i}@student.xavier.ac.in'
+        ride, booking = store.reserve_seat(ride_id, passenger, build_booking(passenger))
+        store.add_earning(ride['driver_email'], {
+            'id': store.next_earning_id(ride['driver_email']), 'passenger_name': booking['passenger_name'],
+            'passenger_email': passenger, 'amount': ride['price_per_seat'], 'date': '2025-01-01',
+            'time': '08:00', 'ride_from': ride['from_location'], 'ride_to': ride['to_location'],
+            'ride_date': ride['date'], 'ride_time': ride['departure_time']})
+    booking = store.ride_bookings(2)[0]
+    store.update_booking(dict(booking, status='cancelled'))
+    store.delete_ride(4)
+
+
+@pytest.mark.parametrize('snapshot_format', ['json', 'binary'])
+def test_wal_tail_and_replay_match_memory(open_data_store, snapshot_format):
+    writer = open_data_store(snapshot_format=snapshot_format)
+    tailer = open_data_store(snapshot_format=snapshot_format)
+    mutate(writer)
+    expected = table_state(writer)
+
+    # Another worker tails the logs onto its open tables
+    tailer.refresh()
+    assert table_state(tailer) == expected
+    # A fresh worker replays the logs onto the snapshots
+    assert table_state(open_data_store(snapshot_format=snapshot_format)) == expected
+
+    # After a checkpoint the snapshots alone hold everything
+    quiet(writer.save_users)
+    quiet(writer.save_rides)
+    quiet(writer.save_bookings)
+    quiet(writer.save_earnings)
+    for wal in (writer.users_wal, writer.rides_wal, writer.bookings_wal, writer.earnings_wal):
+        assert not os.path.exists(wal.log_path) or os.path.getsize(wal.log_path) == 0
+    assert table_state(open_data_store(snapshot_format=snapshot_format)) == expected
+    tailer.refresh()
+    assert table_state(tailer) == expected
+
+
+def test_torn_log_record_is_skipped(open_data_store):
+    writer = open_data_store()
+    mutate(writer)
+    expected = table_state(writer)
+    with open(writer.bookings_wal.log_path, 'ab') as f:
+        f.write(b'{"op":"put","value":{"id":')  # A crash mid-append: no newline
+    assert table_state(open_data_store()) == expected